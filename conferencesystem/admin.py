@@ -1,17 +1,72 @@
 from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
-from django.contrib.admin.widgets import FilteredSelectMultiple
+from django.contrib.admin.widgets import AutocompleteSelectMultiple
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
+from .lookups import match_users
 from .models import User, Conference, Track, Chair, Author, Reviewer, Paper, Review
+from .roles import invalidate_roles
+from .search import match_papers
+
+ChairConference = Chair.conferences.through
+
+
+def estimated_count(queryset):
+    """
+    The row count of the queryset's table from the planner's statistics, or
+    None without any: pg_class.reltuples on PostgreSQL, sqlite_stat1 (kept
+    by ANALYZE or PRAGMA optimize) on SQLite.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None     # -1 before the first ANALYZE
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Pages an unfiltered changelist of a big table with the estimated row
+    count, as COUNT(*) reads the whole table. Filtered lists, and tables the
+    estimate puts under ESTIMATE_ABOVE rows, are counted exactly.
+    """
+
+    ESTIMATE_ABOVE = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset)
+            if estimate is not None and estimate > self.ESTIMATE_ABOVE:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False      # no second COUNT(*) of the whole table next to filtered results
+
 
-admin.site.register(User)
 class UserAdmin(DjangoUserAdmin):
     """Define admin model for custom User model with no email field."""
 
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
-        (_('Personal info'), {'fields': ('first_name', 'last_name')}),
+        (_('Personal info'), {'fields': ('first_name', 'last_name', 'phone')}),
         (_('Permissions'), {'fields': ('is_active', 'is_staff', 'is_superuser',
                                        'groups', 'user_permissions')}),
         (_('Important dates'), {'fields': ('last_login', 'date_joined')}),
@@ -19,72 +74,149 @@ class UserAdmin(DjangoUserAdmin):
     add_fieldsets = (
         (None, {
             'classes': ('wide',),
-            'fields': ('email', 'password1', 'password2'),
+            'fields': ('email', 'phone', 'password1', 'password2'),
         }),
     )
     list_display = ('email', 'first_name', 'last_name', 'is_staff')
     search_fields = ('email', 'first_name', 'last_name')
     ordering = ('email',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Prefix matches answered from the LOWER() indexes, also for the autocomplete widgets
+        if not search_term.strip():
+            return queryset, False
+        return match_users(queryset, search_term), False
+
+admin.site.register(User, UserAdmin)
+
+
+def _chair_ids(user_ids):
+    # Users may have several Chair rows from before; use their oldest.
+    chair_ids = {}
+    for chair_id, user_id in Chair.objects.filter(user_id__in=user_ids).order_by('-id').values_list('id', 'user_id'):
+        chair_ids[user_id] = chair_id
+    return chair_ids
+
+
+def sync_chairs(conference, user_ids):
+    """Make the users ``user_ids`` exactly the chairs of ``conference``, touching only the difference."""
+    user_ids = set(user_ids)
+    links = ChairConference.objects.filter(conference=conference)
+    current = set(links.values_list('chair__user_id', flat=True))
+    removed, added = current - user_ids, user_ids - current
+    if not removed and not added:
+        return
+
+    with transaction.atomic():
+        if removed:
+            links.filter(chair__user_id__in=removed).delete()
+        if added:
+            chair_ids = _chair_ids(added)
+            missing = added - chair_ids.keys()
+            if missing:
+                Chair.objects.bulk_create([Chair(user_id=user_id) for user_id in missing])
+                chair_ids = _chair_ids(added)
+            ChairConference.objects.bulk_create(
+                [ChairConference(chair_id=chair_id, conference_id=conference.id) for chair_id in chair_ids.values()],
+                ignore_conflicts=True,
+            )
+
+    # bulk_create and queryset delete() send no m2m_changed signals
+    invalidate_roles(removed | added)
+
 
 class ConferenceAdminForm(forms.ModelForm):
     class Meta:
         model = Conference
         fields = '__all__'
-        widgets = {
-            'chairs': forms.ModelMultipleChoiceField,
-        }
-        
 
     chairs = forms.ModelMultipleChoiceField(
         queryset=User.objects.all(),
         required=False,
-        widget=FilteredSelectMultiple(verbose_name='Users', is_stacked=False),
+        # Renders only the chairs; other users are searched for, see UserAdmin.get_search_results
+        widget=AutocompleteSelectMultiple(Chair._meta.get_field('user'), admin.site),
     )
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.instance.pk:
-            self.fields['chairs'].initial = self.instance.chair_set.values_list('user', flat=True)
+            self.fields['chairs'].initial = list(
+                ChairConference.objects.filter(conference=self.instance).values_list('chair__user_id', flat=True)
+            )
 
-    def save(self, commit=True):
-        # To allow for users to be added as chairs
+    def _save_m2m(self):
+        # Called by save(), or by save_m2m() after save(commit=False) as the admin does
+        super()._save_m2m()
+        sync_chairs(self.instance, [user.pk for user in self.cleaned_data.get('chairs', [])])
 
-        instance = super().save(commit=False)
-        instance.save()
 
-        selected_users = self.cleaned_data.get('chairs', [])
-        chairs = Chair.objects.filter(user__in=selected_users, conferences=instance)
-        existing_chairs = set(chairs.values_list('user', flat=True))
-        new_chairs = []
+class ConferenceAdmin(admin.ModelAdmin):
+    form = ConferenceAdminForm
+    list_display = ('title', 'organizing_institute', 'start_date', 'end_date')
+    search_fields = ('title',)
 
-        for user in selected_users:
-            if user not in existing_chairs:
-                chair, created = Chair.objects.get_or_create(user=user)
-                chair.conferences.add(instance)
-                new_chairs.append(chair)
+admin.site.register(Conference, ConferenceAdmin)
 
-        chairs = Chair.objects.filter(pk__in=[chair.pk for chair in chairs])
-        new_chairs = Chair.objects.filter(pk__in=[chair.pk for chair in new_chairs])
 
-        for chair in chairs.union(new_chairs):
-            chair.conferences.add(instance)
+class TrackAdmin(admin.ModelAdmin):
+    list_display = ('title', 'conference')
+    list_select_related = ('conference',)
+    search_fields = ('title',)
+    autocomplete_fields = ('conference',)
 
-        return instance
-    
-    def get_chairs(self, obj):
-        chairs = obj.chairs.all()
-        return ', '.join(str(chair) for chair in chairs)
-    
-    get_chairs.short_description = 'Chairs'
+admin.site.register(Track, TrackAdmin)
 
 
-class ConferenceAdmin(admin.ModelAdmin):
-    form = ConferenceAdminForm
+class RoleAdmin(LargeTableAdmin):
+    """Chair, Author and Reviewer rows, listed and searched by their user."""
 
-admin.site.register(Conference, ConferenceAdmin)
-admin.site.register(Track)
-admin.site.register(Author)
-admin.site.register(Chair)
-admin.site.register(Reviewer)
-admin.site.register(Paper)
-admin.site.register(Review)
\ No newline at end of file
+    list_display = ('user',)
+    list_select_related = ('user',)
+    search_fields = ('user__email',)
+    autocomplete_fields = ('user',)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(user__in=match_users(User.objects.all(), search_term).values('pk')), False
+
+
+class ChairAdmin(RoleAdmin):
+    autocomplete_fields = ('user', 'conferences')
+
+
+class AuthorAdmin(RoleAdmin):
+    autocomplete_fields = ('user', 'conferences')
+
+
+class ReviewerAdmin(RoleAdmin):
+    autocomplete_fields = ('user', 'papers')
+
+admin.site.register(Author, AuthorAdmin)
+admin.site.register(Chair, ChairAdmin)
+admin.site.register(Reviewer, ReviewerAdmin)
+
+
+class PaperAdmin(LargeTableAdmin):
+    list_display = ('title', 'conference', 'track', 'status')
+    list_select_related = ('conference', 'track')
+    search_fields = ('title',)
+    ordering = ('-id',)                 # the changelist's own default, now also for the autocomplete widgets
+    autocomplete_fields = ('conference', 'track', 'authors')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Answered from the full-text index, also for the autocomplete widgets
+        if not search_term.strip():
+            return queryset, False
+        return match_papers(queryset, search_term), False
+
+
+class ReviewAdmin(LargeTableAdmin):
+    list_display = ('paper', 'reviewer', 'score')
+    list_select_related = ('paper', 'reviewer__user')
+    autocomplete_fields = ('paper', 'reviewer')
+
+admin.site.register(Paper, PaperAdmin)
+admin.site.register(Review, ReviewAdmin)
@@ -0,0 +1,232 @@
+"""
+Admission control for paper submissions.
+
+Near a deadline far more submissions arrive than the workers can save at
+once. Instead of letting them all pile onto the database and time out,
+submit_paper only saves a submission while it holds a slot, and tells the
+rest that they are in line:
+
+  * Slots bound the submissions being saved at once, to
+    SUBMISSION_CONCURRENCY overall and SUBMISSION_CONFERENCE_CONCURRENCY
+    per conference. A slot is a cache key taken with cache.add(). It
+    expires after SUBMISSION_SLOT_TIMEOUT seconds, so a worker that dies
+    holding one does not keep it.
+  * Whoever finds no free slot gets a ticket: a place in the conference's
+    queue and a signed retry token, in a 503 response with a Retry-After
+    header. Retrying with the token keeps the place, and a ticket not
+    retried for SUBMISSION_TICKET_TIMEOUT seconds lapses.
+  * The wait is the time the tickets ahead take to be saved: rounds of
+    SUBMISSION_CONFERENCE_CONCURRENCY saves, each as long as the recent
+    saves of the conference took. It is at least SUBMISSION_RETRY_MIN and
+    at most SUBMISSION_RETRY_AFTER seconds. The submission page comes back
+    after that many milliseconds (retry_ms). The header can only say whole
+    seconds, so it is rounded up.
+  * A ticket at the front of the line that comes back and finds no free
+    slot waits in the request for up to SUBMISSION_FRONT_WAIT seconds
+    instead of being sent away again. It takes a slot as soon as one is
+    given back. At most SUBMISSION_CONFERENCE_CONCURRENCY requests per
+    conference wait like this, and they only read the cache.
+  * Each conference has two lanes. Submissions whose manuscript has
+    finished uploading go in the 'ready' lane, and the rest in 'waiting'.
+    Ready tickets are served first.
+  * A conference's queue holds at most SUBMISSION_QUEUE_LENGTH live
+    tickets. Beyond that, submitters get a 503 without a ticket and come
+    back later, which is the backpressure.
+
+Everything lives in the cache, so the limits hold across processes when
+the cache is shared (memcached or Redis, see CACHES). With the per-process
+default, each process has its own limits.
+
+A conference takes in at most SUBMISSION_CONFERENCE_CONCURRENCY
+submissions per save time. Admission does not make saves faster, as on
+SQLite they take turns at the write lock. It keeps the submitters in line
+off the database. Each time one comes back it costs a request: the form
+is validated and the page rendered again. Coming back too early costs
+requests, and coming back late leaves slots idle. Waits in whole seconds
+capped a conference at about 8 submissions a second, whatever the save
+time. Processing the papers (conferencesystem.pipeline) happens in the
+workers after the save, so it is not part of the wait.
+
+`manage.py stress_submissions` measures this. It runs the server and 200
+simultaneous submitters in one process. On one CPU, 200 submissions drain
+in 18-26 s, about 10 a second. A save takes 10-20 ms, and the run is bound
+by the CPU the queued requests take. Without admission the same run takes
+about 7 s, so at this size the line costs more than it saves. It pays off
+where saving everything at once would run past the database's busy
+timeout. Expect the line to drain faster with workers on more CPUs, up to
+SUBMISSION_CONFERENCE_CONCURRENCY per save time.
+"""
+import math
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+LANES = ('ready', 'waiting')    # served in this order
+ALL_CONFERENCES = '*'
+_SALT = 'conferencesystem.admission'
+SAVE_SECONDS = 0.5      # assumed time to save a submission until one has been timed
+SAVE_WEIGHT = 0.2       # weight of the latest save in the running average
+FRONT_POLL = 0.02       # seconds between looks for a free slot at the front of the line
+
+
+@dataclass
+class Admission:
+    conference_id: int
+    admitted: bool
+    slots: tuple = ()
+    ticket: str = None      # retry token, when queued
+    position: int = None    # 1 for the front of the queue
+    retry_after: int = 0    # whole seconds, for the Retry-After header
+    retry_ms: int = 0
+    started: float = None   # time.monotonic() of the admission
+
+    def release(self):
+        cache.delete_many(list(self.slots))
+        self.slots = ()
+        if self.started is not None:
+            _record_save(self.conference_id, time.monotonic() - self.started)
+            self.started = None
+
+
+def _slot_keys(scope, limit):
+    return ['submission:slot:{0}:{1}'.format(scope, n) for n in range(limit)]
+
+
+def _counter_key(conference_id, lane, name):
+    return 'submission:queue:{0}:{1}:{2}'.format(conference_id, lane, name)
+
+
+def _ticket_key(conference_id, lane, number):
+    return 'submission:queue:{0}:{1}:{2}'.format(conference_id, lane, number)
+
+
+def _save_time_key(conference_id):
+    return 'submission:save_time:{0}'.format(conference_id)
+
+
+def _record_save(conference_id, seconds):
+    # Concurrent releases may overwrite each other's update; the average is only an estimate.
+    key = _save_time_key(conference_id)
+    average = cache.get(key)
+    cache.set(key, seconds if average is None else average + SAVE_WEIGHT * (seconds - average), None)
+
+
+def _live_tickets(conference_id):
+    """Return {lane: ascending numbers of the live tickets}, moving each lane's head past lapsed ones."""
+    counters = [_counter_key(conference_id, lane, name) for lane in LANES for name in ('head', 'next')]
+    positions = cache.get_many(counters)
+    live = {}
+    for lane in LANES:
+        head = positions.get(_counter_key(conference_id, lane, 'head'), 0)
+        end = positions.get(_counter_key(conference_id, lane, 'next'), 0)
+        keys = {_ticket_key(conference_id, lane, number): number for number in range(head + 1, end + 1)}
+        found = cache.get_many(list(keys)) if keys else {}
+        live[lane] = sorted(keys[key] for key in found)
+        new_head = live[lane][0] - 1 if live[lane] else end
+        if new_head > head:
+            cache.set(_counter_key(conference_id, lane, 'head'), new_head, None)
+    return live
+
+
+def _acquire(conference_id, ahead):
+    """
+    Take a conference slot and an overall slot, or neither, leaving ``ahead``
+    free conference slots to the tickets before this one; return their keys.
+    """
+    taken = []
+    for scope, limit, reserved in (
+        (conference_id, settings.SUBMISSION_CONFERENCE_CONCURRENCY, ahead),
+        (ALL_CONFERENCES, settings.SUBMISSION_CONCURRENCY, 0),
+    ):
+        keys = _slot_keys(scope, limit)
+        held = cache.get_many(keys)
+        free = [key for key in keys if key not in held]
+        key = None
+        if len(free) > reserved:
+            key = next((key for key in free if cache.add(key, 1, settings.SUBMISSION_SLOT_TIMEOUT)), None)
+        if key is None:
+            cache.delete_many(taken)
+            return ()
+        taken.append(key)
+    return tuple(taken)
+
+
+def _read_ticket(token, conference_id, user_id):
+    try:
+        ticket_conference, ticket_user, lane, number = signing.loads(token, salt=_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    if (ticket_conference, ticket_user) != (conference_id, user_id) or lane not in LANES:
+        return None
+    return lane, number
+
+
+def _issue_ticket(conference_id, user_id, lane):
+    next_key = _counter_key(conference_id, lane, 'next')
+    cache.add(next_key, 0, None)
+    number = cache.incr(next_key)
+    cache.set(_ticket_key(conference_id, lane, number), user_id, settings.SUBMISSION_TICKET_TIMEOUT)
+    return number
+
+
+def _ahead(live, lane, number):
+    """How many live tickets are served before ticket ``number`` of ``lane`` (None: a newcomer)."""
+    count = 0
+    for other in LANES:
+        if other == lane:
+            return count + sum(1 for n in live[other] if number is None or n < number)
+        count += len(live[other])
+    return count
+
+
+def admit(conference_id, user_id, ready, token=None):
+    """
+    Try to admit a submission by ``user_id`` to the conference. ``ready``
+    says whether its manuscript has finished uploading, ``token`` is the
+    retry token of an earlier attempt. Call release() on an admitted
+    Admission once the submission is saved.
+    """
+    held = _read_ticket(token, conference_id, user_id) if token else None
+    if held is not None and not cache.touch(_ticket_key(conference_id, *held), settings.SUBMISSION_TICKET_TIMEOUT):
+        held = None     # lapsed; join the back of the line
+    lane, number = held or ('ready' if ready else 'waiting', None)
+
+    live = _live_tickets(conference_id)
+    ahead = _ahead(live, lane, number)
+    slots = _acquire(conference_id, ahead)
+    # The front of the line waits here for a slot, so one is taken as soon as it is given back.
+    deadline = time.monotonic() + settings.SUBMISSION_FRONT_WAIT
+    while not slots and number is not None and ahead < settings.SUBMISSION_CONFERENCE_CONCURRENCY \
+            and time.monotonic() < deadline:
+        time.sleep(FRONT_POLL)
+        live = _live_tickets(conference_id)
+        ahead = _ahead(live, lane, number)
+        slots = _acquire(conference_id, ahead)
+    if slots:
+        if number is not None:
+            cache.delete(_ticket_key(conference_id, lane, number))
+        return Admission(conference_id, admitted=True, slots=slots, started=time.monotonic())
+
+    if number is None:
+        if sum(len(numbers) for numbers in live.values()) >= settings.SUBMISSION_QUEUE_LENGTH:
+            return Admission(
+                conference_id, admitted=False,
+                retry_after=settings.SUBMISSION_RETRY_AFTER, retry_ms=settings.SUBMISSION_RETRY_AFTER * 1000,
+            )
+        number = _issue_ticket(conference_id, user_id, lane)
+    wait = _wait(conference_id, ahead)
+    return Admission(
+        conference_id, admitted=False,
+        ticket=signing.dumps([conference_id, user_id, lane, number], salt=_SALT, compress=True),
+        position=ahead + 1, retry_after=math.ceil(wait), retry_ms=round(wait * 1000),
+    )
+
+
+def _wait(conference_id, ahead):
+    """Seconds until the ``ahead`` tickets before one have been saved and a slot is likely free."""
+    save = cache.get(_save_time_key(conference_id), SAVE_SECONDS)
+    rounds = ahead // settings.SUBMISSION_CONFERENCE_CONCURRENCY + 1
+    return min(settings.SUBMISSION_RETRY_AFTER, max(settings.SUBMISSION_RETRY_MIN, rounds * save))
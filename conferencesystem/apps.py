@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ConferencesystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'conferencesystem'
+
+    def ready(self):
+        # Connect the signal handlers that keep caches, score aggregates, the search index and the
+        # co-authorship graph fresh, and queue new manuscripts for processing
+        from . import authentication, roles, catalogue, coauthors, scores, search, pipeline, events  # noqa: F401
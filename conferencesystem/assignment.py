@@ -0,0 +1,220 @@
+"""
+Batch reviewer assignment for a conference.
+
+Every paper should end up with ``per_paper`` reviewers and no reviewer may
+take more than their capacity. No affinity scores are stored, so every
+feasible pairing costs the same and the aim is to fill every paper with
+loads kept even. A first pass hands each paper to the least-loaded
+eligible reviewers, from a heap keyed on load, in
+O(papers * per_paper * log reviewers).
+
+Once conflicts or capacities bind, that pass can strand a paper whose only
+eligible reviewers are already full, although moving one of their papers
+to someone else would make room. So each paper left short is then given
+augmenting paths, as in bipartite matching: a breadth-first search from the
+paper through full reviewers and the papers they could hand over, to a
+reviewer with room. When no path is left the paper is really unfillable,
+so every paper is filled whenever the capacities allow it. The repair
+only runs for papers left short, so the usual case stays at the cost of
+the first pass. It stops as soon as no reviewer has room left, the usual
+state when capacity runs short, and a failed search rules out the
+reviewers it reached for the searches after it, so the papers that stay
+short cost about one pass over the reviewers between them.
+"""
+import heapq
+import itertools
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from .coauthors import conflict_pairs, users_by_paper
+from .events import status_events
+from .models import Reviewer
+from .roles import invalidate_roles
+
+
+@dataclass
+class AssignmentResult:
+    assignments: list = field(default_factory=list)    # (reviewer_id, paper_id) pairs to add
+    unfilled: dict = field(default_factory=dict)        # paper_id -> reviewers still missing
+
+
+def plan_assignments(paper_ids, capacities, per_paper, existing=(), conflicts=()):
+    """
+    Work out new (reviewer_id, paper_id) pairs.
+
+    ``capacities`` maps reviewer ids to the most papers each may hold,
+    ``existing`` and ``conflicts`` are sets of (reviewer_id, paper_id) pairs
+    that already exist or must never be made. Existing pairs count towards
+    both the paper's target and the reviewer's load.
+    """
+    existing = set(existing)
+    conflicts = set(conflicts)
+    load = defaultdict(int)
+    assigned = defaultdict(int)
+    for reviewer_id, paper_id in existing:
+        load[reviewer_id] += 1
+        assigned[paper_id] += 1
+
+    tiebreak = itertools.count()
+    heap = [(load[r], next(tiebreak), r) for r, cap in capacities.items() if load[r] < cap]
+    heapq.heapify(heap)
+
+    result = AssignmentResult()
+    for paper_id in paper_ids:
+        need = per_paper - assigned[paper_id]
+        skipped = []
+        while need > 0 and heap:
+            reviewer_load, _, reviewer_id = heapq.heappop(heap)
+            pair = (reviewer_id, paper_id)
+            if pair in existing or pair in conflicts:
+                skipped.append((reviewer_load, next(tiebreak), reviewer_id))
+                continue
+            result.assignments.append(pair)
+            load[reviewer_id] += 1
+            need -= 1
+            if load[reviewer_id] < capacities[reviewer_id]:
+                # Back on the heap after this paper, so nobody is picked for it twice
+                skipped.append((load[reviewer_id], next(tiebreak), reviewer_id))
+        for item in skipped:
+            heapq.heappush(heap, item)
+        if need > 0:
+            result.unfilled[paper_id] = need
+
+    if result.unfilled:
+        _repair(result, capacities, load, existing, conflicts)
+    return result
+
+
+def _repair(result, capacities, load, existing, conflicts):
+    """Fill the papers in result.unfilled along augmenting paths, moving new assignments where needed."""
+    on_paper = defaultdict(set)     # paper id -> its reviewers, existing and new
+    movable = defaultdict(set)      # reviewer id -> papers newly assigned to them, which may be handed over
+    for reviewer_id, paper_id in existing:
+        on_paper[paper_id].add(reviewer_id)
+    for reviewer_id, paper_id in result.assignments:
+        on_paper[paper_id].add(reviewer_id)
+        movable[reviewer_id].add(paper_id)
+    spare = sum(capacities[r] - load[r] for r in capacities if load[r] < capacities[r])
+    live = dict.fromkeys(capacities)    # reviewers a search may still lead to spare capacity through
+
+    for paper_id in list(result.unfilled):
+        # A paper whose search failed stays unfillable, as in bipartite matching.
+        while spare and result.unfilled[paper_id] and _augment(
+            paper_id, capacities, load, conflicts, on_paper, movable, live,
+        ):
+            result.unfilled[paper_id] -= 1
+            spare -= 1
+        if not result.unfilled[paper_id]:
+            del result.unfilled[paper_id]
+
+    result.assignments = [
+        (reviewer_id, paper_id) for reviewer_id, papers in movable.items() for paper_id in sorted(papers)
+    ]
+
+
+def _augment(paper_id, capacities, load, conflicts, on_paper, movable, live):
+    """
+    Give ``paper_id`` one more reviewer along a shortest augmenting path,
+    ending at the least-loaded reviewer with room; False when there is none.
+
+    Each reviewer is looked at once per search. A failed search drops the
+    reviewers it reached from ``live``: they are full and every path through
+    them was tried, which no later augmentation changes, so later searches
+    skip them and a search costs less the more of them fail.
+    """
+    unseen = list(live)
+    takes = {}                      # reviewer id -> paper they would take on the path
+    handed_over_by = {paper_id: None}  # paper id -> reviewer giving it up on the path
+    queue = deque([paper_id])
+    while queue and unseen:
+        paper = queue.popleft()
+        eligible, skipped = [], []
+        for reviewer_id in unseen:
+            if reviewer_id in on_paper[paper] or (reviewer_id, paper) in conflicts:
+                skipped.append(reviewer_id)
+            else:
+                eligible.append(reviewer_id)
+        unseen = skipped
+        free = [reviewer_id for reviewer_id in eligible if load[reviewer_id] < capacities[reviewer_id]]
+        if free:
+            reviewer_id = min(free, key=load.__getitem__)
+            takes[reviewer_id] = paper
+            load[reviewer_id] += 1
+            # Walk back: each reviewer takes their paper, and the one who handed it over is free for theirs.
+            while reviewer_id is not None:
+                paper = takes[reviewer_id]
+                on_paper[paper].add(reviewer_id)
+                movable[reviewer_id].add(paper)
+                giver = handed_over_by[paper]
+                if giver is not None:
+                    on_paper[paper].discard(giver)
+                    movable[giver].discard(paper)
+                reviewer_id = giver
+            return True
+        for reviewer_id in eligible:
+            takes[reviewer_id] = paper
+            for other in movable[reviewer_id]:
+                if other not in handed_over_by:
+                    handed_over_by[other] = reviewer_id
+                    queue.append(other)
+    for reviewer_id in takes:
+        del live[reviewer_id]
+    return False
+
+
+def assign_reviewers(conference, users, per_paper, capacity, capacities=None):
+    """
+    Assign ``users`` as reviewers across every paper of ``conference`` and
+    write the new Reviewer.papers rows in bulk, in one transaction.
+
+    ``capacity`` is the default papers-per-reviewer quota, ``capacities``
+    optionally overrides it per user id. Nobody is assigned a paper they
+    are conflicted with: their own, or one within COI_HOPS co-authorship
+    hops of its authors.
+    """
+    capacities = capacities or {}
+    Through = Reviewer.papers.through
+
+    with transaction.atomic():
+        user_ids = {user.id for user in users}
+        reviewers = dict(Reviewer.objects.filter(user_id__in=user_ids).values_list('user_id', 'id'))
+        missing = user_ids - reviewers.keys()
+        if missing:
+            Reviewer.objects.bulk_create([Reviewer(user_id=user_id) for user_id in missing])
+            reviewers = dict(Reviewer.objects.filter(user_id__in=user_ids).values_list('user_id', 'id'))
+
+        paper_ids = list(conference.paper_set.order_by('id').values_list('id', flat=True))
+        existing = set(
+            Through.objects.filter(paper__conference=conference, reviewer_id__in=reviewers.values())
+            .values_list('reviewer_id', 'paper_id')
+        )
+        conflicts = {
+            (reviewers[user_id], paper_id)
+            for user_id, paper_id in conflict_pairs(user_ids, users_by_paper(conference.paper_set.values('id')))
+        }
+
+        result = plan_assignments(
+            paper_ids,
+            {reviewer_id: capacities.get(user_id, capacity) for user_id, reviewer_id in reviewers.items()},
+            per_paper,
+            existing=existing,
+            conflicts=conflicts,
+        )
+
+        Through.objects.bulk_create(
+            [Through(reviewer_id=reviewer_id, paper_id=paper_id) for reviewer_id, paper_id in result.assignments],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        papers = conference.paper_set.filter(status='submitted', reviewer__isnull=False)
+        paper_ids = list(papers.values_list('id', flat=True).distinct())
+        # update() sends no post_save for events._paper_saved; no other Paper hook watches the status
+        status_events(paper_ids, 'under_review')
+        conference.paper_set.filter(id__in=paper_ids).update(status='under_review')
+
+    # bulk_create sends no m2m_changed signals
+    invalidate_roles(user_ids)
+
+    return result
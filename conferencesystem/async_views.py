@@ -0,0 +1,264 @@
+"""
+Async versions of the read-only views.
+
+When settings.ASYNC_VIEWS is on (project/asgi.py turns it on), urls.py
+routes these in place of their counterparts in views.py. Under ASGI they
+then run on the event loop instead of taking a thread each. Queries go
+through the async ORM. In Django 4.2 that still runs every query on the
+one thread-sensitive executor, one after another, so they are simply
+awaited in turn. Template rendering may still touch lazy querysets, such
+as the cached fragments of the catalogue pages, so it runs via
+sync_to_async.
+
+Django 4.2 has no async login_required or request.auser(), hence the small
+helpers below.
+
+paper_events is async under either deployment: it is the server-sent
+events stream of conferencesystem.events.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import catalogue
+from .events import broker, format_message, latest_event_id, missed_events
+from .middleware import query_budget
+from .models import Conference, Paper
+from .replicas import reading_primary
+from .roles import get_roles
+from .views import PaperBoard
+
+arender = sync_to_async(render)
+aget_roles = sync_to_async(get_roles)
+
+
+async def ais_authenticated(request):
+    # Evaluating request.user loads the session and user rows, which is sync-only.
+    return await sync_to_async(lambda: request.user.is_authenticated)()
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404('No {0} matches the given query.'.format(queryset.model._meta.object_name))
+
+
+def alogin_required(view_func):
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if not await ais_authenticated(request):
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def _catalogue_validators(request, scope):
+    etag = catalogue.etag(request, scope)
+    if etag is None:
+        return None, None, None     # no shared cache to keep versions in
+    last_modified = catalogue.last_modified(request, scope)
+    return (
+        quote_etag(etag),
+        last_modified and int(last_modified.timestamp()),
+        catalogue.page_key(scope),
+    )
+
+
+async def _catalogue_page(request, scope, build):
+    """The async counterpart of @condition plus @catalogue.cache_anonymous_page."""
+    etag, last_modified, key = await sync_to_async(_catalogue_validators)(request, scope)
+    anonymous = key is not None and not await ais_authenticated(request)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content = await cache.aget(key) if anonymous else None
+        if content is not None:
+            response = HttpResponse(content)
+        elif etag is None:
+            response = await build()
+        else:
+            with reading_primary():     # it, or its fragments, will be cached
+                response = await build()
+            if anonymous and response.status_code == 200:
+                await cache.aset(key, response.content, settings.CATALOGUE_CACHE_TIMEOUT)
+
+    if etag and response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+@query_budget(3)
+async def conferences(request):
+    scope = catalogue.CATALOGUE
+
+    async def build():
+        context = {
+            'conferences': Conference.objects.all(),     # only evaluated when the cached list fragment is stale
+            'catalogue_version': await sync_to_async(catalogue.get_version)(scope),
+            'cache_timeout': catalogue.fragment_timeout(),
+        }
+        return await arender(request, 'view_conferences.html', context)
+
+    return await _catalogue_page(request, scope, build)
+
+
+@query_budget(7)
+async def conference_details(request, conference_id):
+    async def build():
+        conference = await aget_object_or_404(Conference.objects.all(), id=conference_id)
+        user_is_program_chair = False
+        if await ais_authenticated(request):
+            user_is_program_chair = (await aget_roles(request)).is_chair(conference)
+
+        context = {
+            'conference': conference,
+            'submissions_open': conference.submissions_open(),
+            'user_is_program_chair': user_is_program_chair,
+            'conference_version': await sync_to_async(catalogue.get_version)(conference.id),
+            'cache_timeout': catalogue.fragment_timeout(),
+        }
+        return await arender(request, 'conference_details.html', context)
+
+    return await _catalogue_page(request, conference_id, build)
+
+
+@alogin_required
+@query_budget(9)
+async def paper_detail(request, paper_id):
+    papers = Paper.objects.select_related('conference', 'track').prefetch_related('authors__user')
+    paper = await aget_object_or_404(papers, id=paper_id)
+    roles = await aget_roles(request)
+
+    user_is_program_chair = roles.is_chair(paper.conference_id)
+
+    if not user_is_program_chair and not roles.is_author(paper):
+        return HttpResponseForbidden('You are not authorized.')
+
+    user_is_reviewer = roles.is_reviewer(paper)
+
+    review_exists = user_is_reviewer and await paper.review_set.filter(reviewer__user=request.user).aexists()
+
+    context = {
+        'paper': paper,
+        'submissions_open': paper.conference.submissions_open(),
+        'user_is_program_chair': user_is_program_chair,
+        'user_is_reviewer': user_is_reviewer,
+        'review_exists': review_exists,
+    }
+
+    return await arender(request, 'paper_detail.html', context)
+
+
+@alogin_required
+@query_budget(3)
+async def view_user_papers(request):
+    papers = Paper.objects.filter(authors__user=request.user).select_related('conference', 'track')
+    papers = [paper async for paper in papers]
+
+    return await arender(request, 'view_user_papers.html', {'papers': papers})
+
+
+@alogin_required
+@query_budget(8)
+async def view_conference_papers(request, conference_id):
+    board = PaperBoard(request)
+    conference = await aget_object_or_404(Conference.objects.all(), id=conference_id)
+
+    if not (await aget_roles(request)).is_chair(conference):
+        return HttpResponseForbidden("You are not authorized.")
+
+    tracks = [track async for track in conference.track_set.order_by('id')]
+    papers = [paper async for paper in board.papers(conference)]
+
+    context = {
+        'conference': conference,
+        'papers_by_track': board.group(request, tracks, papers),
+        'tracks': tracks,
+        'statuses': Paper.STATUS_CHOICES,
+        'selected_track': board.track,
+        'selected_status': board.status,
+    }
+
+    return await arender(request, 'view_conf_papers.html', context)
+
+
+def _event_cursor(request):
+    """The id a reconnecting browser last saw (None for a new stream), and the id to continue after."""
+    try:
+        last_seen = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_seen = None
+    return last_seen, last_seen if last_seen is not None else latest_event_id()
+
+
+@alogin_required
+@query_budget(5)
+async def paper_events(request):
+    user = request.user
+    last_seen, cursor = await sync_to_async(_event_cursor)(request)
+    missed = await sync_to_async(missed_events)(user, last_seen) if last_seen is not None else []
+    more = len(missed) == settings.EVENT_BATCH_SIZE     # a full page: there may be more after it
+    if missed:
+        cursor = missed[-1][0]
+
+    if not isinstance(request, ASGIRequest):
+        # No relay without an event loop: send what was missed and let the browser come back,
+        # at once while it is a page or more behind.
+        retry = 0 if more else settings.EVENT_WSGI_RETRY * 1000
+        content = 'retry: {0}\nid: {1}\n\n'.format(retry, cursor)
+        response = HttpResponse(content + ''.join(map(format_message, missed)), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    async def stream():
+        queue = broker.subscribe(user.pk, cursor)
+        loop = asyncio.get_running_loop()
+        # Django 4.2 does not notice a client that left mid-stream, so a stream ends in
+        # time either way and a browser still there reconnects.
+        end = loop.time() + settings.EVENT_STREAM_LIFETIME
+        try:
+            # The id sets where a reconnect resumes from, even before any event arrives.
+            yield 'retry: {0}\nid: {1}\n\n'.format(settings.EVENT_RETRY * 1000, cursor)
+            for message in missed:
+                yield format_message(message)
+            last_id = cursor
+            # The relay may be past the missed events already; page through the rest before
+            # taking events from the queue, which holds those since subscribing.
+            full = more
+            while full:
+                page = await sync_to_async(missed_events)(user, last_id)
+                full = len(page) == settings.EVENT_BATCH_SIZE
+                for message in page:
+                    last_id = message[0]
+                    yield format_message(message)
+            while loop.time() < end:
+                try:
+                    message = await asyncio.wait_for(queue.get(), min(settings.EVENT_KEEPALIVE, end - loop.time()))
+                except asyncio.TimeoutError:
+                    if loop.time() < end:
+                        yield ': keepalive\n\n'     # a comment, so proxies do not close an idle stream
+                    continue
+                if message is None:
+                    break       # fell too far behind; the browser reconnects with Last-Event-ID
+                if message[0] > last_id:
+                    last_id = message[0]
+                    yield format_message(message)
+        finally:
+            broker.unsubscribe(user.pk, queue)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'    # nginx: pass events on as they come
+    return response
@@ -0,0 +1,97 @@
+"""
+Cached resolution of request.user.
+
+With the cached_db session engine the session is read from the cache, and
+CachedModelBackend.get_user() reads the User from the cache too, so a
+signed-in request on a warm cache resolves request.user without a query.
+
+Cached users are version-stamped the way roles are (see
+conferencesystem.roles). Each entry carries the user's version. The
+signal handlers below drop that version whenever the User row is saved or
+deleted, which covers password, is_active, is_staff and is_superuser
+changes, and whenever the user's groups or permissions change, so a stale
+entry is never used. The version is dropped again when the transaction
+commits, as until then other requests still read the old row.
+queryset.update() on users sends no signals; call invalidate_users() after
+one.
+
+Entries are pickled User instances under short ASCII keys, for memcached
+or Redis shared by several processes. Users are only cached when
+CACHE_SHARED says every process sees the same cache: a deactivation or
+password change made in one process must sign the user out in all of
+them, so with a per-process cache every request reads the row.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import User
+from .replicas import reading_primary
+
+
+def _version_key(user_id):
+    return 'user:version:{0}'.format(user_id)
+
+
+def _user_key(user_id):
+    return 'user:{0}'.format(user_id)
+
+
+def get_cached_user(user_id):
+    """Return the User with ``user_id``, from the cache when its entry is current, or None."""
+    if not settings.CACHE_SHARED:
+        return User._default_manager.filter(pk=user_id).first()
+
+    version_key, user_key = _version_key(user_id), _user_key(user_id)
+    cached = cache.get_many([version_key, user_key])
+    version = cached.get(version_key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(version_key, version, None)
+    elif user_key in cached and cached[user_key][0] == version:
+        return cached[user_key][1]
+
+    with reading_primary():     # a lagging replica would cache the old row under the new version
+        user = User._default_manager.filter(pk=user_id).first()
+    if user is not None:
+        cache.set(user_key, (version, user), getattr(settings, 'USER_CACHE_TIMEOUT', 300))
+    return user
+
+
+def invalidate_users(user_ids):
+    """Drop the cached rows of ``user_ids``, now and again when the current transaction commits."""
+    keys = [_version_key(user_id) for user_id in set(user_ids)]
+    cache.delete_many(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user(), called for every signed-in request, reads through the user cache."""
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+
+@receiver([post_save, post_delete], sender=User)
+def _user_changed(sender, instance, **kwargs):
+    invalidate_users([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def _user_access_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_users([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_users(instance.user_set.values_list('pk', flat=True))
+    else:
+        invalidate_users(pk_set)
@@ -0,0 +1,40 @@
+"""
+SQLite for many concurrent writers.
+
+Django's SQLite backend with two OPTIONS that only arrive in Django 5.1,
+so the settings keep working after an upgrade to the stock backend:
+
+    init_command        ';'-separated statements run on every new
+                        connection, e.g. the journal_mode and synchronous pragmas
+    transaction_mode    'DEFERRED', 'IMMEDIATE' or 'EXCLUSIVE', used to
+                        BEGIN every atomic block
+
+A DEFERRED transaction that reads and then writes must upgrade its lock.
+If another connection is writing at that point, SQLite fails at once with
+"database is locked" rather than waiting out the busy timeout, because
+waiting could deadlock. An IMMEDIATE transaction takes the write lock at
+BEGIN, where the busy timeout applies, so writers queue up instead.
+"""
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.init_command = params.pop('init_command', None)
+        self.transaction_mode = (params.pop('transaction_mode', None) or 'DEFERRED').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ValueError("transaction_mode must be one of {0}.".format(', '.join(TRANSACTION_MODES)))
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for statement in (self.init_command or '').split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN " + self.transaction_mode)
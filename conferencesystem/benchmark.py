@@ -0,0 +1,361 @@
+"""
+Load test of every route in conferencesystem/urls.py.
+
+Each route has a scenario: the role it is requested as, and how its URL
+and data are built for a paper picked from a seeded sample of the
+database (normally one filled by synthetic.generate()). run_benchmark()
+sends each scenario's requests through the test client from concurrent
+worker threads, counting the queries of every request. It reports latency
+percentiles, throughput and query counts per route. compare() checks such
+a report against a saved baseline. Wall-clock metrics may grow by a
+threshold, query counts and errors may not grow at all.
+
+Routes without a scenario make run_benchmark() fail, so adding a view
+without a benchmark does not go unnoticed.
+
+run_submission_stress() is the deadline surge instead: every submitter
+posts a paper to submit_paper at the same moment, from a thread of its
+own, and it counts what failed, "database is locked" errors in particular.
+Submitters told to wait in line (see conferencesystem.admission) come back
+when the page's script would, so their latency includes the wait.
+"""
+import datetime
+import random
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client
+from django.urls import get_resolver, reverse
+
+from .models import Chair, Conference, Paper, Reviewer, Track, Upload, User
+from .submission import PaperAuthor
+from .synthetic import WORDS
+
+SAMPLE_SIZE = 50
+LATENCY_METRICS = ('p50_ms', 'p95_ms')
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+
+
+@dataclass(frozen=True)
+class Target:
+    paper: int
+    track: int
+    conference: int
+    chair: int          # user ids
+    author: int
+    reviewer: int
+    reviewer_id: int
+    upload: str         # token of an unfinished upload owned by the author
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str           # URL name
+    role: str           # 'anonymous', 'chair', 'author' or 'reviewer'
+    build: object       # (target, rng) -> (path, data)
+    method: str = 'get'
+    fresh_session: bool = False     # for views that end the session
+
+
+def _url(name, **kwargs):
+    return reverse('conferencesystem:' + name, kwargs=kwargs)
+
+
+SCENARIOS = [
+    Scenario('index', 'anonymous', lambda t, rng: (_url('index'), {})),
+    Scenario('conferences', 'anonymous', lambda t, rng: (_url('conferences'), {})),
+    Scenario('signup', 'anonymous', lambda t, rng: (_url('signup'), {})),
+    Scenario('login', 'anonymous', lambda t, rng: (_url('login'), {})),
+    Scenario('profile', 'author', lambda t, rng: (_url('profile'), {})),
+    Scenario('logout', 'author', lambda t, rng: (_url('logout'), {}), fresh_session=True),
+    Scenario('view_user_papers', 'author', lambda t, rng: (_url('view_user_papers'), {})),
+    Scenario('search_papers', 'chair', lambda t, rng: (_url('search_papers'), {'q': rng.choice(WORDS)})),
+    Scenario('user_lookup', 'chair', lambda t, rng: (_url('user_lookup'), {'q': 'reviewer{0}'.format(rng.randint(1, 9))})),
+    Scenario('reviewer_inbox', 'reviewer', lambda t, rng: (_url('reviewer_inbox'), {})),
+    Scenario('paper_events', 'author', lambda t, rng: (_url('paper_events'), {})),     # WSGI: replays and ends
+    Scenario('paper_detail', 'author', lambda t, rng: (_url('paper_detail', paper_id=t.paper), {})),
+    Scenario('download_paper', 'author', lambda t, rng: (_url('download_paper', paper_id=t.paper), {})),
+    Scenario('review_paper', 'reviewer', lambda t, rng: (_url('review_paper', paper_id=t.paper), {})),
+    Scenario('add_reviewers', 'chair', lambda t, rng: (_url('add_reviewers', paper_id=t.paper), {})),
+    Scenario('remove_reviewer', 'chair', lambda t, rng: (
+        _url('remove_reviewer', paper_id=t.paper, reviewer_id=t.reviewer_id), {})),     # GET changes nothing
+    Scenario('conference_details', 'anonymous', lambda t, rng: (
+        _url('conference_details', conference_id=t.conference), {})),
+    Scenario('submit_paper', 'author', lambda t, rng: (_url('submit_paper', conference_id=t.conference), {})),
+    Scenario('create_upload', 'author', lambda t, rng: (
+        _url('create_upload', conference_id=t.conference), {'filename': 'paper.pdf', 'size': 1000}), method='post'),
+    Scenario('upload_chunk', 'author', lambda t, rng: (_url('upload_chunk', token=t.upload), {})),
+    Scenario('view_conf_papers', 'chair', lambda t, rng: (_url('view_conf_papers', conference_id=t.conference), {})),
+    Scenario('export_papers', 'chair', lambda t, rng: (
+        _url('export_papers', conference_id=t.conference), {'track': t.track})),
+    Scenario('conference_ranking', 'chair', lambda t, rng: (
+        _url('conference_ranking', conference_id=t.conference), {})),
+    Scenario('decide_papers', 'chair', lambda t, rng: (_url('decide_papers', conference_id=t.conference), {})),
+    Scenario('conference_conflicts', 'chair', lambda t, rng: (
+        _url('conference_conflicts', conference_id=t.conference), {})),
+    Scenario('assign_reviewers', 'chair', lambda t, rng: (
+        _url('assign_reviewers', conference_id=t.conference), {})),
+]
+
+
+def route_names():
+    resolver = get_resolver().namespace_dict['conferencesystem'][1]
+    return {pattern.name for pattern in resolver.url_patterns if pattern.name}
+
+
+def load_targets(seed=0, size=SAMPLE_SIZE):
+    """Sample up to ``size`` papers that have a chair, an author and a reviewer, with their ids."""
+    rng = random.Random(seed)
+    bounds = Paper.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return []
+    population = range(bounds['low'], bounds['high'] + 1)
+    ids = rng.sample(population, min(len(population), size * 4))
+
+    papers = {paper['id']: paper for paper in Paper.objects.filter(id__in=ids).values('id', 'track_id', 'conference_id')}
+    chairs = dict(
+        Chair.conferences.through.objects.filter(conference_id__in={p['conference_id'] for p in papers.values()})
+        .values_list('conference_id', 'chair__user_id')
+    )
+    authors = dict(PaperAuthor.objects.filter(paper_id__in=papers).values_list('paper_id', 'author__user_id'))
+    reviewers = {
+        paper_id: (reviewer_id, user_id)
+        for paper_id, reviewer_id, user_id in Reviewer.papers.through.objects.filter(paper_id__in=papers)
+        .values_list('paper_id', 'reviewer_id', 'reviewer__user_id')
+    }
+
+    targets = []
+    for paper_id in ids:
+        paper = papers.get(paper_id)
+        if not paper or paper['conference_id'] not in chairs or paper_id not in authors or paper_id not in reviewers:
+            continue
+        upload = Upload.objects.create(
+            user_id=authors[paper_id], conference_id=paper['conference_id'], filename='paper.pdf', size=1000,
+        )
+        targets.append(Target(
+            paper=paper_id, track=paper['track_id'], conference=paper['conference_id'],
+            chair=chairs[paper['conference_id']], author=authors[paper_id],
+            reviewer=reviewers[paper_id][1], reviewer_id=reviewers[paper_id][0], upload=str(upload.token),
+        ))
+        if len(targets) == size:
+            break
+    return targets
+
+
+class _Worker:
+    """One simulated user agent: signed-in clients per user, and a query counter on its thread's connection."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.clients = {}
+        self.queries = 0
+
+    def client(self, user_id, fresh=False):
+        if fresh or user_id not in self.clients:
+            client = Client()
+            if user_id is not None:
+                client.force_login(User.objects.get(pk=user_id))
+            if fresh:
+                return client
+            self.clients[user_id] = client
+        return self.clients[user_id]
+
+    def count(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def request(self, scenario, targets):
+        target = self.rng.choice(targets)
+        client = self.client(getattr(target, scenario.role, None), scenario.fresh_session)
+        path, data = scenario.build(target, self.rng)
+
+        self.queries = 0
+        start = time.perf_counter()
+        with connection.execute_wrapper(self.count):
+            response = getattr(client, scenario.method)(path, data)
+            if response.streaming:
+                for chunk in response:
+                    pass
+        return time.perf_counter() - start, self.queries, response.status_code < 400
+
+
+def _run_worker(scenario, targets, seed, count, own_thread):
+    worker = _Worker(seed)
+    try:
+        worker.request(scenario, targets)    # warm up caches and sessions
+        return [worker.request(scenario, targets) for _ in range(count)]
+    finally:
+        if own_thread:
+            connection.close()
+
+
+def run_scenario(scenario, targets, requests, concurrency, seed=0):
+    counts = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        samples = _run_worker(scenario, targets, seed, requests, own_thread=False)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [
+                pool.submit(_run_worker, scenario, targets, seed + i, count, True)
+                for i, count in enumerate(counts)
+            ]
+            samples = [sample for future in futures for sample in future.result()]
+    elapsed = time.perf_counter() - start
+
+    latencies = [duration * 1000 for duration, queries, ok in samples if ok]
+    queries = [queries for duration, queries, ok in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for duration, queries, ok in samples if not ok),
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'mean_ms': statistics.fmean(latencies) if latencies else 0.0,
+        'queries_mean': statistics.fmean(queries) if queries else 0.0,
+        'queries_max': max(queries, default=0),
+    }
+
+
+def run_benchmark(requests=200, concurrency=8, seed=0, routes=None, log=None):
+    """Benchmark every route (or just ``routes``) and return {route name: metrics}."""
+    missing = route_names() - {scenario.name for scenario in SCENARIOS}
+    if missing:
+        raise ValueError("No benchmark scenario for: {0}".format(', '.join(sorted(missing))))
+
+    targets = load_targets(seed)
+    if not targets:
+        raise ValueError("No paper with a chair, an author and a reviewer to benchmark with.")
+
+    results = {}
+    for scenario in SCENARIOS:
+        if routes and scenario.name not in routes:
+            continue
+        if log:
+            log(scenario.name)
+        results[scenario.name] = run_scenario(scenario, targets, requests, concurrency, seed)
+    return results
+
+
+def compare(baseline, current, threshold=0.25, min_delta_ms=1.0):
+    """
+    Return the regressions of ``current`` against ``baseline`` as strings.
+
+    Latency percentiles may grow by ``threshold`` (a fraction) and at least
+    ``min_delta_ms``, and throughput may drop by ``threshold``. Query counts
+    and errors are deterministic, so any increase is a regression.
+    """
+    regressions = []
+    for name, before in sorted(baseline.items()):
+        after = current.get(name)
+        if after is None:
+            continue
+        for metric in LATENCY_METRICS:
+            if after[metric] > before[metric] * (1 + threshold) and after[metric] - before[metric] > min_delta_ms:
+                regressions.append('{0}: {1} {2:.1f} -> {3:.1f}'.format(name, metric, before[metric], after[metric]))
+        if after['throughput'] < before['throughput'] * (1 - threshold):
+            regressions.append('{0}: throughput {1:.1f} -> {2:.1f} req/s'.format(
+                name, before['throughput'], after['throughput']))
+        for metric in ('queries_max', 'errors'):
+            if after[metric] > before[metric]:
+                regressions.append('{0}: {1} {2} -> {3}'.format(name, metric, before[metric], after[metric]))
+    return regressions
+
+
+def create_submitters(count):
+    """Create a conference open for submissions, a track and ``count`` users; return (conference, track, user ids)."""
+    today = datetime.date.today()
+    conference = Conference.objects.create(
+        title='Deadline Surge', organizing_institute='Benchmark Institute', institute_details='',
+        description='', start_date=today, end_date=today + datetime.timedelta(days=1),
+    )
+    track = Track.objects.create(conference=conference, title='Main', description='')
+    password = make_password(None)
+    users = User.objects.bulk_create([
+        User(email='submitter{0}@bench.example'.format(n), phone='+916{0:09d}'.format(n), password=password)
+        for n in range(count)
+    ])
+    return conference, track, [user.id for user in users]
+
+
+def _hidden_value(html, name):
+    match = re.search(r'name="{0}" value="([^"]*)"'.format(name), html)
+    return match.group(1) if match else ''
+
+
+def _submit(conference_id, track_id, user_id, barrier):
+    client = Client(raise_request_exception=False)
+    client.force_login(User.objects.get(pk=user_id))
+    path = _url('submit_paper', conference_id=conference_id)
+    data = {
+        'title': 'Surge paper {0}'.format(user_id), 'abstract': 'Submitted at the deadline.', 'track': track_id,
+        'file': SimpleUploadedFile('paper.pdf', b'%PDF-1.4 ' + str(user_id).encode()),
+    }
+    attempts = 0
+    try:
+        barrier.wait()
+        start = time.perf_counter()
+        while True:
+            attempts += 1
+            response = client.post(path, data)
+            if response.status_code != 503 or not response.has_header('Retry-After'):
+                break
+            # In line: come back when told to, with the ticket and the kept manuscript, like the page's script.
+            # (Read from the page: response.context is shared between the threads.)
+            html = response.content.decode()
+            ticket = _hidden_value(html, 'admission_ticket')
+            if ticket:
+                data = {**data, 'file': '', 'admission_ticket': ticket, 'upload_token': _hidden_value(html, 'upload_token')}
+            else:
+                data['file'].seek(0)
+            time.sleep(int(re.search(r'data-retry-ms="(\d+)"', html).group(1)) / 1000)
+        duration = time.perf_counter() - start
+        if response.status_code == 302:
+            return duration, attempts, None
+        exc_info = getattr(response, 'exc_info', None)
+        if exc_info:
+            return duration, attempts, str(exc_info[1])
+        errors = re.findall(r'<ul class="errorlist"><li>(.*?)</li>', response.content.decode())
+        return duration, attempts, ' '.join(['HTTP {0}'.format(response.status_code)] + errors)
+    finally:
+        connection.close()
+
+
+def run_submission_stress(conference_id, track_id, user_ids):
+    """Submit a paper for each of ``user_ids`` at once, retrying while in line; return the outcome and latencies."""
+    barrier = threading.Barrier(len(user_ids), timeout=120)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(user_ids)) as pool:
+        futures = [pool.submit(_submit, conference_id, track_id, user_id, barrier) for user_id in user_ids]
+        samples = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    errors = [error for duration, attempts, error in samples if error]
+    latencies = [duration * 1000 for duration, attempts, error in samples if not error]
+    return {
+        'submitters': len(user_ids),
+        'submitted': len(latencies),
+        'queued': sum(1 for duration, attempts, error in samples if attempts > 1),
+        'errors': errors,
+        'lock_errors': sum(1 for error in errors if 'locked' in error),
+        'elapsed': elapsed,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+    }
@@ -0,0 +1,117 @@
+"""
+Caching for the public conference catalogue.
+
+The catalogue as a whole and each conference have a version stamp in the
+cache, which is the time of their last change in nanoseconds. Saving or
+deleting a Conference bumps both the catalogue and that conference, and
+saving or deleting a Track bumps its conference. The stamps are used for:
+
+  * ETag / Last-Modified validators, so a repeat visitor gets a 304 built
+    from the cache alone,
+  * cache keys of the full pages served to anonymous visitors, and
+  * cache keys of the template fragments shared by signed-in users.
+
+A stamp bumped in one process only reaches the others through a shared
+cache, so without one (see CACHE_SHARED) none of this is used: pages are
+sent without validators, built afresh, and their fragments are not kept.
+With one, pages are built from the primary, as what they read is cached
+under the new stamps (see conferencesystem.replicas).
+"""
+import datetime
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .models import Conference, Track
+from .replicas import reading_primary
+from .roles import get_roles_version
+
+CATALOGUE = 'all'
+
+
+def _version_key(scope):
+    return 'catalogue:version:{0}'.format(scope)
+
+
+def get_version(scope):
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*scopes):
+    now = time.time_ns()
+    cache.set_many({_version_key(scope): now for scope in scopes}, None)
+
+
+def page_key(scope):
+    return 'catalogue:page:{0}:{1}'.format(scope, get_version(scope))
+
+
+def fragment_timeout():
+    """The timeout of the catalogue's template fragments, 0 to not keep them."""
+    return settings.CATALOGUE_CACHE_TIMEOUT if settings.CACHE_SHARED else 0
+
+
+def etag(request, scope):
+    if not settings.CACHE_SHARED:
+        return None
+    tag = str(get_version(scope))
+    if request.user.is_authenticated:
+        # Signed-in users see their chair status and, while submissions are open (see
+        # Conference.submissions_open), the Submit Paper link, so their copy also depends
+        # on their roles and the date.
+        tag += '-{0}-{1}-{2}'.format(
+            request.user.pk, get_roles_version(request.user.pk), timezone.now().date().isoformat(),
+        )
+    return tag
+
+
+def last_modified(request, scope):
+    if request.user.is_authenticated or not settings.CACHE_SHARED:
+        return None
+    return datetime.datetime.fromtimestamp(get_version(scope) / 10 ** 9, tz=datetime.timezone.utc)
+
+
+def cache_anonymous_page(scope_func):
+    """Serve anonymous GETs of a view from the cache, keyed by the current version of ``scope_func(**kwargs)``."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not settings.CACHE_SHARED:
+                return view_func(request, *args, **kwargs)
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                with reading_primary():     # for the fragments it caches
+                    return view_func(request, *args, **kwargs)
+
+            key = page_key(scope_func(**kwargs))
+            content = cache.get(key)
+            if content is not None:
+                return HttpResponse(content)
+
+            with reading_primary():
+                response = view_func(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.content, settings.CATALOGUE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+@receiver([post_save, post_delete], sender=Conference)
+def _conference_changed(sender, instance, **kwargs):
+    bump_version(CATALOGUE, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Track)
+def _track_changed(sender, instance, **kwargs):
+    bump_version(instance.conference_id)
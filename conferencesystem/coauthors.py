@@ -0,0 +1,216 @@
+"""
+The co-authorship graph, for conflict-of-interest checks.
+
+Coauthorship holds one row per ordered pair of users who share a paper,
+with the number of papers they share. A user's co-authors are then one
+index range, instead of a walk over Author.papers and Paper.authors.
+Reviewers within COI_HOPS co-authorship hops of any author of a paper are
+conflicted with it: 1 means its authors and their direct co-authors.
+
+The table is kept up to date incrementally. When a paper's authors change,
+the handlers below compare the paper's set of author users before and
+after the change, and add or subtract one paper on every pair with a user
+who joined or left. Adding one author to a consortium paper therefore
+costs its number of authors, not their square. Writes that bypass signals, such as bulk_create of the through rows,
+call record_new_papers() themselves. `manage.py rebuild_coauthors`
+recomputes the whole table.
+"""
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import Author, Coauthorship, Paper, Reviewer
+
+PaperAuthor = Paper.authors.through
+TABLE = Coauthorship._meta.db_table
+
+_ADD = (
+    f"INSERT INTO {TABLE} (user_id, coauthor_id, papers) VALUES (%s, %s, %s) "
+    f"ON CONFLICT (user_id, coauthor_id) DO UPDATE SET papers = {TABLE}.papers + excluded.papers"
+)
+# An UPDATE, not the upsert: the edge may already be gone with a deleted user.
+_SUBTRACT = f"UPDATE {TABLE} SET papers = papers - %s WHERE user_id = %s AND coauthor_id = %s"
+CHUNK_SIZE = 5000
+
+
+def users_by_paper(paper_ids):
+    """Return {paper id: set of author user ids} for ``paper_ids``."""
+    users = defaultdict(set)
+    for paper_id, user_id in PaperAuthor.objects.filter(paper_id__in=paper_ids).values_list('paper_id', 'author__user_id'):
+        users[paper_id].add(user_id)
+    return users
+
+
+def _count_pairs(delta, changed, users, step):
+    """Add ``step`` to both directions of every pair of a user in ``changed`` with another of ``users``."""
+    for user_id in changed:
+        for other in users:
+            if other != user_id:
+                delta[user_id, other] += step
+                if other not in changed:    # otherwise counted from its own side
+                    delta[other, user_id] += step
+
+
+def pair_changes(before, after):
+    """Return a Counter of the papers each (user id, co-author id) pair gains, negative for those it loses."""
+    delta = Counter()
+    for paper_id in before.keys() | after.keys():
+        old, new = set(before.get(paper_id, ())), set(after.get(paper_id, ()))
+        _count_pairs(delta, new - old, new, 1)
+        _count_pairs(delta, old - new, old, -1)
+    return delta
+
+
+def apply_changes(before, after):
+    """
+    Update the graph for papers whose author users went from ``before`` to
+    ``after``, both {paper id: set of user ids}.
+    """
+    delta = pair_changes(before, after)
+    added = [(a, b, n) for (a, b), n in delta.items() if n > 0]
+    removed = [(-n, a, b) for (a, b), n in delta.items() if n < 0]
+    if not added and not removed:
+        return
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if added:
+            cursor.executemany(_ADD, added)
+        if removed:
+            cursor.executemany(_SUBTRACT, removed)
+            Coauthorship.objects.filter(user_id__in={a for n, a, b in removed}, papers=0).delete()
+
+
+def record_new_papers(paper_ids):
+    """Add the co-authorships of freshly bulk-created papers and their through rows."""
+    apply_changes({}, users_by_paper(paper_ids))
+
+
+def rebuild_graph():
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        cursor.execute(
+            f"INSERT INTO {TABLE} (user_id, coauthor_id, papers) "
+            f"SELECT a.user_id, b.user_id, COUNT(DISTINCT x.paper_id) "
+            f"FROM {PaperAuthor._meta.db_table} x "
+            f"JOIN {Author._meta.db_table} a ON a.id = x.author_id "
+            f"JOIN {PaperAuthor._meta.db_table} y ON y.paper_id = x.paper_id "
+            f"JOIN {Author._meta.db_table} b ON b.id = y.author_id "
+            f"WHERE a.user_id <> b.user_id "
+            f"GROUP BY a.user_id, b.user_id"
+        )
+
+
+def coauthors_of(user_ids):
+    """Return {user id: set of co-author user ids} for ``user_ids``."""
+    user_ids = list(user_ids)
+    coauthors = defaultdict(set)
+    for start in range(0, len(user_ids), CHUNK_SIZE):
+        edges = Coauthorship.objects.filter(user_id__in=user_ids[start:start + CHUNK_SIZE])
+        for user_id, coauthor_id in edges.values_list('user_id', 'coauthor_id'):
+            coauthors[user_id].add(coauthor_id)
+    return coauthors
+
+
+def _reach(user_ids, hops):
+    """Return {user id: users within ``hops`` of it, itself included}, loading each hop's edges in one go."""
+    hops = settings.COI_HOPS if hops is None else hops
+    reach = {user_id: {user_id} for user_id in user_ids}
+    frontiers = {user_id: {user_id} for user_id in user_ids}
+    graph = {}
+    for _ in range(hops):
+        if not any(frontiers.values()):
+            break
+        wanted = set().union(*frontiers.values()) - graph.keys()
+        loaded = coauthors_of(wanted)
+        graph.update((user_id, loaded.get(user_id, set())) for user_id in wanted)
+        for user_id, frontier in frontiers.items():
+            frontiers[user_id] = set().union(*(graph[near] for near in frontier)) - reach[user_id]
+            reach[user_id] |= frontiers[user_id]
+    return reach
+
+
+def is_conflicted(user_id, paper, hops=None):
+    """Whether the user is an author of ``paper`` or within ``hops`` (default COI_HOPS) co-authorship hops of one."""
+    authors = set(PaperAuthor.objects.filter(paper=paper).values_list('author__user_id', flat=True))
+    hops = settings.COI_HOPS if hops is None else hops
+    if user_id in authors or not hops:
+        return user_id in authors
+    # Walk all but the last hop from the user; the last is one indexed lookup against the authors.
+    near = _reach([user_id], hops - 1)[user_id]
+    return Coauthorship.objects.filter(user_id__in=near, coauthor_id__in=authors).exists()
+
+
+def conflict_pairs(user_ids, paper_authors, hops=None):
+    """
+    Return the (user id, paper id) pairs in conflict, for candidate reviewers
+    ``user_ids`` and ``paper_authors`` mapping paper ids to sets of author user ids.
+    """
+    # Who is near each author, inverted from who is near each candidate.
+    conflicted_with = defaultdict(set)
+    for user_id, near in _reach(user_ids, hops).items():
+        for other in near:
+            conflicted_with[other].add(user_id)
+
+    return {
+        (user_id, paper_id)
+        for paper_id, authors in paper_authors.items()
+        for author in authors
+        for user_id in conflicted_with.get(author, ())
+    }
+
+
+def conflict_report(conference, hops=None):
+    """
+    Return the conflicted reviewer assignments of ``conference`` as
+    (paper id, paper title, Reviewer id, reviewer email) rows.
+    """
+    papers = dict(conference.paper_set.values_list('id', 'title'))
+    paper_authors = users_by_paper(conference.paper_set.values('id'))
+    assigned = list(
+        Reviewer.papers.through.objects.filter(paper__conference=conference)
+        .values_list('paper_id', 'reviewer_id', 'reviewer__user_id', 'reviewer__user__email')
+    )
+    conflicts = conflict_pairs({user_id for _, _, user_id, _ in assigned}, paper_authors, hops)
+    return sorted(
+        (paper_id, papers[paper_id], reviewer_id, email)
+        for paper_id, reviewer_id, user_id, email in assigned if (user_id, paper_id) in conflicts
+    )
+
+
+@receiver(m2m_changed, sender=PaperAuthor)
+def _authors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        if not reverse:
+            paper_ids = [instance.pk]
+        elif pk_set is None:
+            paper_ids = list(instance.papers.values_list('id', flat=True))
+        else:
+            paper_ids = list(pk_set)
+        instance._coauthor_papers = users_by_paper(paper_ids), paper_ids
+    elif action in ('post_add', 'post_remove', 'post_clear') and hasattr(instance, '_coauthor_papers'):
+        before, paper_ids = instance.__dict__.pop('_coauthor_papers')
+        apply_changes(before, users_by_paper(paper_ids))
+
+
+# Deleting a paper or an author cascades to the through rows without m2m_changed.
+
+@receiver(pre_delete, sender=Paper)
+def _paper_deleting(sender, instance, **kwargs):
+    instance._coauthor_papers = users_by_paper([instance.pk]), [instance.pk]
+
+
+@receiver(pre_delete, sender=Author)
+def _author_deleting(sender, instance, **kwargs):
+    paper_ids = list(instance.papers.values_list('id', flat=True))
+    instance._coauthor_papers = users_by_paper(paper_ids), paper_ids
+
+
+@receiver(post_delete, sender=Paper)
+@receiver(post_delete, sender=Author)
+def _deleted(sender, instance, **kwargs):
+    if hasattr(instance, '_coauthor_papers'):
+        before, paper_ids = instance.__dict__.pop('_coauthor_papers')
+        apply_changes(before, users_by_paper(paper_ids))
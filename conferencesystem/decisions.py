@@ -0,0 +1,82 @@
+"""
+Bulk accept/reject decisions for a conference.
+
+A decision picks papers by rule (track, number of reviews and a range of
+mean scores), not one by one. The papers are picked once, with the status
+each has then, and moved in batches of BATCH_SIZE ids by UPDATEs
+conditional on that status: papers that already have the new status are
+not picked, and a paper another decision or an edit moved in the meantime
+is left alone, so its authors are not told twice. The authors of every
+paper that changes get a notification in the outbox, and the open event
+streams a PaperEvent, written in the same transaction.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from .events import status_events
+from .models import Notification, Paper
+from .submission import PaperAuthor
+
+DECISIONS = ('accepted', 'rejected')
+BATCH_SIZE = 1000   # papers per round of emails, events and update
+
+
+def decision_papers(conference, status, track=None, min_reviews=0, score_min=None, score_max=None):
+    """The papers of ``conference`` a decision would move to ``status``."""
+    papers = conference.paper_set.exclude(status=status)
+    if track is not None:
+        papers = papers.filter(track=track)
+    if min_reviews:
+        papers = papers.filter(score__review_count__gte=min_reviews)
+    if score_min is not None:
+        papers = papers.filter(score__score_mean__gte=score_min)
+    if score_max is not None:
+        papers = papers.filter(score__score_mean__lte=score_max)
+    return papers
+
+
+def apply_decision(conference, status, papers):
+    """Move ``papers`` (from decision_papers) to ``status`` and queue the author emails; return the count."""
+    if status not in DECISIONS:
+        raise ValueError("Unknown decision {0!r}.".format(status))
+
+    with transaction.atomic():
+        # Picked once, with the status each paper was picked in
+        picked = defaultdict(list)
+        for paper_id, current in papers.values_list('id', 'status'):
+            picked[current].append(paper_id)
+        label = dict(Paper.STATUS_CHOICES)[status]
+        updated = 0
+        for current, paper_ids in picked.items():
+            for start in range(0, len(paper_ids), BATCH_SIZE):
+                # Papers whose status changed since the pick are left alone; the rest are
+                # locked, so the conditional update below changes exactly these.
+                batch = list(
+                    Paper.objects.select_for_update().filter(id__in=paper_ids[start:start + BATCH_SIZE], status=current)
+                    .values_list('id', flat=True)
+                )
+                if not batch:
+                    continue
+                updated += Paper.objects.filter(id__in=batch, status=current).update(status=status)
+                _notify(conference, status, label, batch)
+                # update() sends no post_save for events._paper_saved
+                status_events(batch, status)
+
+        return updated
+
+
+def _notify(conference, status, label, paper_ids):
+    recipients = PaperAuthor.objects.filter(paper_id__in=paper_ids).values_list(
+        'paper_id', 'paper__title', 'author__user__email',
+    )
+    notifications = []
+    for paper_id, title, email in recipients:
+        context = {'conference': conference, 'title': title, 'status': status, 'label': label}
+        notifications.append(Notification(
+            paper_id=paper_id, recipient=email,
+            subject='{0}: your paper has been {1}'.format(conference.title, label.lower()),
+            body=render_to_string('emails/decision.txt', context),
+        ))
+    Notification.objects.bulk_create(notifications)
@@ -0,0 +1,133 @@
+"""
+Serving uploaded manuscripts.
+
+Once the view has checked permissions, the transfer itself is handed off
+according to settings.PAPER_DOWNLOAD_BACKEND:
+
+    'stream'            Django streams the file itself (runserver, tests).
+    'x-accel-redirect'  nginx serves PAPER_DOWNLOAD_ACCEL_PREFIX + file name
+                        from an `internal` location.
+    'x-sendfile'        Apache (mod_xsendfile) / lighttpd serve the file path.
+
+With the offload backends the proxy also takes care of Range requests.
+Either way, ETag and Last-Modified validators are sent and conditional
+requests are answered with 304 before the file is touched.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(stat):
+    return quote_etag('{0:x}-{1:x}'.format(stat.st_mtime_ns, stat.st_size))
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header into an inclusive (start, end) pair.
+    Return None when the header should be ignored and 'unsatisfiable' when
+    the range lies outside the file.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+
+def range_is_fresh(request, etag, mtime):
+    """Honour If-Range: only serve a partial response if the file is unchanged."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def iter_file_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_file(request, field):
+    path = field.path
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    last_modified = http_date(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = _file_response(request, field, path, stat, etag)
+    if response.status_code != 412:
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+    return response
+
+
+def _file_response(request, field, path, stat, etag):
+    backend = getattr(settings, 'PAPER_DOWNLOAD_BACKEND', 'stream')
+    filename = os.path.basename(field.name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if backend == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        prefix = getattr(settings, 'PAPER_DOWNLOAD_ACCEL_PREFIX', '/protected/')
+        response['X-Accel-Redirect'] = quote(prefix + field.name)
+    elif backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = _stream_response(request, path, stat, etag, content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = 'attachment; filename="{0}"'.format(filename)
+    return response
+
+
+def _stream_response(request, path, stat, etag, content_type):
+    size = stat.st_size
+    byte_range = None
+    if request.method == 'GET' and 'HTTP_RANGE' in request.META and range_is_fresh(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.META['HTTP_RANGE'], size)
+
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = 'bytes */{0}'.format(size)
+        return response
+
+    if byte_range is None:
+        return FileResponse(open(path, 'rb'), content_type=content_type)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(iter_file_range(path, start, length), status=206, content_type=content_type)
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = 'bytes {0}-{1}/{2}'.format(start, end, size)
+    return response
@@ -0,0 +1,195 @@
+"""
+Live paper status and review updates, pushed over server-sent events.
+
+A change worth telling is written as a PaperEvent in the same transaction
+as the change itself, like the decision emails in the outbox: a paper
+whose status changes (saved, or moved by a bulk decision) and a new
+review. Its recipients are the paper's authors and its conference's
+chairs, the users who may open the paper.
+
+Each ASGI worker runs one relay task (Broker below) while it has streams
+open. Every EVENT_POLL_INTERVAL seconds the relay reads the events
+written since its last look. That is one indexed range query, usually
+empty. It then hands each event to the open streams of the event's
+recipients. Thousands of idle streams therefore cost one query per second
+per worker, instead of each author reloading the page. Events come from
+the database, so a change made by another worker or a management command
+reaches every worker's streams.
+
+Streams send each event with its id. A browser that reconnects sends
+Last-Event-ID, and the events it missed are replayed from the table, which
+keeps EVENT_RETENTION seconds of them, a page at a time until the stream
+has caught up. A stream also ends after EVENT_STREAM_LIFETIME seconds, as
+Django does not notice a client that left mid-stream, and the browser
+reconnects if still there. Under WSGI there is no relay. The stream then
+sends a page of what was missed and ends, and the browser reconnects after
+EVENT_WSGI_RETRY seconds, which makes it a cheap poll, or at once when
+there are more pages to catch up on.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max, Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Chair, Paper, PaperEvent, Review
+from .roles import get_user_roles
+from .submission import PaperAuthor
+
+logger = logging.getLogger(__name__)
+
+ChairConference = Chair.conferences.through
+PURGE_EVERY = 60    # relay polls between deletions of expired events
+
+
+def status_events(paper_ids, status):
+    PaperEvent.objects.bulk_create(
+        [PaperEvent(paper_id=paper_id, kind='status', status=status) for paper_id in paper_ids], batch_size=1000,
+    )
+
+
+@receiver(post_save, sender=Paper)
+def _paper_saved(sender, instance, created, **kwargs):
+    stored = getattr(instance, '_stored_status', None)
+    if not created and stored is not None and stored != instance.status:
+        status_events([instance.pk], instance.status)
+    instance._stored_status = instance.status
+
+
+@receiver(post_save, sender=Review)
+def _review_saved(sender, instance, created, **kwargs):
+    if created:
+        PaperEvent.objects.create(paper_id=instance.paper_id, kind='review')
+
+
+def latest_event_id():
+    return PaperEvent.objects.aggregate(latest=Max('id'))['latest'] or 0
+
+
+def _message(event, title):
+    data = {'paper': event.paper_id, 'title': title}
+    if event.kind == 'status':
+        data.update(status=event.status, label=dict(Paper.STATUS_CHOICES).get(event.status, event.status))
+    return event.id, event.kind, data
+
+
+def missed_events(user, after):
+    """
+    The messages of events after id ``after`` for papers ``user`` authors or
+    chairs, oldest first, at most EVENT_BATCH_SIZE of them: page on from the
+    last one while a page comes back full.
+    """
+    roles = get_user_roles(user)
+    if not roles.authored_papers and not roles.chair_conferences:
+        return []
+    events = PaperEvent.objects.filter(id__gt=after).filter(
+        Q(paper_id__in=roles.authored_papers) | Q(paper__conference_id__in=roles.chair_conferences)
+    ).select_related('paper').only('id', 'kind', 'status', 'paper__title').order_by('id')
+    return [_message(event, event.paper.title) for event in events[:settings.EVENT_BATCH_SIZE]]
+
+
+def new_events(after):
+    """The messages of events after id ``after``, each with its recipients' user ids, oldest first."""
+    events = list(
+        PaperEvent.objects.filter(id__gt=after).select_related('paper')
+        .only('id', 'kind', 'status', 'paper__title', 'paper__conference_id')
+        .order_by('id')[:settings.EVENT_BATCH_SIZE]
+    )
+    if not events:
+        return []
+
+    authors = defaultdict(set)
+    for paper_id, user_id in PaperAuthor.objects.filter(
+        paper_id__in={event.paper_id for event in events},
+    ).values_list('paper_id', 'author__user_id'):
+        authors[paper_id].add(user_id)
+    chairs = defaultdict(set)
+    for conference_id, user_id in ChairConference.objects.filter(
+        conference_id__in={event.paper.conference_id for event in events},
+    ).values_list('conference_id', 'chair__user_id'):
+        chairs[conference_id].add(user_id)
+
+    return [
+        (_message(event, event.paper.title), authors[event.paper_id] | chairs[event.paper.conference_id])
+        for event in events
+    ]
+
+
+def purge_events():
+    PaperEvent.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=settings.EVENT_RETENTION)).delete()
+
+
+class Broker:
+    """The streams open in this process, fed by a relay task polling PaperEvent."""
+
+    def __init__(self):
+        self.streams = defaultdict(set)     # user id -> queues of their open streams
+        self.last_id = None
+        self.task = None
+
+    def subscribe(self, user_id, after):
+        """Open a stream for events after id ``after``, starting the relay if it is not running."""
+        queue = asyncio.Queue(maxsize=settings.EVENT_QUEUE_SIZE)
+        self.streams[user_id].add(queue)
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.last_id = after
+            self.task = loop.create_task(self.relay())
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.streams.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.streams[user_id]
+
+    def deliver(self, messages):
+        for message, user_ids in messages:
+            for user_id in user_ids & self.streams.keys():
+                for queue in list(self.streams[user_id]):
+                    try:
+                        queue.put_nowait(message)
+                    except asyncio.QueueFull:
+                        # A client this far behind reconnects and catches up from Last-Event-ID.
+                        queue.get_nowait()
+                        queue.put_nowait(None)
+
+    async def poll(self):
+        if self.last_id is None:
+            self.last_id = await sync_to_async(latest_event_id)()
+        messages = await sync_to_async(new_events)(self.last_id)
+        if messages:
+            self.last_id = messages[-1][0][0]
+            self.deliver(messages)
+        return len(messages)
+
+    async def relay(self):
+        polls = 0
+        while self.streams:
+            try:
+                if await self.poll() < settings.EVENT_BATCH_SIZE:
+                    await asyncio.sleep(settings.EVENT_POLL_INTERVAL)
+                polls += 1
+                if polls % PURGE_EVERY == 0:
+                    await sync_to_async(purge_events)()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Relaying paper events failed.")
+                await asyncio.sleep(settings.EVENT_POLL_INTERVAL)
+
+
+broker = Broker()
+
+
+def format_message(message):
+    event_id, kind, data = message
+    return 'id: {0}\nevent: {1}\ndata: {2}\n\n'.format(event_id, kind, json.dumps(data))
@@ -0,0 +1,116 @@
+"""
+Streaming ZIP export of a conference's (or a track's) manuscripts.
+
+The archive is produced on the fly by a generator. zipfile writes into a
+small in-memory pipe; after every chunk of input the pipe is drained and
+the bytes are yielded to the client. zipfile sees that the pipe cannot
+seek, so it puts each entry's CRC and sizes in a data descriptor after the
+data instead of going back to patch the header. Memory use therefore stays
+at one chunk plus one page of paper rows however large the export is, and
+the first bytes go out as soon as the manifest row for the first paper is
+written.
+
+The archive holds manifest.csv, with one row of metadata per paper, and
+each manuscript under <track>/<paper id>-<title><ext>. Manuscripts are
+already compressed PDFs, so they are stored rather than deflated.
+"""
+import csv
+import io
+import os
+import zipfile
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.text import get_valid_filename, slugify
+
+CHUNK_SIZE = 64 * 1024
+PAGE_SIZE = 500
+
+MANIFEST_FIELDS = ['id', 'title', 'track', 'status', 'authors', 'file', 'size']
+
+
+class _Pipe(io.RawIOBase):
+    """A write-only, unseekable sink whose contents are taken with drain()."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def archive_name(paper):
+    track = '{0}-{1}'.format(paper.track_id, slugify(paper.track.title) or 'track')
+    _, ext = os.path.splitext(paper.file.name)
+    return '{0}/{1}'.format(track, get_valid_filename('{0}-{1}{2}'.format(paper.id, slugify(paper.title)[:80], ext)))
+
+
+def _file_size(paper):
+    try:
+        return paper.file.size
+    except (OSError, ValueError):
+        return None     # missing from storage; listed in the manifest without a file
+
+
+def iter_papers_zip(papers):
+    """Yield a ZIP archive of ``papers`` (a queryset) with a manifest, chunk by chunk."""
+    papers = papers.select_related('track').prefetch_related('authors__user').order_by('track_id', 'id')
+    pipe = _Pipe()
+
+    with zipfile.ZipFile(pipe, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        with archive.open('manifest.csv', 'w', force_zip64=True) as entry:
+            text = io.TextIOWrapper(entry, encoding='utf-8', newline='', write_through=True)
+            writer = csv.DictWriter(text, MANIFEST_FIELDS)
+            writer.writeheader()
+            for paper in papers.iterator(chunk_size=PAGE_SIZE):
+                size = _file_size(paper)
+                writer.writerow({
+                    'id': paper.id,
+                    'title': paper.title,
+                    'track': paper.track.title,
+                    'status': paper.status,
+                    'authors': ';'.join(author.user.email for author in paper.authors.all()),
+                    'file': archive_name(paper) if size is not None else '',
+                    'size': size if size is not None else '',
+                })
+                yield pipe.drain()
+            text.detach()
+
+        for paper in papers.prefetch_related(None).iterator(chunk_size=PAGE_SIZE):
+            try:
+                source = paper.file.open('rb')
+            except (OSError, ValueError):
+                continue
+            with source, archive.open(archive_name(paper), 'w', force_zip64=True) as entry:
+                while chunk := source.read(CHUNK_SIZE):
+                    entry.write(chunk)
+                    yield pipe.drain()
+
+    yield pipe.drain()      # the central directory
+
+
+async def _aiter(iterator):
+    # Pull the sync generator, and its queries, through a worker thread.
+    sentinel = object()
+    while (chunk := await sync_to_async(next)(iterator, sentinel)) is not sentinel:
+        yield chunk
+
+
+def papers_zip_response(papers, filename):
+    chunks = (chunk for chunk in iter_papers_zip(papers) if chunk)
+    if settings.ASYNC_VIEWS:
+        # Under ASGI Django would otherwise buffer a sync iterator in memory before sending it.
+        chunks = _aiter(chunks)
+    response = StreamingHttpResponse(chunks, content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="{0}"'.format(get_valid_filename(filename))
+    return response
@@ -1,8 +1,12 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from django.urls import reverse_lazy
 from phonenumber_field.formfields import PhoneNumberField
 
-from .models import User, Paper, Review
+from .models import User, Paper, Review, Upload
+from .coauthors import is_conflicted
+from .decisions import decision_papers
+from .uploads import attach_upload
 
 class RegistrationForm(UserCreationForm):
     email = forms.EmailField(label = "Email")
@@ -24,16 +28,50 @@ class RegistrationForm(UserCreationForm):
             user.save()
         return user
 
+class UserLookupMixin:
+    """
+    Render only the selected users; the rest are found through the user_lookup
+    endpoint (see user_lookup.html), so the page never lists every user. The
+    field still validates the submitted ids against its queryset.
+    """
+
+    def __init__(self, attrs=None):
+        super().__init__({'data-lookup-url': reverse_lazy('conferencesystem:user_lookup'), **(attrs or {})})
+
+    def optgroups(self, name, value, attrs=None):
+        ids = [pk for pk in value if str(pk).isdigit()]
+        users = self.choices.queryset.filter(pk__in=ids) if ids else []
+        return [
+            (None, [self.create_option(name, user.pk, str(user), True, index, attrs=attrs)], index)
+            for index, user in enumerate(users)
+        ]
+
+class UserLookupSelect(UserLookupMixin, forms.Select):
+    pass
+
+class UserLookupSelectMultiple(UserLookupMixin, forms.SelectMultiple):
+    pass
+
 class PaperSubmissionForm(forms.ModelForm):
-    authors = forms.ModelMultipleChoiceField(queryset=User.objects.all(), required=False)
+    authors = forms.ModelMultipleChoiceField(
+        queryset=User.objects.filter(is_active=True), required=False, widget=UserLookupSelectMultiple,
+    )
+    # Set instead of `file` when the manuscript was sent through the chunked upload API
+    upload_token = forms.UUIDField(required=False, widget=forms.HiddenInput)
+    # The place in line of a submission that had to wait, see conferencesystem.admission
+    admission_ticket = forms.CharField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = Paper
         fields = ['title', 'abstract', 'file', 'track', 'authors']
     
-    def __init__(self, conference, *args, **kwargs):
+    def __init__(self, conference, *args, user=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.conference = conference
+        self.user = user
+        self.upload = None
         self.fields['track'].queryset = self.conference.track_set.all()
+        self.fields['file'].required = False
 
     def clean(self):
         cleaned_data = super().clean()
@@ -42,9 +80,105 @@ class PaperSubmissionForm(forms.ModelForm):
         if track and track.conference != self.conference:
             self.add_error('track', "Invalid track selected.")
 
+        token = cleaned_data.get('upload_token')
+        if token:
+            self.upload = Upload.objects.filter(token=token, user=self.user, conference=self.conference).first()
+            if self.upload is None:
+                self.add_error('upload_token', "Unknown upload.")
+            elif not self.upload.is_complete():
+                self.add_error('upload_token', "The upload has not finished yet.")
+        elif not cleaned_data.get('file'):
+            self.add_error('file', "This field is required.")
+
         return cleaned_data
 
+    def save(self, commit=True):
+        if self.upload is not None:
+            attach_upload(self.upload, self.instance)
+        return super().save(commit)
+
 class ReviewForm(forms.ModelForm):
     class Meta:
         model = Review
-        fields = ['score', 'comments']
\ No newline at end of file
+        fields = ['score', 'comments']
+
+class AddReviewerForm(forms.Form):
+    user = forms.ModelChoiceField(queryset=User.objects.filter(is_active=True), widget=UserLookupSelect)
+
+    def __init__(self, paper, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.paper = paper
+
+    def clean_user(self):
+        user = self.cleaned_data['user']
+        if is_conflicted(user.id, self.paper):
+            raise forms.ValidationError(
+                "%(email)s has a conflict of interest with this paper: they are an author or have co-authored "
+                "with one.", params={'email': user.email},
+            )
+        return user
+
+class AssignReviewersForm(forms.Form):
+    reviewers = forms.CharField(
+        widget=forms.Textarea,
+        help_text="One email per line, optionally followed by '=N' to give that reviewer their own capacity.",
+    )
+    per_paper = forms.IntegerField(min_value=1, initial=3, label="Reviewers per paper")
+    capacity = forms.IntegerField(min_value=1, initial=10, label="Papers per reviewer")
+
+    def clean_reviewers(self):
+        specs = {}
+        for line in self.cleaned_data['reviewers'].splitlines():
+            email, _, capacity = line.strip().partition('=')
+            if not email:
+                continue
+            if capacity and not capacity.strip().isdigit():
+                raise forms.ValidationError("Invalid capacity for %(email)s.", params={'email': email})
+            specs[email.strip()] = int(capacity) if capacity else None
+
+        users = list(User.objects.filter(email__in=specs))
+        unknown = set(specs) - {user.email for user in users}
+        if unknown:
+            raise forms.ValidationError("Unknown users: %(emails)s", params={'emails': ', '.join(sorted(unknown))})
+
+        self.capacities = {user.id: specs[user.email] for user in users if specs[user.email] is not None}
+        return users
+
+class DecisionForm(forms.Form):
+    track = forms.ModelChoiceField(queryset=None, required=False, empty_label="All tracks")
+    min_reviews = forms.IntegerField(min_value=0, initial=1, label="Minimum reviews")
+    accept_min = forms.FloatField(
+        min_value=1, max_value=5, required=False, label="Accept papers with a mean score of at least",
+    )
+    reject_max = forms.FloatField(
+        min_value=1, max_value=5, required=False, label="Reject papers with a mean score of at most",
+    )
+
+    def __init__(self, conference, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.conference = conference
+        self.fields['track'].queryset = conference.track_set.all()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        accept_min, reject_max = cleaned_data.get('accept_min'), cleaned_data.get('reject_max')
+        if accept_min is None and reject_max is None:
+            raise forms.ValidationError("Set a score to accept or reject by.")
+        if accept_min is not None and reject_max is not None and reject_max >= accept_min:
+            raise forms.ValidationError("The rejection score must be below the acceptance score.")
+        return cleaned_data
+
+    def decisions(self):
+        """(status, papers) pairs, one per decision the form asks for."""
+        rule = {
+            'track': self.cleaned_data['track'],
+            'min_reviews': self.cleaned_data['min_reviews'],
+        }
+        decisions = []
+        if self.cleaned_data['accept_min'] is not None:
+            decisions.append(('accepted', decision_papers(
+                self.conference, 'accepted', score_min=self.cleaned_data['accept_min'], **rule)))
+        if self.cleaned_data['reject_max'] is not None:
+            decisions.append(('rejected', decision_papers(
+                self.conference, 'rejected', score_max=self.cleaned_data['reject_max'], **rule)))
+        return decisions
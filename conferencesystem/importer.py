@@ -0,0 +1,262 @@
+"""
+Bulk import of conferences, tracks, users and papers from another system.
+
+The input is a stream of records, one per line of a JSONL file or one per
+row of a CSV file. Each record has a ``type`` and the fields below:
+
+    conference  key, title, organizing_institute, institute_details,
+                description, start_date, end_date (YYYY-MM-DD)
+    track       key, conference, title, description
+    user        email, phone, first_name, last_name
+    paper       conference, track, title, abstract, file, authors, status
+
+A track or paper names its conference and track by the ``key`` of an
+earlier record, and a paper's track must belong to its conference. A
+paper's ``authors`` is a list of emails (separated by ``;`` in CSV); each
+must belong to an earlier user record or an existing user. Emails are
+normalized the same way in user and paper records. ``file`` is the name of
+a member of the ZIP of manuscripts, or a path already in storage when no
+ZIP is given. Records must come in this order of dependency, but the types
+may be interleaved.
+
+Records are read and written batch_size at a time. Each batch takes one
+bulk_create per model inside a transaction, and that transaction also
+advances the ImportRun checkpoint. If an import is interrupted, running it
+again resumes after the last committed batch. Conference and track keys
+are mapped to ids in memory and saved on the ImportRun. Users and authors
+are looked up per batch, so memory stays bounded by the batch size, not
+by the size of the import. Manuscripts are copied out of the ZIP one at a
+time. A batch that fails after copying files leaves those copies behind.
+
+bulk_create sends no signals, so each batch does the work of the signal
+handlers itself: it creates PaperScore rows, indexes the papers for
+search, adds them to the co-authorship graph, queues their manuscripts for
+processing, and invalidates the authors' roles. After each batch it also
+bumps the catalogue version.
+"""
+import csv
+import datetime
+import json
+import os
+from collections import Counter, defaultdict
+
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+
+from . import catalogue, coauthors, pipeline, search
+from .models import Conference, ImportRun, Paper, PaperScore, Track, User
+from .roles import invalidate_roles
+from .submission import AuthorConference, PaperAuthor, get_or_create_author_ids
+
+RECORD_TYPES = ('conference', 'track', 'user', 'paper')
+STATUSES = {status for status, label in Paper.STATUS_CHOICES}
+
+
+class RecordError(ValueError):
+    def __init__(self, number, message):
+        super().__init__("Record {0}: {1}".format(number, message))
+        self.number = number
+
+
+def read_records(path):
+    """Yield the records of a .csv or .jsonl file one at a time."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            for row in csv.DictReader(f):
+                if row.get('authors') is not None:
+                    row['authors'] = [email.strip() for email in row['authors'].split(';') if email.strip()]
+                yield row
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _field(number, record, name):
+    value = record.get(name)
+    if value in (None, ''):
+        raise RecordError(number, "{0} is required.".format(name))
+    return value
+
+
+def _date(number, record, name):
+    try:
+        return datetime.date.fromisoformat(_field(number, record, name))
+    except ValueError:
+        raise RecordError(number, "{0} is not a YYYY-MM-DD date.".format(name))
+
+
+def _email(value):
+    return User.objects.normalize_email(str(value).strip())
+
+
+def _lookup(number, ids, key, kind):
+    try:
+        return ids[str(key)]
+    except KeyError:
+        raise RecordError(number, "unknown {0} {1!r}.".format(kind, key))
+
+
+class Importer:
+    def __init__(self, source, files=None, batch_size=1000):
+        self.run, created = ImportRun.objects.get_or_create(source=source)
+        self.files = files          # an open zipfile.ZipFile, or None
+        self.batch_size = batch_size
+        self.counts = Counter()
+
+    def run_import(self, records):
+        """Import ``records``, skipping those committed by an earlier run, and return counts by type."""
+        if self.run.finished:
+            return self.counts
+
+        batch = []
+        for number, record in enumerate(records, 1):
+            if number <= self.run.position:
+                continue
+            batch.append((number, record))
+            if len(batch) == self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+
+        self.run.finished = True
+        self.run.save(update_fields=['finished', 'updated_at'])
+        return self.counts
+
+    def import_batch(self, batch):
+        by_type = defaultdict(list)
+        for number, record in batch:
+            if record.get('type') not in RECORD_TYPES:
+                raise RecordError(number, "type must be one of {0}.".format(', '.join(RECORD_TYPES)))
+            by_type[record['type']].append((number, record))
+
+        with transaction.atomic():
+            conference_ids = self.import_conferences(by_type['conference']) | self.import_tracks(by_type['track'])
+            self.import_users(by_type['user'])
+            papers, user_ids = self.import_papers(by_type['paper'])
+            conference_ids |= {paper.conference_id for paper in papers}
+
+            self.run.position = batch[-1][0]
+            self.run.save(update_fields=['position', 'conference_ids', 'track_ids', 'updated_at'])
+
+        invalidate_roles(user_ids)
+        catalogue.bump_version(catalogue.CATALOGUE, *conference_ids)
+        for kind, records in by_type.items():
+            self.counts[kind] += len(records)
+
+    def import_conferences(self, records):
+        conferences = Conference.objects.bulk_create([
+            Conference(
+                title=_field(number, record, 'title'),
+                organizing_institute=_field(number, record, 'organizing_institute'),
+                institute_details=record.get('institute_details') or '',
+                description=record.get('description') or '',
+                start_date=_date(number, record, 'start_date'),
+                end_date=_date(number, record, 'end_date'),
+            )
+            for number, record in records
+        ])
+        for (number, record), conference in zip(records, conferences):
+            self.run.conference_ids[str(_field(number, record, 'key'))] = conference.id
+        return {conference.id for conference in conferences}
+
+    def import_tracks(self, records):
+        tracks = Track.objects.bulk_create([
+            Track(
+                conference_id=_lookup(number, self.run.conference_ids, _field(number, record, 'conference'), 'conference'),
+                title=_field(number, record, 'title'),
+                description=record.get('description') or '',
+            )
+            for number, record in records
+        ])
+        for (number, record), track in zip(records, tracks):
+            self.run.track_ids[str(_field(number, record, 'key'))] = track.id
+        return {track.conference_id for track in tracks}
+
+    def import_users(self, records):
+        emails = {_email(_field(number, record, 'email')): (number, record) for number, record in records}
+        existing = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+        users = [
+            User(
+                email=email,
+                phone=_field(number, record, 'phone'),      # unique, so it cannot be left blank for everyone
+                first_name=record.get('first_name') or '',
+                last_name=record.get('last_name') or '',
+                password=make_password(None),   # unusable until the user resets it
+            )
+            for email, (number, record) in emails.items() if email not in existing
+        ]
+        try:
+            User.objects.bulk_create(users)
+        except IntegrityError as e:
+            raise RecordError(records[0][0], "users in this batch clash with existing ones: {0}".format(e))
+
+    def import_papers(self, records):
+        if not records:
+            return [], set()
+
+        authors = [(number, [_email(email) for email in record.get('authors') or ()]) for number, record in records]
+        emails = {email for number, record_emails in authors for email in record_emails}
+        user_ids = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+        author_ids = get_or_create_author_ids(user_ids.values())
+
+        track_ids = {
+            number: _lookup(number, self.run.track_ids, _field(number, record, 'track'), 'track')
+            for number, record in records
+        }
+        track_conferences = dict(Track.objects.filter(id__in=set(track_ids.values())).values_list('id', 'conference_id'))
+
+        papers = []
+        for number, record in records:
+            conference_id = _lookup(number, self.run.conference_ids, _field(number, record, 'conference'), 'conference')
+            track_id = track_ids[number]
+            if track_conferences.get(track_id) != conference_id:
+                raise RecordError(number, "track {0!r} is not a track of conference {1!r}.".format(
+                    record['track'], record['conference']))
+            status = record.get('status') or 'submitted'
+            if status not in STATUSES:
+                raise RecordError(number, "unknown status {0!r}.".format(status))
+            papers.append(Paper(
+                title=_field(number, record, 'title'),
+                abstract=record.get('abstract') or '',
+                file=self.copy_file(number, _field(number, record, 'file')),
+                conference_id=conference_id,
+                track_id=track_id,
+                status=status,
+            ))
+        papers = Paper.objects.bulk_create(papers)
+
+        paper_authors, conference_authors = [], set()
+        for (number, record_emails), paper in zip(authors, papers):
+            for email in record_emails:
+                author_id = author_ids[_lookup(number, user_ids, email, 'author')]
+                paper_authors.append(PaperAuthor(paper_id=paper.id, author_id=author_id))
+                conference_authors.add((author_id, paper.conference_id))
+
+        PaperAuthor.objects.bulk_create(paper_authors, ignore_conflicts=True)    # an author listed twice
+        AuthorConference.objects.bulk_create(
+            [AuthorConference(author_id=author_id, conference_id=conference_id) for author_id, conference_id in conference_authors],
+            ignore_conflicts=True,
+        )
+        PaperScore.objects.bulk_create(
+            [PaperScore(paper_id=paper.id, conference_id=paper.conference_id, track_id=paper.track_id) for paper in papers]
+        )
+        search.index_papers(papers)
+        coauthors.record_new_papers([paper.id for paper in papers])
+        pipeline.enqueue([paper.id for paper in papers])
+
+        return papers, set(user_ids.values())
+
+    def copy_file(self, number, name):
+        if self.files is None:
+            return name
+        try:
+            member = self.files.open(name)
+        except KeyError:
+            raise RecordError(number, "{0!r} is not in the ZIP file.".format(name))
+        with member:
+            target = Paper._meta.get_field('file').generate_filename(None, os.path.basename(name))
+            return default_storage.save(target, File(member))
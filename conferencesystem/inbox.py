@@ -0,0 +1,41 @@
+"""
+The reviewer's inbox: the papers assigned to a user, with their review state.
+
+One query returns a page of assigned papers with the conference (and its
+review deadline) and track joined in. Whether the user has reviewed each
+paper, and with what score, are annotated with Exists() and Subquery() over
+their reviews, so there is no query per paper. Pages are keyset-paginated
+on the paper id, like the chair's board, so a deep page costs the same as
+the first.
+"""
+from django.db.models import Exists, OuterRef, Subquery
+
+from .models import Paper, Review
+
+INBOX_PAGE_SIZE = 25
+INBOX_STATES = (
+    ('pending', 'Not reviewed yet'),
+    ('reviewed', 'Reviewed'),
+)
+
+
+def reviewer_papers(user, state='', conference=None, after=None, limit=INBOX_PAGE_SIZE):
+    """
+    Up to ``limit`` papers assigned to ``user`` with id above ``after``,
+    annotated with ``reviewed`` and ``my_score``. ``state`` is '' or one of
+    INBOX_STATES, ``conference`` a conference id.
+    """
+    reviews = Review.objects.filter(paper=OuterRef('pk'), reviewer__user=user)
+    papers = Paper.objects.filter(reviewer__user=user).annotate(
+        reviewed=Exists(reviews),
+        my_score=Subquery(reviews.values('score')[:1]),
+    )
+    if state == 'pending':
+        papers = papers.filter(reviewed=False)
+    elif state == 'reviewed':
+        papers = papers.filter(reviewed=True)
+    if conference:
+        papers = papers.filter(conference_id=conference)
+    if after:
+        papers = papers.filter(id__gt=after)
+    return papers.select_related('conference', 'track').order_by('id')[:limit]
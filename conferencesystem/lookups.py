@@ -0,0 +1,54 @@
+"""
+Prefix lookup of users for the reviewer and co-author pickers and the admin.
+
+A single word matches the start of the email, first name or last name; two
+or more words match the first word against the first name and the last
+word against the last name ("ada lov"). Matching is case-insensitive and
+written as a range on LOWER(column), e.g. ``'ada' <= LOWER(email) <
+'ada\\U0010ffff'``, so it is answered from the expression indexes on User
+instead of a table scan. Results are ordered by id and paged with a cursor.
+"""
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import User
+
+LOOKUP_PAGE_SIZE = 20
+MIN_LOOKUP_LENGTH = 2
+
+_PREFIX_END = '\U0010ffff'
+
+
+def _prefix(field, text):
+    return Q(**{field + '__gte': text, field + '__lt': text + _PREFIX_END})
+
+
+def match_users(users, text):
+    """Filter the ``users`` queryset to those matching ``text`` as described above."""
+    words = text.lower().split()
+    if not words:
+        return users.none()
+
+    users = users.annotate(
+        email_lower=Lower('email'),
+        first_name_lower=Lower('first_name'),
+        last_name_lower=Lower('last_name'),
+    )
+    if len(words) == 1:
+        word = words[0]
+        return users.filter(
+            _prefix('email_lower', word) | _prefix('first_name_lower', word) | _prefix('last_name_lower', word)
+        )
+    return users.filter(_prefix('first_name_lower', words[0]), _prefix('last_name_lower', words[-1]))
+
+
+def lookup_users(text, after=None, limit=LOOKUP_PAGE_SIZE):
+    """Return up to ``limit`` users matching ``text`` with an id greater than ``after``, as dicts."""
+    if len(' '.join(text.split())) < MIN_LOOKUP_LENGTH:
+        return []
+
+    users = match_users(User.objects.filter(is_active=True), text)
+    if after is not None:
+        users = users.filter(id__gt=after)
+
+    return list(users.order_by('id').values('id', 'email', 'first_name', 'last_name')[:limit])
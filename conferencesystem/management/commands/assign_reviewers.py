@@ -0,0 +1,89 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from conferencesystem.assignment import assign_reviewers, plan_assignments
+from conferencesystem.models import Conference, User
+
+
+class Command(BaseCommand):
+    help = "Assign reviewers to every paper of a conference, balancing reviewer load."
+
+    def add_arguments(self, parser):
+        parser.add_argument('conference_id', nargs='?', type=int)
+        parser.add_argument('--per-paper', type=int, default=3, help="Reviewers each paper should get.")
+        parser.add_argument('--capacity', type=int, default=10, help="Most papers a reviewer may take.")
+        parser.add_argument(
+            '--reviewer', action='append', default=[], metavar='EMAIL[=CAPACITY]',
+            help="Reviewer to draw from, optionally with their own capacity. Defaults to the "
+                 "conference's current reviewers.",
+        )
+        parser.add_argument(
+            '--benchmark', metavar='PAPERSxREVIEWERS',
+            help="Time the solver on synthetic data (e.g. 10000x2000) without touching the database.",
+        )
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self.benchmark(options['benchmark'], options['per_paper'], options['capacity'])
+
+        if options['conference_id'] is None:
+            raise CommandError("A conference id is required.")
+        try:
+            conference = Conference.objects.get(id=options['conference_id'])
+        except Conference.DoesNotExist:
+            raise CommandError("Conference {0} does not exist.".format(options['conference_id']))
+
+        capacities = {}
+        if options['reviewer']:
+            emails = {}
+            for spec in options['reviewer']:
+                email, _, capacity = spec.partition('=')
+                emails[email] = int(capacity) if capacity else None
+            users = list(User.objects.filter(email__in=emails))
+            unknown = set(emails) - {user.email for user in users}
+            if unknown:
+                raise CommandError("Unknown users: {0}".format(', '.join(sorted(unknown))))
+            capacities = {user.id: emails[user.email] for user in users if emails[user.email] is not None}
+        else:
+            users = list(User.objects.filter(reviewer__papers__conference=conference).distinct())
+
+        if not users:
+            raise CommandError("No reviewers to assign.")
+
+        result = assign_reviewers(conference, users, options['per_paper'], options['capacity'], capacities)
+
+        self.stdout.write(self.style.SUCCESS(
+            "Made {0} assignments across {1} reviewers.".format(len(result.assignments), len(users))
+        ))
+        if result.unfilled:
+            self.stdout.write(self.style.WARNING(
+                "{0} papers are short of reviewers; add reviewers or raise --capacity.".format(len(result.unfilled))
+            ))
+
+    def benchmark(self, size, per_paper, capacity):
+        try:
+            papers, reviewers = (int(n) for n in size.lower().split('x'))
+        except ValueError:
+            raise CommandError("--benchmark expects PAPERSxREVIEWERS, e.g. 10000x2000.")
+
+        rng = random.Random(0)
+        paper_ids = range(papers)
+        capacities = {r: capacity for r in range(reviewers)}
+        # Roughly one co-authored paper per reviewer.
+        conflicts = {(rng.randrange(reviewers), p) for p in rng.sample(paper_ids, min(papers, reviewers))}
+
+        start = time.perf_counter()
+        result = plan_assignments(paper_ids, capacities, per_paper, conflicts=conflicts)
+        elapsed = time.perf_counter() - start
+
+        loads = {}
+        for reviewer_id, paper_id in result.assignments:
+            loads[reviewer_id] = loads.get(reviewer_id, 0) + 1
+        self.stdout.write(
+            "{0} papers x {1} reviewers: {2} assignments in {3:.3f}s, load {4}-{5}, {6} papers unfilled".format(
+                papers, reviewers, len(result.assignments), elapsed,
+                min(loads.values(), default=0), max(loads.values(), default=0), len(result.unfilled),
+            )
+        )
@@ -0,0 +1,81 @@
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from conferencesystem.benchmark import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure throughput and latency of running deployments, e.g. to compare WSGI with ASGI:\n"
+        "  gunicorn project.wsgi -w 4 -b 127.0.0.1:8000\n"
+        "  uvicorn project.asgi:application --workers 4 --port 8001\n"
+        "  manage.py benchmark_http --target wsgi=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True, metavar='NAME=URL',
+            help="A deployment to measure; repeat to compare several.",
+        )
+        parser.add_argument(
+            '--path', action='append', default=[],
+            help="Path to request (repeatable, requests rotate through them). Defaults to /conferences/.",
+        )
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per target.")
+        parser.add_argument('--concurrency', type=int, default=50, help="Requests in flight at once.")
+        parser.add_argument('--cookie', default='', help="Cookie header to send, e.g. sessionid=... for signed-in pages.")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        paths = options['path'] or ['/conferences/']
+        results = {}
+        for target in options['target']:
+            name, sep, base = target.partition('=')
+            if not sep:
+                raise CommandError("--target expects NAME=URL.")
+            results[name] = self.run(base.rstrip('/'), paths, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write('{0:<12} {1:>10} {2:>9} {3:>9} {4:>9} {5:>7}'.format(
+            'target', 'req/s', 'p50 ms', 'p99 ms', 'mean ms', 'errors'))
+        for name, result in results.items():
+            self.stdout.write('{0:<12} {1:>10.1f} {2:>9.1f} {3:>9.1f} {4:>9.1f} {5:>7}'.format(
+                name, result['throughput'], result['p50_ms'], result['p99_ms'], result['mean_ms'], result['errors']))
+
+    def run(self, base, paths, options):
+        headers = {'Cookie': options['cookie']} if options['cookie'] else {}
+
+        def fetch(i):
+            request = urllib.request.Request(base + paths[i % len(paths)], headers=headers)
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                    ok = response.status < 400
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return time.perf_counter() - start, ok
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            samples = list(pool.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - start
+
+        latencies = [duration * 1000 for duration, ok in samples if ok]
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for duration, ok in samples if not ok),
+            'throughput': len(latencies) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 50),
+            'p99_ms': percentile(latencies, 99),
+            'mean_ms': statistics.fmean(latencies) if latencies else 0.0,
+        }
@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import sys
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from conferencesystem.benchmark import compare, run_benchmark
+from conferencesystem.models import Conference
+from conferencesystem.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill a throwaway database with seeded synthetic data, load test every route with the test client "
+        "and report latency, throughput and query counts. Save a baseline with --output and check a later "
+        "run against it with --compare, which fails when a route regresses:\n"
+        "  manage.py benchmark_views --output baseline.json\n"
+        "  manage.py benchmark_views --compare baseline.json"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--conferences', type=int, default=20)
+        parser.add_argument('--papers', type=int, default=2000)
+        parser.add_argument('--reviewers', type=int, default=200)
+        parser.add_argument('--reviews', type=int, default=6000)
+        parser.add_argument('--requests', type=int, default=200, help="Requests per route.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Worker threads per route.")
+        parser.add_argument('--route', action='append', default=[], help="Only benchmark this route (repeatable).")
+        parser.add_argument('--output', metavar='FILE', help="Write the results as JSON, e.g. to keep as a baseline.")
+        parser.add_argument('--compare', metavar='FILE', help="Fail if any route regressed against this baseline.")
+        parser.add_argument('--threshold', type=float, default=0.25, help="Allowed latency/throughput regression.")
+        parser.add_argument(
+            '--database', default='benchmark.sqlite3',
+            help="SQLite file for the benchmark data (other backends use their usual test database name).",
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help="Keep the database and its generated data for the next run instead of generating it again.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            # A file rather than the in-memory test database, so worker threads share the data.
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.abspath(options['database'])
+        media_root = os.path.abspath(options['database'] + '-media')
+        scale = {key: options[key] for key in ('seed', 'conferences', 'papers', 'reviewers', 'reviews')}
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False)
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                if Conference.objects.filter(organizing_institute='Benchmark Institute').exists():
+                    self.stdout.write("Reusing the data kept by --keepdb.")
+                else:
+                    generate(**scale, log=lambda step: self.stdout.write("Generating " + step))
+                routes = run_benchmark(
+                    options['requests'], options['concurrency'], options['seed'], options['route'],
+                    log=lambda route: self.stdout.write("Benchmarking " + route),
+                )
+        finally:
+            if not options['keepdb']:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                shutil.rmtree(media_root, ignore_errors=True)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                **scale,
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'database': connection.vendor,
+                'async_views': settings.ASYNC_VIEWS,
+                'python': sys.version.split()[0],
+                'django': django.get_version(),
+            },
+            'routes': routes,
+        }
+        self.print_table(routes)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            settings_of = lambda meta: {key: value for key, value in meta.items() if key not in ('python', 'django')}
+            if settings_of(baseline['meta']) != settings_of(report['meta']):
+                self.stdout.write(self.style.WARNING("The baseline was measured with different settings."))
+            regressions = compare(baseline['routes'], routes, options['threshold'])
+            if regressions:
+                raise CommandError("Regressions against {0}:\n  {1}".format(options['compare'], '\n  '.join(regressions)))
+            self.stdout.write(self.style.SUCCESS("No regressions against {0}.".format(options['compare'])))
+
+    def print_table(self, routes):
+        self.stdout.write('{0:<20} {1:>8} {2:>8} {3:>8} {4:>9} {5:>8} {6:>7}'.format(
+            'route', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s', 'queries', 'errors'))
+        for name, result in routes.items():
+            self.stdout.write('{0:<20} {1:>8.1f} {2:>8.1f} {3:>8.1f} {4:>9.1f} {5:>8} {6:>7}'.format(
+                name, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['throughput'],
+                result['queries_max'], result['errors']))
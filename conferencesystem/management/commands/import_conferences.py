@@ -0,0 +1,52 @@
+import os
+import time
+import zipfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from conferencesystem.importer import Importer, RecordError, read_records
+from conferencesystem.models import ImportRun
+
+
+class Command(BaseCommand):
+    help = (
+        "Import conferences, tracks, users and papers from a .jsonl or .csv file of records, "
+        "with manuscripts from a ZIP file. See conferencesystem/importer.py for the record format. "
+        "An interrupted import resumes from its last committed batch when run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('records', help="A .jsonl or .csv file of records.")
+        parser.add_argument('--files', metavar='ZIP', help="ZIP file holding the manuscripts named by paper records.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Records written per transaction.")
+        parser.add_argument(
+            '--restart', action='store_true',
+            help="Forget the checkpoint of an earlier run of this file and import it from the start.",
+        )
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options['records'])
+        if not os.path.exists(source):
+            raise CommandError("{0} does not exist.".format(source))
+        if options['restart']:
+            ImportRun.objects.filter(source=source).delete()
+
+        files = zipfile.ZipFile(options['files']) if options['files'] else None
+        importer = Importer(source, files=files, batch_size=options['batch_size'])
+        if importer.run.position:
+            self.stdout.write("Resuming after record {0}.".format(importer.run.position))
+
+        start = time.perf_counter()
+        try:
+            counts = importer.run_import(read_records(source))
+        except (RecordError, ValueError) as e:
+            raise CommandError("{0} Records up to {1} were imported; run again to resume.".format(
+                e, importer.run.position))
+        finally:
+            if files is not None:
+                files.close()
+
+        self.stdout.write(self.style.SUCCESS("Imported {0} in {1:.1f}s.".format(
+            ', '.join('{0} {1}s'.format(n, kind) for kind, n in sorted(counts.items())) or 'nothing',
+            time.perf_counter() - start,
+        )))
@@ -0,0 +1,87 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+
+from conferencesystem.manuscripts import run_stages
+from conferencesystem.pipeline import claim_jobs, complete_job, fail_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued paper manuscripts: checksum, page count and text extraction for search. "
+        "The stages run in a pool of worker processes. Runs until stopped unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.PAPER_PIPELINE_WORKERS,
+            help="Worker processes (default: one per CPU; 0 runs the stages in this process).",
+        )
+        parser.add_argument('--batch-size', type=int, default=settings.PAPER_JOB_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty.")
+
+    def handle(self, *args, **options):
+        pool = None
+        if options['workers'] != 0:
+            # spawn, not fork: a forked child would share this process's database connection
+            pool = ProcessPoolExecutor(options['workers'], mp_context=multiprocessing.get_context('spawn'))
+        done = failed = dropped = 0
+        try:
+            while True:
+                jobs = claim_jobs(options['batch_size'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+
+                for job, outcome in self.run(pool, jobs):
+                    if not isinstance(outcome, Exception):
+                        try:
+                            if complete_job(job, *outcome):
+                                done += 1
+                            else:
+                                dropped += 1    # the paper was deleted while it ran
+                            continue
+                        except DatabaseError as e:
+                            outcome = e
+                    fail_job(job, '{0}: {1}'.format(type(outcome).__name__, outcome))
+                    failed += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write("Processed {0} papers.".format(len(jobs)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            "Processed {0} papers, {1} failed, {2} deleted meanwhile.".format(done, failed, dropped)
+        ))
+
+    def run(self, pool, jobs):
+        """Yield (job, run_stages result or exception) as each job finishes."""
+        if pool is None:
+            for job in jobs:
+                try:
+                    yield job, run_stages(job.paper.file.path)
+                except Exception as e:
+                    yield job, e
+            return
+
+        futures = {}
+        for job in jobs:
+            try:
+                futures[pool.submit(run_stages, job.paper.file.path)] = job
+            except Exception as e:      # e.g. storage without local paths
+                yield job, e
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
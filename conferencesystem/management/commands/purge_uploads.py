@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from conferencesystem.uploads import purge_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the resumable uploads never submitted within PAPER_UPLOAD_EXPIRY seconds, "
+        "with their partial files. Run it periodically, e.g. from cron."
+    )
+
+    def handle(self, *args, **options):
+        purged = purge_uploads()
+        self.stdout.write(self.style.SUCCESS("Purged {0} uploads.".format(purged)))
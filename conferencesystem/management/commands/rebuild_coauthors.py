@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from conferencesystem.coauthors import rebuild_graph
+
+
+class Command(BaseCommand):
+    help = "Rebuild the co-authorship graph used for conflict-of-interest checks from the paper authors."
+
+    def handle(self, *args, **options):
+        rebuild_graph()
+        self.stdout.write(self.style.SUCCESS("Co-authorship graph rebuilt."))
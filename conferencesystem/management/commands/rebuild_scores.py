@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from conferencesystem.models import Conference
+from conferencesystem.scores import rebuild_scores
+
+
+class Command(BaseCommand):
+    help = "Recompute the review score aggregates from the reviews, for one conference or all of them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('conference_id', nargs='?', type=int)
+
+    def handle(self, *args, **options):
+        conference = None
+        if options['conference_id'] is not None:
+            try:
+                conference = Conference.objects.get(id=options['conference_id'])
+            except Conference.DoesNotExist:
+                raise CommandError("Conference {0} does not exist.".format(options['conference_id']))
+
+        rebuild_scores(conference)
+        self.stdout.write(self.style.SUCCESS("Score aggregates rebuilt."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from conferencesystem.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text index of paper titles, abstracts and extracted manuscript text."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rebuild_index(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from conferencesystem.notifications import claim_batch, send_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the emails waiting in the notification outbox, in batches over one mail server connection. "
+        "Runs until stopped unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.NOTIFICATION_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to wait when the outbox is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit when the outbox is empty.")
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        total = 0
+        try:
+            while True:
+                batch = claim_batch(options['batch_size'])
+                if not batch:
+                    if options['once']:
+                        break
+                    connection.close()      # don't hold the mail server connection while idle
+                    time.sleep(options['interval'])
+                    continue
+
+                # An explicitly opened connection stays open across send() calls and batches.
+                connection.open()
+                sent = send_batch(batch, connection)
+                total += sent
+                if sent < len(batch):
+                    connection.close()      # reconnect in case the failures were the connection's
+                if options['verbosity'] > 1:
+                    self.stdout.write("Sent {0} of {1}.".format(sent, len(batch)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+
+        self.stdout.write(self.style.SUCCESS("Sent {0} notifications.".format(total)))
@@ -0,0 +1,63 @@
+import logging
+import os
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template import Template
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from conferencesystem.benchmark import create_submitters, run_submission_stress
+
+
+class Command(BaseCommand):
+    help = (
+        "Reproduce a submission deadline in a throwaway database: every submitter posts a paper at the same "
+        "moment, each from its own thread and connection. Fails if any submission fails, so a "
+        "\"database is locked\" error under load does not go unnoticed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submitters', type=int, default=200)
+        parser.add_argument(
+            '--database', default='stress.sqlite3',
+            help="SQLite file for the test data (other backends use their usual test database name).",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            # A file rather than the in-memory test database, so that every thread has a connection of its own.
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.abspath(options['database'])
+        media_root = os.path.abspath(options['database'] + '-media')
+
+        render = Template._render
+        setup_test_environment()
+        # The test client copies the context of every template rendered to each request in flight, which
+        # grows with the square of the submitters and swamped the run; render as the server does.
+        Template._render = render
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                conference, track, user_ids = create_submitters(options['submitters'])
+                connection.close()
+                # Every "in line" answer is a 503, which django.request would log; failures are counted below.
+                request_logger = logging.getLogger('django.request')
+                level, request_logger.level = request_logger.level, logging.CRITICAL
+                try:
+                    result = run_submission_stress(conference.id, track.id, user_ids)
+                finally:
+                    request_logger.setLevel(level)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(media_root, ignore_errors=True)
+            teardown_test_environment()
+
+        self.stdout.write(
+            "{submitted}/{submitters} submitted in {elapsed:.1f}s, {queued} after waiting in line, p50 {p50_ms:.0f} ms, p95 {p95_ms:.0f} ms, "
+            "p99 {p99_ms:.0f} ms, {lock_errors} lock errors.".format(**result)
+        )
+        if result['errors']:
+            raise CommandError("{0} submissions failed:\n  {1}".format(
+                len(result['errors']), '\n  '.join(sorted(set(result['errors'])))))
+        self.stdout.write(self.style.SUCCESS("No failed submissions."))
@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary into the SQLite read replicas that stand in for real ones locally. "
+        "With --interval it keeps copying, so the replicas lag the primary by about that long."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help="Copy again every this many seconds until stopped.")
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        aliases = settings.DATABASE_REPLICAS
+        if primary.vendor != 'sqlite' or any(connections[alias].vendor != 'sqlite' for alias in aliases):
+            raise CommandError("sync_replica only copies between SQLite databases; real replicas replicate themselves.")
+        if not aliases:
+            raise CommandError("No replicas configured; set DATABASE_REPLICA to the replica's file.")
+
+        try:
+            while True:
+                primary.ensure_connection()
+                for alias in aliases:
+                    # The backup API copies a consistent snapshot, even while the primary is being written.
+                    target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+                    try:
+                        primary.connection.backup(target)
+                    finally:
+                        target.close()
+                    if options['verbosity'] > 1:
+                        self.stdout.write("Copied the primary to {0}.".format(alias))
+                if options['interval'] is None:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS("Replicas synced."))
@@ -0,0 +1,93 @@
+"""
+The CPU-bound stages of manuscript processing.
+
+This module uses only the standard library and never touches the
+database, so the process_papers worker can run it in a process pool:
+run_stages() takes a file path and returns plain data, which the parent
+process writes back (see conferencesystem.pipeline). The file is read
+once and each stage works on the bytes in memory.
+
+The PDF handling is deliberately rough: pages are counted from the page
+objects, and text is whatever literal strings the content streams show
+between BT and ET. That is enough to make a manuscript searchable, not to
+render it.
+"""
+import hashlib
+import re
+import time
+import zlib
+
+MAX_TEXT_LENGTH = 100000
+
+_PAGE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+_STREAM = re.compile(rb'stream\r?\n(.*?)\r?\nendstream', re.S)
+_TEXT_BLOCK = re.compile(rb'\bBT\b(.*?)\bET\b', re.S)
+_STRING = re.compile(rb'\((?:\\.|[^\\()])*\)', re.S)
+_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+
+def checksum(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def streams(data):
+    """The content of every stream in ``data``, inflated where it is Flate-compressed."""
+    result = []
+    for match in _STREAM.finditer(data):
+        raw = match.group(1)
+        try:
+            result.append(zlib.decompress(raw))
+        except zlib.error:
+            result.append(raw)
+    return result
+
+
+def page_count(data, decoded):
+    # Page objects may sit in compressed object streams, so look there too.
+    return sum(len(_PAGE.findall(chunk)) for chunk in [data, *decoded])
+
+
+def _unescape(match):
+    escaped = match.group(1)
+    if escaped[:1].isdigit():
+        return bytes([int(escaped, 8) & 0xff])
+    return _ESCAPES.get(escaped, escaped)
+
+
+def extract_text(decoded):
+    words = []
+    length = 0
+    for chunk in decoded:
+        for block in _TEXT_BLOCK.findall(chunk):
+            for string in _STRING.findall(block):
+                text = re.sub(rb'\\([0-7]{1,3}|.)', _unescape, string[1:-1], flags=re.S).decode('latin-1')
+                words.append(text)
+                length += len(text) + 1
+                if length >= MAX_TEXT_LENGTH:
+                    return ' '.join(words)[:MAX_TEXT_LENGTH]
+    return ' '.join(words)
+
+
+def run_stages(path):
+    """Process the manuscript at ``path``; return ({'sha256', 'page_count', 'text'}, {stage: seconds})."""
+    timings = {}
+
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        data = f.read()
+    timings['read'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sha256 = checksum(data)
+    timings['checksum'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoded = streams(data)
+    pages = page_count(data, decoded)
+    timings['pages'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    text = extract_text(decoded)
+    timings['text'] = time.perf_counter() - start
+
+    return {'sha256': sha256, 'page_count': pages, 'text': text}, timings
@@ -0,0 +1,136 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Literals are stripped from the SQL so that queries differing only in their
+# parameters collapse into the same shape.
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of SQL queries a view may run."""
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+def query_shape(sql):
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+class QueryLog:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated(self, threshold):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+class QueryBudgetMiddleware:
+    """
+    Count the queries each view runs and how long they take, log repeated
+    query shapes as likely N+1 patterns and enforce budgets declared with
+    @query_budget. With QUERY_BUDGET_STRICT set (as it is under the test
+    runner) a view going over its budget raises QueryBudgetExceeded.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        log = self.start(request)
+        with self.recording(log):
+            response = self.get_response(request)
+        return self.finish(request, log, response)
+
+    async def __acall__(self, request):
+        # Connections are per thread and the async ORM runs every query of a
+        # request on the same thread-sensitive worker, so the wrappers have
+        # to be installed (and removed) on that thread.
+        log = self.start(request)
+        recording = await sync_to_async(self.recording)(log)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recording.close)()
+        return self.finish(request, log, response)
+
+    def start(self, request):
+        request.query_log = log = QueryLog()
+        request.query_budget = None
+        return log
+
+    def recording(self, log):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(log))
+        return stack
+
+    def finish(self, request, log, response):
+        self.check(request, log)
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(log.count)
+            response['X-Query-Time'] = '{0:.1f}ms'.format(log.duration * 1000)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
+        request.query_view = getattr(view_func, '__qualname__', repr(view_func))
+
+    def check(self, request, log):
+        view = getattr(request, 'query_view', request.path)
+        threshold = getattr(settings, 'QUERY_BUDGET_N_PLUS_ONE_THRESHOLD', 3)
+
+        for shape, n in log.repeated(threshold):
+            logger.warning('Possible N+1 in %s: %d x %s', view, n, shape)
+
+        budget = request.query_budget
+        if budget is None or log.count <= budget:
+            return
+
+        message = '{0} ran {1} queries in {2:.1f}ms, budget is {3}'.format(
+            view, log.count, log.duration * 1000, budget
+        )
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
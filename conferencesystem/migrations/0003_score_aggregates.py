@@ -0,0 +1,98 @@
+# Generated by Django 4.2.2 on 2026-10-17 22:20
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum
+import django.db.models.deletion
+
+
+def backfill_scores(apps, schema_editor):
+    Paper = apps.get_model('conferencesystem', 'Paper')
+    PaperScore = apps.get_model('conferencesystem', 'PaperScore')
+    TrackScore = apps.get_model('conferencesystem', 'TrackScore')
+    ConferenceScore = apps.get_model('conferencesystem', 'ConferenceScore')
+
+    def totals(count, total, squares, low, high):
+        return dict(review_count=count, score_sum=total or 0, score_sq_sum=squares or 0,
+                    score_min=low, score_max=high, score_mean=total / count if count else None)
+
+    papers = Paper.objects.annotate(
+        count=Count('review'), total=Sum('review__score'), squares=Sum(F('review__score') * F('review__score')),
+        low=Min('review__score'), high=Max('review__score'),
+    ).values_list('id', 'conference_id', 'track_id', 'count', 'total', 'squares', 'low', 'high')
+    PaperScore.objects.bulk_create(
+        (PaperScore(paper_id=paper_id, conference_id=conference_id, track_id=track_id, **totals(*rest))
+         for paper_id, conference_id, track_id, *rest in papers.iterator()),
+        batch_size=1000,
+    )
+
+    rollup = dict(count=Sum('review_count'), total=Sum('score_sum'), squares=Sum('score_sq_sum'),
+                  low=Min('score_min'), high=Max('score_max'))
+    TrackScore.objects.bulk_create(
+        [TrackScore(track_id=row.pop('track_id'), conference_id=row.pop('conference_id'), **totals(**row))
+         for row in PaperScore.objects.values('track_id', 'conference_id').annotate(**rollup)],
+        batch_size=1000,
+    )
+    ConferenceScore.objects.bulk_create(
+        [ConferenceScore(conference_id=row.pop('conference_id'), **totals(**row))
+         for row in PaperScore.objects.values('conference_id').annotate(**rollup)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conferencesystem', '0002_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConferenceScore',
+            fields=[
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.PositiveIntegerField(default=0)),
+                ('score_sq_sum', models.PositiveIntegerField(default=0)),
+                ('score_min', models.PositiveSmallIntegerField(null=True)),
+                ('score_max', models.PositiveSmallIntegerField(null=True)),
+                ('score_mean', models.FloatField(null=True)),
+                ('conference', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='conferencesystem.conference')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TrackScore',
+            fields=[
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.PositiveIntegerField(default=0)),
+                ('score_sq_sum', models.PositiveIntegerField(default=0)),
+                ('score_min', models.PositiveSmallIntegerField(null=True)),
+                ('score_max', models.PositiveSmallIntegerField(null=True)),
+                ('score_mean', models.FloatField(null=True)),
+                ('track', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='conferencesystem.track')),
+                ('conference', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='conferencesystem.conference')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PaperScore',
+            fields=[
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.PositiveIntegerField(default=0)),
+                ('score_sq_sum', models.PositiveIntegerField(default=0)),
+                ('score_min', models.PositiveSmallIntegerField(null=True)),
+                ('score_max', models.PositiveSmallIntegerField(null=True)),
+                ('score_mean', models.FloatField(null=True)),
+                ('paper', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='conferencesystem.paper')),
+                ('conference', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='conferencesystem.conference')),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='conferencesystem.track')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['conference', 'score_mean'], name='conferences_confere_6008a7_idx'), models.Index(fields=['track', 'score_mean'], name='conferences_track_i_7ddb4f_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    ]
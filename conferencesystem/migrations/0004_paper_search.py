@@ -0,0 +1,41 @@
+from django.db import migrations
+
+TABLE = 'conferencesystem_paper_search'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {TABLE} USING fts5(title, abstract)")
+        schema_editor.execute(
+            f"INSERT INTO {TABLE} (rowid, title, abstract) SELECT id, title, abstract FROM conferencesystem_paper"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE {TABLE} ("
+            f"paper_id bigint PRIMARY KEY REFERENCES conferencesystem_paper (id) ON DELETE CASCADE "
+            f"DEFERRABLE INITIALLY DEFERRED, "
+            f"document tsvector NOT NULL)"
+        )
+        schema_editor.execute(f"CREATE INDEX {TABLE}_document ON {TABLE} USING GIN (document)")
+        schema_editor.execute(
+            f"INSERT INTO {TABLE} (paper_id, document) SELECT id, "
+            f"setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', abstract), 'B') "
+            f"FROM conferencesystem_paper"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conferencesystem', '0003_score_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
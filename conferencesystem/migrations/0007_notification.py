@@ -0,0 +1,33 @@
+# Generated by Django 4.2.2 on 2026-10-17 22:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conferencesystem', '0006_importrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254)),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('claim', models.UUIDField(null=True)),
+                ('claimed_at', models.DateTimeField(null=True)),
+                ('paper', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='conferencesystem.paper')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sent_at', 'id'], name='conferences_sent_at_701430_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.2 on 2026-10-17 22:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+TABLE = 'conferencesystem_paper_search'
+
+
+def add_body_column(apps, schema_editor):
+    # FTS5 tables cannot gain columns, so the index is recreated with a body column for extracted text.
+    # No text has been extracted yet, so title and abstract are all there is to index. On PostgreSQL
+    # the text is simply added to the tsvector document.
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {TABLE} USING fts5(title, abstract, body)")
+        schema_editor.execute(
+            f"INSERT INTO {TABLE} (rowid, title, abstract, body) SELECT id, title, abstract, '' FROM conferencesystem_paper"
+        )
+
+
+def drop_body_column(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {TABLE} USING fts5(title, abstract)")
+        schema_editor.execute(
+            f"INSERT INTO {TABLE} (rowid, title, abstract) SELECT id, title, abstract FROM conferencesystem_paper"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conferencesystem', '0007_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaperText',
+            fields=[
+                ('paper', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text', serialize=False, to='conferencesystem.paper')),
+                ('text', models.TextField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='paper',
+            name='file_sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='paper',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='paper',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PaperJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('claim', models.UUIDField(null=True)),
+                ('claimed_at', models.DateTimeField(null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('timings', models.JSONField(default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('paper', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='conferencesystem.paper')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='conferences_status_239a3f_idx')],
+            },
+        ),
+        migrations.RunPython(add_body_column, drop_body_column),
+    ]
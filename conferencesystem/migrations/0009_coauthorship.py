@@ -0,0 +1,42 @@
+# Generated by Django 4.2.2 on 2026-10-17 22:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_coauthorships(apps, schema_editor):
+    schema_editor.execute(
+        "INSERT INTO conferencesystem_coauthorship (user_id, coauthor_id, papers) "
+        "SELECT a.user_id, b.user_id, COUNT(DISTINCT x.paper_id) "
+        "FROM conferencesystem_paper_authors x "
+        "JOIN conferencesystem_author a ON a.id = x.author_id "
+        "JOIN conferencesystem_paper_authors y ON y.paper_id = x.paper_id "
+        "JOIN conferencesystem_author b ON b.id = y.author_id "
+        "WHERE a.user_id <> b.user_id "
+        "GROUP BY a.user_id, b.user_id"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conferencesystem', '0008_paper_processing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Coauthorship',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('papers', models.PositiveIntegerField(default=1)),
+                ('coauthor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='coauthorship',
+            constraint=models.UniqueConstraint(fields=('user', 'coauthor'), name='coauthorship_edge'),
+        ),
+        migrations.RunPython(build_coauthorships, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-17 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conferencesystem', '0009_coauthorship'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conference',
+            name='review_deadline',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.2 on 2026-10-17 23:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conferencesystem', '0010_conference_review_deadline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaperEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('status', 'Status changed'), ('review', 'New review')], max_length=10)),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('paper', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='conferencesystem.paper')),
+            ],
+        ),
+    ]
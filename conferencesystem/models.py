@@ -1,4 +1,9 @@
+import os
+import uuid
+
+from django.core.files.storage import default_storage
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.utils import timezone
@@ -54,6 +59,14 @@ class User(AbstractUser):
     REQUIRED_FIELDS = ['phone']
 
     objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        # Prefix lookups for the user typeahead, see views.user_lookup
+        indexes = [
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+            models.Index(Lower('first_name'), name='user_first_name_lower_idx'),
+            models.Index(Lower('last_name'), name='user_last_name_lower_idx'),
+        ]
     
     def __str__(self):
         return self.email
@@ -65,6 +78,7 @@ class Conference(models.Model):
     description = models.TextField()
     start_date = models.DateField()
     end_date = models.DateField()
+    review_deadline = models.DateField(null=True, blank=True)
 
     def __str__(self):
         return self.title
@@ -113,8 +127,24 @@ class Paper(models.Model):
     authors = models.ManyToManyField(Author, related_name='papers')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='submitted')
 
+    # Filled in by the processing pipeline, see conferencesystem.pipeline
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    file_sha256 = models.CharField(max_length=64, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored manuscript so a replaced one is processed again
+        instance._stored_file = instance.__dict__.get('file')
+        # ... and the stored status, so a change of it is pushed to the event streams
+        instance._stored_status = instance.__dict__.get('status')
+        # ... and where it is filed, so a move carries its scores to the new track
+        instance._stored_track = (instance.__dict__.get('conference_id'), instance.__dict__.get('track_id'))
+        return instance
     
     def is_author(self, user):
         return self.authors.filter(user=user).exists()
@@ -139,4 +169,181 @@ class Review(models.Model):
         unique_together = ['paper', 'reviewer']
 
     def __str__(self):
-        return f"Review for {self.paper.title} by {self.reviewer.user.email}"
\ No newline at end of file
+        return f"Review for {self.paper.title} by {self.reviewer.user.email}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored score so an edit can be applied to the aggregates as a delta
+        instance._stored_score = instance.__dict__.get('score')
+        return instance
+
+class ScoreAggregate(models.Model):
+    """Running review score totals, kept up to date by conferencesystem.scores."""
+
+    review_count = models.PositiveIntegerField(default=0)
+    score_sum = models.PositiveIntegerField(default=0)
+    score_sq_sum = models.PositiveIntegerField(default=0)
+    score_min = models.PositiveSmallIntegerField(null=True)
+    score_max = models.PositiveSmallIntegerField(null=True)
+    score_mean = models.FloatField(null=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def score_stddev(self):
+        if not self.review_count:
+            return None
+        variance = self.score_sq_sum / self.review_count - self.score_mean ** 2
+        return max(variance, 0) ** 0.5
+
+class PaperScore(ScoreAggregate):
+    paper = models.OneToOneField(Paper, on_delete=models.CASCADE, primary_key=True, related_name='score')
+    conference = models.ForeignKey(Conference, on_delete=models.CASCADE)
+    track = models.ForeignKey(Track, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['conference', 'score_mean']),
+            models.Index(fields=['track', 'score_mean']),
+        ]
+
+    def __str__(self):
+        return f"Scores for {self.paper_id}"
+
+class TrackScore(ScoreAggregate):
+    track = models.OneToOneField(Track, on_delete=models.CASCADE, primary_key=True, related_name='score')
+    conference = models.ForeignKey(Conference, on_delete=models.CASCADE)
+
+    def __str__(self):
+        return f"Scores for track {self.track_id}"
+
+class ConferenceScore(ScoreAggregate):
+    conference = models.OneToOneField(Conference, on_delete=models.CASCADE, primary_key=True, related_name='score')
+
+    def __str__(self):
+        return f"Scores for conference {self.conference_id}"
+
+class Upload(models.Model):
+    """A manuscript being uploaded in resumable chunks before it is attached to a Paper."""
+
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    conference = models.ForeignKey(Conference, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    checksum = models.PositiveBigIntegerField(default=0)    # running CRC-32 of the received bytes
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size} bytes)"
+
+    @property
+    def path(self):
+        return default_storage.path(os.path.join('partial', f'{self.token}.part'))
+
+    def is_complete(self):
+        return self.received == self.size
+
+class ImportRun(models.Model):
+    """Checkpoint of a bulk import, advanced in the same transaction as each batch it records."""
+
+    source = models.CharField(max_length=255, unique=True)
+    position = models.PositiveBigIntegerField(default=0)     # records committed so far
+    conference_ids = models.JSONField(default=dict)         # import key -> Conference id
+    track_ids = models.JSONField(default=dict)              # import key -> Track id
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Import of {self.source} at record {self.position}"
+
+class Notification(models.Model):
+    """An email waiting in the outbox, written in the same transaction as the change it reports."""
+
+    paper = models.ForeignKey(Paper, on_delete=models.CASCADE, null=True)
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    claim = models.UUIDField(null=True)         # set by the worker sending it, see notifications.claim_batch
+    claimed_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['sent_at', 'id'])]
+
+    def __str__(self):
+        return f"{self.subject} to {self.recipient}"
+
+class PaperEvent(models.Model):
+    """A change to a paper for the open event streams of its authors and chairs, see conferencesystem.events."""
+
+    KIND_CHOICES = [
+        ('status', 'Status changed'),
+        ('review', 'New review'),
+    ]
+
+    paper = models.ForeignKey(Paper, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, blank=True)    # the new status, for 'status'
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for paper {self.paper_id}"
+
+class PaperText(models.Model):
+    """Text extracted from a paper's manuscript, indexed for search with its title and abstract."""
+
+    paper = models.OneToOneField(Paper, on_delete=models.CASCADE, primary_key=True, related_name='text')
+    text = models.TextField()
+
+    def __str__(self):
+        return f"Text of {self.paper_id}"
+
+class PaperJob(models.Model):
+    """A run of the processing pipeline over a paper's manuscript, queued when the manuscript is saved."""
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    paper = models.ForeignKey(Paper, on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claim = models.UUIDField(null=True)         # set by the worker running it
+    claimed_at = models.DateTimeField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+    timings = models.JSONField(default=dict)    # stage -> seconds
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'id'])]
+
+    def __str__(self):
+        return f"Processing of {self.paper_id} ({self.status})"
+
+class Coauthorship(models.Model):
+    """
+    One edge of the co-authorship graph: ``user`` and ``coauthor`` share
+    ``papers`` papers. Every edge is stored in both directions, so a user's
+    co-authors are one index range. Kept up to date by conferencesystem.coauthors.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    coauthor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    papers = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'coauthor'], name='coauthorship_edge')]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.coauthor_id}"
@@ -0,0 +1,68 @@
+"""
+Email outbox.
+
+Code that changes something users should hear about adds Notification
+rows in its own transaction. The email then goes out exactly when the
+change commits, and is not lost if the mail server is down. The
+send_notifications worker drains the outbox:
+
+  * claim_batch() takes up to NOTIFICATION_BATCH_SIZE unsent rows. It
+    stamps them with a claim token in one conditional UPDATE, so several
+    workers never send the same row. A claim older than NOTIFICATION_LEASE
+    seconds is treated as abandoned.
+  * send_batch() sends the batch over one open backend connection, which
+    the worker keeps across batches. It then marks the sent rows in one
+    UPDATE. Failed rows are released for a retry until they have been
+    tried NOTIFICATION_MAX_ATTEMPTS times.
+"""
+import datetime
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Notification
+
+
+def _claimable(now):
+    lease = datetime.timedelta(seconds=settings.NOTIFICATION_LEASE)
+    return Notification.objects.filter(
+        Q(claim__isnull=True) | Q(claimed_at__lt=now - lease),
+        sent_at__isnull=True,
+        attempts__lt=settings.NOTIFICATION_MAX_ATTEMPTS,
+    )
+
+
+def claim_batch(size=None):
+    """Claim and return the oldest unsent notifications."""
+    now = timezone.now()
+    token = uuid.uuid4()
+    ids = list(_claimable(now).order_by('id').values_list('id', flat=True)[:size or settings.NOTIFICATION_BATCH_SIZE])
+    # Rows another worker claimed since the SELECT no longer match and are skipped.
+    _claimable(now).filter(id__in=ids).update(claim=token, claimed_at=now)
+    return list(Notification.objects.filter(claim=token).order_by('id'))
+
+
+def send_batch(notifications, connection):
+    """Send claimed ``notifications`` over the open ``connection`` and record the outcome; return the number sent."""
+    sent, failed = [], []
+    for notification in notifications:
+        message = EmailMessage(
+            notification.subject, notification.body, settings.DEFAULT_FROM_EMAIL, [notification.recipient],
+            connection=connection,
+        )
+        try:
+            message.send()
+        except Exception as e:      # one bad address must not stop the batch
+            failed.append((notification.id, '{0}: {1}'.format(type(e).__name__, e)))
+        else:
+            sent.append(notification.id)
+
+    Notification.objects.filter(id__in=sent).update(sent_at=timezone.now(), claim=None, claimed_at=None)
+    for notification_id, error in failed:
+        Notification.objects.filter(id=notification_id).update(
+            attempts=F('attempts') + 1, last_error=error, claim=None, claimed_at=None,
+        )
+    return len(sent)
@@ -0,0 +1,22 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Pages are addressed by the id of the last row already shown instead of an
+OFFSET, so fetching page N costs the same as fetching page 1.
+"""
+
+
+def parse_cursor(value):
+    """Return a positive integer cursor from a query parameter, or None."""
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        return None
+    return cursor if cursor > 0 else None
+
+
+def next_page_query(request, param, cursor):
+    """Return the current query string with ``param`` set to ``cursor``."""
+    query = request.GET.copy()
+    query[param] = cursor
+    return query.urlencode()
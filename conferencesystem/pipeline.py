@@ -0,0 +1,100 @@
+"""
+Background processing of paper manuscripts.
+
+Saving a paper with a new manuscript queues a PaperJob in the same
+transaction, so submit_paper returns as soon as the file and the paper row
+are stored. The process_papers worker drains the queue:
+
+  * claim_jobs() takes up to a batch of queued jobs. It stamps them with a
+    claim token in one conditional UPDATE, as the notification outbox
+    does, so several workers never run the same job. A running job whose
+    claim is older than PAPER_JOB_LEASE seconds is treated as abandoned.
+  * The stages themselves (manuscripts.run_stages) are CPU-bound and run
+    in a pool of worker processes, away from the database.
+  * complete_job() stores the results on the paper, its extracted text in
+    PaperText and the search index, and the per-stage timings on the job.
+    A paper deleted while its job ran took the job with it, so its results
+    are dropped. fail_job() puts the job back in the queue until it has
+    been tried PAPER_JOB_MAX_ATTEMPTS times.
+"""
+import datetime
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Paper, PaperJob, PaperText
+from .search import index_papers
+
+
+def enqueue(paper_ids):
+    """Queue a processing job for each of ``paper_ids``."""
+    return PaperJob.objects.bulk_create([PaperJob(paper_id=paper_id) for paper_id in paper_ids], batch_size=1000)
+
+
+def _claimable(now):
+    lease = datetime.timedelta(seconds=settings.PAPER_JOB_LEASE)
+    return PaperJob.objects.filter(Q(status='queued') | Q(status='running', claimed_at__lt=now - lease))
+
+
+def claim_jobs(size):
+    """Claim and return the oldest queued jobs, with their papers."""
+    now = timezone.now()
+    token = uuid.uuid4()
+    ids = list(_claimable(now).order_by('id').values_list('id', flat=True)[:size])
+    # Jobs another worker claimed since the SELECT no longer match and are skipped.
+    _claimable(now).filter(id__in=ids).update(status='running', claim=token, claimed_at=now)
+    return list(PaperJob.objects.filter(claim=token).select_related('paper').order_by('id'))
+
+
+def complete_job(job, results, timings):
+    """
+    Store the ``results`` of manuscripts.run_stages for ``job``'s paper and
+    mark the job done. Return False when the paper was deleted meanwhile.
+    """
+    paper = job.paper
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            # update() rather than save(), which would queue the paper again. It also locks the
+            # paper's row, so the paper cannot be deleted under the writes below.
+            if not Paper.objects.filter(id=paper.id).update(
+                page_count=results['page_count'], file_sha256=results['sha256'], processed_at=now,
+            ):
+                return False
+            PaperText.objects.update_or_create(paper_id=paper.id, defaults={'text': results['text']})
+            index_papers([{'id': paper.id, 'title': paper.title, 'abstract': paper.abstract, 'body': results['text']}])
+            PaperJob.objects.filter(id=job.id).update(
+                status='done', attempts=job.attempts + 1, timings=timings, finished_at=now, claim=None, error='',
+            )
+    except IntegrityError:
+        # Deleted anyway, where the database does not lock updated rows
+        if not Paper.objects.filter(id=paper.id).exists():
+            return False
+        raise
+    return True
+
+
+def fail_job(job, error):
+    """Record a failed run of ``job``; queue it again unless it has run out of attempts."""
+    attempts = job.attempts + 1
+    status = 'queued' if attempts < settings.PAPER_JOB_MAX_ATTEMPTS else 'failed'
+    PaperJob.objects.filter(id=job.id).update(
+        status=status, attempts=attempts, error=error, claim=None, claimed_at=None,
+        finished_at=timezone.now() if status == 'failed' else None,
+    )
+
+
+@receiver(post_save, sender=Paper)
+def _paper_saved(sender, instance, created, update_fields=None, **kwargs):
+    name = instance.file.name
+    changed = created or (update_fields is not None and 'file' in update_fields) or (
+        update_fields is None and name != getattr(instance, '_stored_file', name)
+    )
+    if changed and name and (created or not instance.jobs.filter(status='queued').exists()):
+        enqueue([instance.pk])
+    instance._stored_file = name
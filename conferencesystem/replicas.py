@@ -0,0 +1,234 @@
+"""
+Read replicas.
+
+ReplicaRouter sends reads to the database aliases in DATABASE_REPLICAS and
+every write to the primary ('default'). Only reads made while serving a
+GET or HEAD request go to a replica. Management commands, workers and
+POST requests read the primary, because they often read what they have
+just written (the claim-then-fetch of the job queues, for one).
+
+ReplicaMiddleware decides this per request, which then sticks to one
+replica:
+
+  * a request that writes, or is not a GET or HEAD, reads the primary
+    from then on, and its response sets a cookie that keeps that browser
+    on the primary for REPLICA_PIN_SECONDS. Users read their own writes
+    even if the replicas lag behind.
+  * a replica is only used while it answers and lags the primary by no
+    more than REPLICA_MAX_LAG seconds. That is checked at most every
+    REPLICA_CHECK_INTERVAL seconds per process. With no usable replica
+    everything reads the primary.
+  * a sync view that fails with an OperationalError raised by its replica
+    connection (it went away, or cannot be opened) is run again on the
+    primary, and the replica is skipped until its next check. Other errors,
+    and any error from the primary, propagate as usual.
+
+What is read to fill the shared cache outlives the request and is stored
+under a version that was bumped for a change the replica may not have
+yet, so it is read from the primary: roles, cached users and the
+catalogue pages and fragments inside reading_primary(), and sessions,
+which the cached_db engine keeps in the cache, always.
+
+Lag is read from pg_last_xact_replay_timestamp() on PostgreSQL. A SQLite
+replica stands in for a real one locally: it is a copy of the primary
+made by `manage.py sync_replica`, and its lag is the age of the copy.
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+class _RequestState:
+    def __init__(self, primary):
+        self.primary = primary
+        self.replica = None     # alias picked for the request, '' once it has decided on the primary
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('replica_request', default=None)
+_reading_primary = contextvars.ContextVar('replica_reading_primary', default=False)
+
+
+class _Health:
+    """Per-process record of which replicas are usable, refreshed every REPLICA_CHECK_INTERVAL seconds."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checks = {}    # alias -> (monotonic time of the check, usable)
+
+    def usable(self):
+        now = time.monotonic()
+        aliases = []
+        for alias in settings.DATABASE_REPLICAS:
+            with self.lock:
+                checked_at, ok = self.checks.get(alias, (None, False))
+            if checked_at is None or now - checked_at > settings.REPLICA_CHECK_INTERVAL:
+                ok = check_replica(alias)
+                with self.lock:
+                    self.checks[alias] = (now, ok)
+            if ok:
+                aliases.append(alias)
+        return aliases
+
+    def failed(self, alias):
+        with self.lock:
+            self.checks[alias] = (time.monotonic(), False)
+
+    def reset(self):
+        with self.lock:
+            self.checks.clear()
+
+
+health = _Health()
+
+
+def replica_lag(alias):
+    """Seconds the replica ``alias`` is behind the primary; raises DatabaseError if it cannot be reached."""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)")
+            return float(cursor.fetchone()[0])
+        cursor.execute("SELECT 1")
+    if connection.vendor == 'sqlite' and not connection.is_in_memory_db():
+        return max(0.0, time.time() - os.path.getmtime(connection.settings_dict['NAME']))
+    return 0.0
+
+
+def check_replica(alias):
+    try:
+        lag = replica_lag(alias)
+    except (DatabaseError, OSError) as e:
+        logger.warning("Replica %s is unavailable: %s", alias, e)
+        return False
+    if lag > settings.REPLICA_MAX_LAG:
+        logger.warning("Replica %s lags %.1f seconds behind the primary.", alias, lag)
+        return False
+    return True
+
+
+def current_replica():
+    """The replica the current request reads from, or None for the primary."""
+    state = _state.get()
+    if state is None or state.primary or _reading_primary.get():
+        return None
+    if state.replica is None:
+        usable = health.usable()
+        state.replica = random.choice(usable) if usable else ''
+    return state.replica or None
+
+
+@contextlib.contextmanager
+def reading_primary():
+    """Read the primary inside the block, for reads that fill the shared cache."""
+    token = _reading_primary.set(True)
+    try:
+        yield
+    finally:
+        _reading_primary.reset(token)
+
+
+def pin_primary():
+    """Read the primary for the rest of the current request and, once it answers, for REPLICA_PIN_SECONDS."""
+    state = _state.get()
+    if state is not None:
+        state.primary = True
+        state.wrote = True
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.label == 'sessions.Session':
+            return DEFAULT_DB_ALIAS     # cached_db fills the cache from it, and a deleted session must stay gone
+        return current_replica()
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True     # every alias holds the same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    """Decide whether the request may read a replica, and keep browsers that just wrote on the primary."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.start(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state = self.start(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    def start(self, request):
+        for alias in settings.DATABASE_REPLICAS:
+            # Django flags a connection that raised; a failed connect leaves the flag standing.
+            connections[alias].errors_occurred = False
+        try:
+            pinned = float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            pinned = False
+        return _RequestState(primary=pinned or request.method not in SAFE_METHODS)
+
+    def finish(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, str(int(time.time() + settings.REPLICA_PIN_SECONDS)),
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._replica_view = (view_func, view_args, view_kwargs)
+
+    def process_exception(self, request, exception):
+        state = _state.get()
+        if not isinstance(exception, OperationalError) or state is None or not state.replica:
+            return None
+        if not connections[state.replica].errors_occurred:
+            return None     # raised by the primary
+        logger.warning("Replica %s failed, reading the primary instead: %s", state.replica, exception)
+        health.failed(state.replica)
+        state.primary = True
+        view_func, view_args, view_kwargs = getattr(request, '_replica_view', (None, (), {}))
+        if view_func is None or iscoroutinefunction(view_func):
+            return None
+        return view_func(request, *view_args, **view_kwargs)
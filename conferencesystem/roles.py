@@ -0,0 +1,142 @@
+"""
+Request-scoped resolution of a user's chair, author and reviewer roles.
+
+get_roles() loads the ids of every conference a user chairs and every paper
+they author or review, with one query per role. The result is kept on the
+request and in the shared cache. Each cached entry carries the user's role
+version. The signal handlers below drop that version whenever Chair,
+Author or Reviewer rows or their M2M links change, so a stale entry is
+never used. It is dropped again when the transaction commits: until then
+other requests still read the old rows, and may cache them under a new
+version.
+
+Roles are only cached across requests when CACHE_SHARED says every process
+sees the same cache. Otherwise a change made in one process would leave the
+others authorizing from stale roles, so each request loads them instead.
+"""
+import uuid
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Chair, Author, Reviewer, Paper
+from .replicas import reading_primary
+
+ROLE_MODELS = (Chair, Author, Reviewer)
+
+
+@dataclass(frozen=True)
+class Roles:
+    chair_conferences: frozenset = frozenset()
+    authored_papers: frozenset = frozenset()
+    reviewed_papers: frozenset = frozenset()
+
+    def is_chair(self, conference):
+        return _pk(conference) in self.chair_conferences
+
+    def is_author(self, paper):
+        return _pk(paper) in self.authored_papers
+
+    def is_reviewer(self, paper):
+        return _pk(paper) in self.reviewed_papers
+
+
+def _pk(obj):
+    return getattr(obj, 'pk', obj)
+
+
+def _version_key(user_id):
+    return 'roles:version:{0}'.format(user_id)
+
+
+def _roles_key(user_id):
+    return 'roles:{0}'.format(user_id)
+
+
+def load_roles(user):
+    return Roles(
+        chair_conferences=frozenset(
+            Chair.conferences.through.objects.filter(chair__user=user).values_list('conference_id', flat=True)
+        ),
+        authored_papers=frozenset(
+            Paper.authors.through.objects.filter(author__user=user).values_list('paper_id', flat=True)
+        ),
+        reviewed_papers=frozenset(
+            Reviewer.papers.through.objects.filter(reviewer__user=user).values_list('paper_id', flat=True)
+        ),
+    )
+
+
+def get_roles(request):
+    """Return the Roles of request.user, resolving them at most once per request."""
+    if not hasattr(request, '_roles'):
+        request._roles = get_user_roles(request.user)
+    return request._roles
+
+
+def get_user_roles(user):
+    if not user.is_authenticated:
+        return Roles()
+    if not settings.CACHE_SHARED:
+        return load_roles(user)
+
+    version_key, roles_key = _version_key(user.pk), _roles_key(user.pk)
+    cached = cache.get_many([version_key, roles_key])
+    version = cached.get(version_key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(version_key, version, None)
+    elif roles_key in cached and cached[roles_key][0] == version:
+        return cached[roles_key][1]
+
+    with reading_primary():     # a lagging replica would cache old roles under the new version
+        roles = load_roles(user)
+    cache.set(roles_key, (version, roles), getattr(settings, 'ROLE_CACHE_TIMEOUT', 300))
+    return roles
+
+
+def get_roles_version(user_id):
+    """Return a token that changes whenever the user's roles do."""
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(_version_key(user_id), version, None)
+    return version
+
+
+def invalidate_roles(user_ids):
+    """Drop the cached roles of ``user_ids``, now and again when the current transaction commits."""
+    keys = [_version_key(user_id) for user_id in set(user_ids)]
+    cache.delete_many(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+@receiver([post_save, post_delete], sender=Chair)
+@receiver([post_save, post_delete], sender=Author)
+@receiver([post_save, post_delete], sender=Reviewer)
+def _role_row_changed(sender, instance, **kwargs):
+    invalidate_roles([instance.user_id])
+
+
+@receiver(m2m_changed, sender=Chair.conferences.through)
+@receiver(m2m_changed, sender=Paper.authors.through)
+@receiver(m2m_changed, sender=Reviewer.papers.through)
+def _role_link_changed(sender, instance, action, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if isinstance(instance, ROLE_MODELS):
+        invalidate_roles([instance.user_id])
+        return
+
+    # Changed from the conference or paper side: find the role rows affected.
+    if action == 'pre_clear':
+        source = sender._meta.get_field(instance._meta.model_name)
+        target = next(f for f in sender._meta.get_fields() if f.is_relation and f.related_model is model)
+        pk_set = sender.objects.filter(**{source.name: instance}).values_list(target.attname, flat=True)
+    invalidate_roles(model.objects.filter(pk__in=pk_set).values_list('user_id', flat=True))
@@ -0,0 +1,241 @@
+"""
+Incrementally maintained review score aggregates.
+
+Every Review save or delete is applied as a delta to three rows: the
+paper's PaperScore, its TrackScore and its ConferenceScore. Count, sum and
+sum of squares are adjusted with a single UPDATE per row using F()
+expressions, inside the transaction of the write itself. A minimum or
+maximum cannot be un-applied, so when a score leaves a row its extremes are
+recomputed from the level below: the paper's reviews, or the track's or
+conference's PaperScore rows. Rankings therefore read only the aggregate
+tables, however many reviews there are.
+
+A paper moved to another track or conference takes its totals along: they
+leave the old rollups and join the new ones. When a conference or track is
+deleted, the aggregates of its papers go in the same cascade, so their
+reviews are deleted without applying a delta each.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Conference, Paper, PaperScore, Review, Track, TrackScore, ConferenceScore
+
+
+def _shift_updates(count, total, squares, low=None, high=None):
+    # Every right-hand side sees the row as it was before this UPDATE.
+    updates = {
+        'review_count': F('review_count') + count,
+        'score_sum': F('score_sum') + total,
+        'score_sq_sum': F('score_sq_sum') + squares,
+        'score_mean': Case(
+            When(Q(review_count__gt=-count), then=(F('score_sum') + total) * 1.0 / (F('review_count') + count)),
+            default=None,
+        ),
+    }
+    if low is not None:
+        updates['score_min'] = Least(Coalesce('score_min', Value(low)), Value(low))
+        updates['score_max'] = Greatest(Coalesce('score_max', Value(high)), Value(high))
+    return updates
+
+
+def _delta_updates(added, removed):
+    count = (added is not None) - (removed is not None)
+    total = (added or 0) - (removed or 0)
+    squares = (added or 0) ** 2 - (removed or 0) ** 2
+    if added is not None and removed is None:
+        return _shift_updates(count, total, squares, added, added)
+    return _shift_updates(count, total, squares)
+
+
+def _apply(queryset, create, added, removed, extremes):
+    """Apply a delta to the single aggregate row selected by ``queryset``."""
+    if not queryset.update(**_delta_updates(added, removed)):
+        if removed is not None:
+            return      # nothing was ever counted here
+        try:
+            with transaction.atomic():
+                create(review_count=1, score_sum=added, score_sq_sum=added ** 2,
+                       score_min=added, score_max=added, score_mean=added)
+            return
+        except IntegrityError:
+            # Created concurrently; apply the delta to that row instead.
+            queryset.update(**_delta_updates(added, removed))
+    if removed is not None:
+        queryset.update(**extremes())
+
+
+def apply_review_delta(paper, added=None, removed=None):
+    """Move one review score from ``removed`` to ``added`` (either may be None) on all levels."""
+    if added == removed:
+        return
+
+    with transaction.atomic():
+        _apply(
+            PaperScore.objects.filter(paper_id=paper.pk),
+            lambda **values: PaperScore.objects.create(
+                paper_id=paper.pk, conference_id=paper.conference_id, track_id=paper.track_id, **values),
+            added, removed,
+            lambda: Review.objects.filter(paper_id=paper.pk).aggregate(score_min=Min('score'), score_max=Max('score')),
+        )
+        _apply(
+            TrackScore.objects.filter(track_id=paper.track_id),
+            lambda **values: TrackScore.objects.create(
+                track_id=paper.track_id, conference_id=paper.conference_id, **values),
+            added, removed,
+            lambda: PaperScore.objects.filter(track_id=paper.track_id).aggregate(
+                score_min=Min('score_min'), score_max=Max('score_max')),
+        )
+        _apply(
+            ConferenceScore.objects.filter(conference_id=paper.conference_id),
+            lambda **values: ConferenceScore.objects.create(conference_id=paper.conference_id, **values),
+            added, removed,
+            lambda: PaperScore.objects.filter(conference_id=paper.conference_id).aggregate(
+                score_min=Min('score_min'), score_max=Max('score_max')),
+        )
+
+
+def _extremes(**scope):
+    return PaperScore.objects.filter(**scope).aggregate(score_min=Min('score_min'), score_max=Max('score_max'))
+
+
+def _move_rollup(model, old, new, score, **values):
+    """Move ``score``'s totals from the ``model`` row filtered by ``old`` to the one filtered by ``new``."""
+    count, total, squares = score.review_count, score.score_sum, score.score_sq_sum
+    source = model.objects.filter(**old)
+    source.update(**_shift_updates(-count, -total, -squares))
+    source.update(**_extremes(**old))
+
+    target = model.objects.filter(**new)
+    if not target.update(**_shift_updates(count, total, squares, score.score_min, score.score_max)):
+        model.objects.create(
+            **new, **values, review_count=count, score_sum=total, score_sq_sum=squares,
+            score_min=score.score_min, score_max=score.score_max, score_mean=score.score_mean,
+        )
+
+
+def move_paper_scores(paper):
+    """File ``paper``'s PaperScore, and its share of the rollups, under its current track and conference."""
+    with transaction.atomic():
+        score = PaperScore.objects.filter(paper_id=paper.pk).first()
+        if score is None or (score.conference_id, score.track_id) == (paper.conference_id, paper.track_id):
+            return
+        PaperScore.objects.filter(paper_id=paper.pk).update(conference_id=paper.conference_id, track_id=paper.track_id)
+        if not score.review_count:
+            return
+
+        _move_rollup(
+            TrackScore, {'track_id': score.track_id}, {'track_id': paper.track_id}, score,
+            conference_id=paper.conference_id,
+        )
+        if score.conference_id != paper.conference_id:
+            _move_rollup(
+                ConferenceScore, {'conference_id': score.conference_id}, {'conference_id': paper.conference_id}, score,
+            )
+
+
+def rebuild_scores(conference=None):
+    """Recompute every aggregate from the reviews, e.g. after rows were written with bulk_create."""
+    papers = Paper.objects.all()
+    if conference is not None:
+        papers = papers.filter(conference=conference)
+    scope = {} if conference is None else {'conference': conference}
+
+    with transaction.atomic():
+        PaperScore.objects.filter(**scope).delete()
+        TrackScore.objects.filter(**scope).delete()
+        ConferenceScore.objects.filter(**({} if conference is None else {'pk': conference.pk})).delete()
+
+        paper_scores = papers.annotate(
+            count=Count('review'),
+            total=Sum('review__score'),
+            squares=Sum(F('review__score') * F('review__score')),
+            low=Min('review__score'),
+            high=Max('review__score'),
+        ).values_list('id', 'conference_id', 'track_id', 'count', 'total', 'squares', 'low', 'high')
+        PaperScore.objects.bulk_create(
+            (
+                PaperScore(paper_id=paper_id, conference_id=conference_id, track_id=track_id, **_totals(*totals))
+                for paper_id, conference_id, track_id, *totals in paper_scores.iterator()
+            ),
+            batch_size=1000,
+        )
+
+        rollup = dict(
+            count=Sum('review_count'), total=Sum('score_sum'), squares=Sum('score_sq_sum'),
+            low=Min('score_min'), high=Max('score_max'),
+        )
+        track_scores = PaperScore.objects.filter(**scope).values('track_id', 'conference_id').annotate(**rollup)
+        TrackScore.objects.bulk_create(
+            [TrackScore(track_id=row.pop('track_id'), conference_id=row.pop('conference_id'), **_totals(**row))
+             for row in track_scores],
+            batch_size=1000,
+        )
+        conference_scores = PaperScore.objects.filter(**scope).values('conference_id').annotate(**rollup)
+        ConferenceScore.objects.bulk_create(
+            [ConferenceScore(conference_id=row.pop('conference_id'), **_totals(**row)) for row in conference_scores],
+            batch_size=1000,
+        )
+
+
+def _totals(count, total, squares, low, high):
+    return {
+        'review_count': count,
+        'score_sum': total or 0,
+        'score_sq_sum': squares or 0,
+        'score_min': low,
+        'score_max': high,
+        'score_mean': total / count if count else None,
+    }
+
+
+@receiver(post_save, sender=Paper)
+def _paper_saved(sender, instance, created, update_fields=None, **kwargs):
+    filed = (instance.conference_id, instance.track_id)
+    if created:
+        # Unreviewed papers get a row too, so they show up in the ranking.
+        PaperScore.objects.bulk_create(
+            [PaperScore(paper_id=instance.pk, conference_id=instance.conference_id, track_id=instance.track_id)],
+            ignore_conflicts=True,
+        )
+    elif (update_fields is None or {'conference', 'track'} & set(update_fields)) and (
+        getattr(instance, '_stored_track', None) != filed
+    ):
+        move_paper_scores(instance)
+    instance._stored_track = filed
+
+
+def _origin_model(origin):
+    return origin.model if hasattr(origin, 'model') else type(origin)    # a deleted queryset or instance
+
+
+@receiver(pre_delete, sender=Track)
+def _track_deleting(sender, instance, origin=None, **kwargs):
+    if _origin_model(origin) is Track:
+        instance._deleted_score = TrackScore.objects.filter(track_id=instance.pk).first()
+
+
+@receiver(post_delete, sender=Track)
+def _track_deleted(sender, instance, **kwargs):
+    # The track's totals leave its conference's rollup once, instead of a delta per review.
+    score = getattr(instance, '_deleted_score', None)
+    if score is not None and score.review_count:
+        scores = ConferenceScore.objects.filter(conference_id=score.conference_id)
+        scores.update(**_shift_updates(-score.review_count, -score.score_sum, -score.score_sq_sum))
+        scores.update(**_extremes(conference_id=score.conference_id))
+
+
+@receiver(post_save, sender=Review)
+def _review_saved(sender, instance, created, **kwargs):
+    stored = None if created else getattr(instance, '_stored_score', None)
+    apply_review_delta(instance.paper, added=instance.score, removed=stored)
+    instance._stored_score = instance.score
+
+
+@receiver(post_delete, sender=Review)
+def _review_deleted(sender, instance, origin=None, **kwargs):
+    if _origin_model(origin) in (Conference, Track):
+        return      # its aggregates go in the same cascade, see _track_deleted
+    apply_review_delta(instance.paper, removed=getattr(instance, '_stored_score', instance.score))
@@ -0,0 +1,175 @@
+"""
+Full-text search over paper titles, abstracts and manuscript text.
+
+The index lives beside the paper table in conferencesystem_paper_search:
+
+    SQLite      an FTS5 table with the paper id as rowid, ranked with bm25()
+    PostgreSQL  a tsvector column with a GIN index, ranked with ts_rank()
+
+Migration 0004 creates it for whichever backend is configured, and 0008
+adds the body column. Titles weigh most, then abstracts, then the body,
+which is the text the processing pipeline extracts from the manuscript
+(PaperText). It is kept in sync by the Paper signal handlers below and by
+the pipeline. Writes that bypass signals, such as bulk_create and
+queryset.update, need a `manage.py rebuild_search_index` afterwards. On
+other backends search falls back to an unranked icontains scan.
+"""
+import re
+
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Paper, PaperText
+
+TABLE = 'conferencesystem_paper_search'
+CONFIG = 'english'
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _backend():
+    return connection.vendor if connection.vendor in ('sqlite', 'postgresql') else None
+
+
+def _upsert_sql():
+    if _backend() == 'sqlite':
+        return (
+            [f"DELETE FROM {TABLE} WHERE rowid = %s", 'id'],
+            [f"INSERT INTO {TABLE} (rowid, title, abstract, body) VALUES (%s, %s, %s, %s)",
+             'id', 'title', 'abstract', 'body'],
+        )
+    return (
+        [
+            f"INSERT INTO {TABLE} (paper_id, document) VALUES "
+            f"(%s, setweight(to_tsvector('{CONFIG}', %s), 'A') || setweight(to_tsvector('{CONFIG}', %s), 'B') "
+            f"|| setweight(to_tsvector('{CONFIG}', %s), 'C')) "
+            f"ON CONFLICT (paper_id) DO UPDATE SET document = EXCLUDED.document",
+            'id', 'title', 'abstract', 'body',
+        ],
+    )
+
+
+def index_papers(papers):
+    """Add or refresh papers (dicts or objects with id, title, abstract and optionally body) in the index."""
+    if not _backend():
+        return
+    statements = _upsert_sql()
+    with connection.cursor() as cursor:
+        for sql, *fields in statements:
+            rows = [[_value(paper, field) for field in fields] for paper in papers]
+            if rows:
+                cursor.executemany(sql, rows)
+
+
+def _value(paper, field):
+    value = paper.get(field) if isinstance(paper, dict) else getattr(paper, field, None)
+    return '' if value is None and field == 'body' else value
+
+
+def remove_papers(paper_ids):
+    backend = _backend()
+    if not backend or not paper_ids:
+        return
+    column = 'rowid' if backend == 'sqlite' else 'paper_id'
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {TABLE} WHERE {column} = %s", [[paper_id] for paper_id in paper_ids])
+
+
+def rebuild_index(batch_size=2000):
+    backend = _backend()
+    if not backend:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+    batch = []
+    papers = Paper.objects.values('id', 'title', 'abstract', body=F('text__text'))
+    for paper in papers.iterator(chunk_size=batch_size):
+        batch.append(paper)
+        if len(batch) == batch_size:
+            index_papers(batch)
+            batch = []
+    index_papers(batch)
+
+
+def _fts5_query(text):
+    # Quote every word so user input cannot use FTS5 operators; the last word matches as a prefix.
+    words = _WORD_RE.findall(text)
+    if not words:
+        return None
+    terms = ['"{0}"'.format(word) for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def match_papers(papers, text):
+    """Filter the ``papers`` queryset to those matching ``text``, in the queryset's own order."""
+    backend = _backend()
+    if backend == 'sqlite':
+        query = _fts5_query(text)
+        if query is None:
+            return papers.none()
+        return papers.filter(id__in=RawSQL(f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", [query]))
+    if backend == 'postgresql':
+        if not text.strip():
+            return papers.none()
+        return papers.filter(id__in=RawSQL(
+            f"SELECT paper_id FROM {TABLE} WHERE document @@ websearch_to_tsquery('{CONFIG}', %s)", [text],
+        ))
+    words = _WORD_RE.findall(text)
+    if not words:
+        return papers.none()
+    for word in words:
+        papers = papers.filter(Q(title__icontains=word) | Q(abstract__icontains=word))
+    return papers
+
+
+def search_paper_ids(text, conference_ids, limit, offset=0):
+    """Return ids of papers in ``conference_ids`` matching ``text``, best match first."""
+    conference_ids = list(conference_ids)
+    if not conference_ids or not text.strip():
+        return []
+    placeholders = ', '.join(['%s'] * len(conference_ids))
+    backend = _backend()
+
+    if backend == 'sqlite':
+        query = _fts5_query(text)
+        if query is None:
+            return []
+        sql = (
+            f"SELECT p.id FROM {TABLE} s JOIN conferencesystem_paper p ON p.id = s.rowid "
+            f"WHERE {TABLE} MATCH %s AND p.conference_id IN ({placeholders}) "
+            f"ORDER BY bm25({TABLE}, 10.0, 1.0, 0.5), p.id LIMIT %s OFFSET %s"
+        )
+        params = [query, *conference_ids, limit, offset]
+    elif backend == 'postgresql':
+        sql = (
+            f"SELECT p.id FROM {TABLE} s JOIN conferencesystem_paper p ON p.id = s.paper_id, "
+            f"websearch_to_tsquery('{CONFIG}', %s) q "
+            f"WHERE s.document @@ q AND p.conference_id IN ({placeholders}) "
+            f"ORDER BY ts_rank(s.document, q) DESC, p.id LIMIT %s OFFSET %s"
+        )
+        params = [text, *conference_ids, limit, offset]
+    else:
+        papers = Paper.objects.filter(conference_id__in=conference_ids)
+        for word in _WORD_RE.findall(text):
+            papers = papers.filter(Q(title__icontains=word) | Q(abstract__icontains=word))
+        return list(papers.order_by('id').values_list('id', flat=True)[offset:offset + limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+@receiver(post_save, sender=Paper)
+def _paper_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is None or {'title', 'abstract'} & set(update_fields):
+        body = None if created else PaperText.objects.filter(paper_id=instance.pk).values_list('text', flat=True).first()
+        index_papers([{'id': instance.pk, 'title': instance.title, 'abstract': instance.abstract, 'body': body}])
+
+
+@receiver(post_delete, sender=Paper)
+def _paper_deleted(sender, instance, **kwargs):
+    remove_papers([instance.pk])
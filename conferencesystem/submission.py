@@ -0,0 +1,79 @@
+"""
+The write path of a paper submission.
+
+The paper, any missing Author rows and the author <-> conference and
+paper <-> author links are written in one transaction with a fixed number
+of queries, however many co-authors the paper lists: one lookup of the
+existing authors, one bulk insert of the missing ones, and one bulk insert
+per through table. The manuscript is flushed to disk before the view
+answers; page counting, text extraction and the rest are left to the
+processing pipeline, which the paper save queues.
+"""
+import os
+
+from django.db import transaction
+
+from .coauthors import record_new_papers
+from .models import Author, Paper
+from .roles import invalidate_roles
+
+AuthorConference = Author.conferences.through
+PaperAuthor = Paper.authors.through
+
+
+def _author_ids(user_ids):
+    # Users may have several Author rows from before; use their oldest.
+    author_ids = {}
+    for author_id, user_id in Author.objects.filter(user_id__in=user_ids).order_by('-id').values_list('id', 'user_id'):
+        author_ids[user_id] = author_id
+    return author_ids
+
+
+def get_or_create_author_ids(user_ids):
+    """Return {user id: Author id} for ``user_ids``, creating the missing Author rows in one query."""
+    author_ids = _author_ids(user_ids)
+    missing = set(user_ids) - author_ids.keys()
+    if missing:
+        Author.objects.bulk_create([Author(user_id=user_id) for user_id in missing])
+        author_ids = _author_ids(user_ids)
+    return author_ids
+
+
+def _sync(fieldfile):
+    try:
+        path = fieldfile.path
+    except NotImplementedError:     # remote storage, durable once saved
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def save_submission(form, conference, submitter):
+    """Save a valid PaperSubmissionForm, with ``submitter`` and the selected users as its authors."""
+    user_ids = {user.id for user in form.cleaned_data['authors']} | {submitter.id}
+
+    with transaction.atomic():
+        paper = form.save(commit=False)
+        paper.conference = conference
+        paper.save()
+
+        author_ids = get_or_create_author_ids(user_ids)
+
+        AuthorConference.objects.bulk_create(
+            [AuthorConference(author_id=author_id, conference_id=conference.id) for author_id in author_ids.values()],
+            ignore_conflicts=True,      # already an author of this conference
+        )
+        PaperAuthor.objects.bulk_create(
+            [PaperAuthor(paper_id=paper.id, author_id=author_id) for author_id in author_ids.values()],
+        )
+        record_new_papers([paper.id])
+        # After an upload is moved into place, see attach_upload()
+        transaction.on_commit(lambda: _sync(paper.file))
+
+    # bulk_create sends no post_save or m2m_changed signals, see also record_new_papers() above
+    invalidate_roles(user_ids)
+
+    return paper
@@ -0,0 +1,169 @@
+"""
+Seeded synthetic data for benchmarks.
+
+generate() fills the database with conferences, tracks, chairs, authors,
+reviewers, papers, reviewer assignments and reviews. It uses the real
+models and writes with bulk_create in batches, so it scales to 10k
+conferences, 1M papers, 100k reviewers and 3M reviews while holding only
+one batch in memory. The same seed and counts always produce the same
+data. Users have predictable emails, so a benchmark can sign in as the
+right role for any conference or paper:
+
+    chair<n>@bench.example      chair of conference n (1-based, in insertion order)
+    author<n>@bench.example
+    reviewer<n>@bench.example
+
+Every user's password is PASSWORD. All papers share one manuscript file
+in storage.
+"""
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from . import coauthors, search
+from .models import Author, Chair, Conference, Paper, Review, Reviewer, Track, User
+from .scores import rebuild_scores
+from .submission import AuthorConference, PaperAuthor
+
+PASSWORD = 'benchmark'
+TRACKS_PER_CONFERENCE = 3
+BATCH_SIZE = 5000
+PHONE_PREFIXES = {'chair': 7, 'author': 8, 'reviewer': 9}      # keeps the unique phones apart
+
+ChairConference = Chair.conferences.through
+ReviewerPaper = Reviewer.papers.through
+
+WORDS = (
+    'graph neural network learning vision transformer language model retrieval sparse dense '
+    'attention robust causal inference federated privacy quantum compiler verification '
+    'distributed storage streaming scheduling energy efficient secure protocol benchmark'
+).split()
+
+
+def _chunks(start, stop, size=BATCH_SIZE):
+    for low in range(start, stop, size):
+        yield range(low, min(low + size, stop))
+
+
+def _title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 7))).capitalize()
+
+
+def _create_users(role, count, password):
+    for numbers in _chunks(1, count + 1):
+        User.objects.bulk_create([
+            User(
+                email='{0}{1}@bench.example'.format(role, n), phone='+91{0}{1:09d}'.format(PHONE_PREFIXES[role], n),
+                first_name=role.capitalize(), last_name=str(n), password=password,
+            )
+            for n in numbers
+        ])
+
+
+def _ids(queryset):
+    return list(queryset.order_by('id').values_list('id', flat=True))
+
+
+def generate(seed=0, conferences=10, papers=1000, reviewers=100, reviews=3000, authors=None, log=None):
+    """Create the data set described by the arguments and return its counts."""
+    rng = random.Random(seed)
+    authors = authors or max(1, papers // 2)
+    password = make_password(PASSWORD)
+    manuscript = default_storage.save('papers/benchmark.pdf', ContentFile(b'%PDF-1.4\n' + b'0' * 50000))
+    today = datetime.date.today()
+    log = log or (lambda message: None)
+
+    with transaction.atomic():
+        log('users')
+        _create_users('chair', conferences, password)
+        _create_users('author', authors, password)
+        _create_users('reviewer', reviewers, password)
+
+        log('conferences')
+        for numbers in _chunks(0, conferences):
+            Conference.objects.bulk_create([
+                Conference(
+                    title='Conference {0}: {1}'.format(n + 1, _title(rng)), organizing_institute='Benchmark Institute',
+                    institute_details='Synthetic', description=_title(rng),
+                    start_date=today + datetime.timedelta(days=n % 365),
+                    end_date=today + datetime.timedelta(days=n % 365 + 30),
+                )
+                for n in numbers
+            ])
+        conference_ids = _ids(Conference.objects.filter(organizing_institute='Benchmark Institute'))
+        chair_user_ids = _ids(User.objects.filter(email__startswith='chair', email__endswith='@bench.example'))
+        Chair.objects.bulk_create([Chair(user_id=user_id) for user_id in chair_user_ids], batch_size=BATCH_SIZE)
+        chair_ids = _ids(Chair.objects.filter(user_id__in=chair_user_ids))
+        ChairConference.objects.bulk_create(
+            [ChairConference(chair_id=chair_id, conference_id=conference_id)
+             for chair_id, conference_id in zip(chair_ids, conference_ids)],
+            batch_size=BATCH_SIZE,
+        )
+        Track.objects.bulk_create(
+            [Track(conference_id=conference_id, title=_title(rng), description='Synthetic')
+             for conference_id in conference_ids for _ in range(TRACKS_PER_CONFERENCE)],
+            batch_size=BATCH_SIZE,
+        )
+        tracks = {}
+        for track_id, conference_id in Track.objects.filter(conference_id__in=conference_ids).values_list('id', 'conference_id'):
+            tracks.setdefault(conference_id, []).append(track_id)
+
+        author_user_ids = _ids(User.objects.filter(email__startswith='author', email__endswith='@bench.example'))
+        Author.objects.bulk_create([Author(user_id=user_id) for user_id in author_user_ids], batch_size=BATCH_SIZE)
+        author_ids = _ids(Author.objects.filter(user_id__in=author_user_ids))
+        reviewer_user_ids = _ids(User.objects.filter(email__startswith='reviewer', email__endswith='@bench.example'))
+        Reviewer.objects.bulk_create([Reviewer(user_id=user_id) for user_id in reviewer_user_ids], batch_size=BATCH_SIZE)
+        reviewer_ids = _ids(Reviewer.objects.filter(user_id__in=reviewer_user_ids))
+
+    # Papers, their links and reviews go in batches of their own transactions.
+    reviews_per_paper, extra_reviews = divmod(reviews, papers) if papers else (0, 0)
+    for numbers in _chunks(0, papers):
+        log('papers {0}-{1}'.format(numbers.start, numbers.stop))
+        with transaction.atomic():
+            batch = []
+            for n in numbers:
+                conference_id = rng.choice(conference_ids)
+                batch.append(Paper(
+                    title=_title(rng), abstract=' '.join(rng.choice(WORDS) for _ in range(40)), file=manuscript,
+                    conference_id=conference_id, track_id=rng.choice(tracks[conference_id]),
+                    status=rng.choice(('submitted', 'under_review', 'accepted', 'rejected')),
+                ))
+            batch = Paper.objects.bulk_create(batch)
+
+            paper_authors, conference_authors, assignments, batch_reviews = [], set(), [], []
+            for n, paper in zip(numbers, batch):
+                for author_id in rng.sample(author_ids, min(len(author_ids), rng.randint(1, 3))):
+                    paper_authors.append(PaperAuthor(paper_id=paper.id, author_id=author_id))
+                    conference_authors.add((author_id, paper.conference_id))
+                count = min(len(reviewer_ids), reviews_per_paper + (n < extra_reviews))
+                for reviewer_id in rng.sample(reviewer_ids, count):
+                    assignments.append(ReviewerPaper(paper_id=paper.id, reviewer_id=reviewer_id))
+                    batch_reviews.append(Review(
+                        paper_id=paper.id, reviewer_id=reviewer_id, score=rng.randint(1, 5), comments=_title(rng),
+                    ))
+
+            PaperAuthor.objects.bulk_create(paper_authors, batch_size=BATCH_SIZE)
+            AuthorConference.objects.bulk_create(
+                [AuthorConference(author_id=author_id, conference_id=conference_id)
+                 for author_id, conference_id in conference_authors],
+                batch_size=BATCH_SIZE, ignore_conflicts=True,
+            )
+            ReviewerPaper.objects.bulk_create(assignments, batch_size=BATCH_SIZE)
+            Review.objects.bulk_create(batch_reviews, batch_size=BATCH_SIZE)
+
+    # bulk_create sends no signals; derive the aggregates, the search index and the graph in one pass each.
+    log('scores')
+    rebuild_scores()
+    log('search index')
+    search.rebuild_index()
+    log('co-authorship graph')
+    coauthors.rebuild_graph()
+
+    return {
+        'conferences': conferences, 'papers': papers, 'authors': authors,
+        'reviewers': reviewers, 'reviews': Review.objects.count(),
+    }
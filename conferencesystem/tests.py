@@ -1,3 +1,1917 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import io
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import uuid
+import zipfile
+import zlib
+from collections import Counter
+from contextlib import closing
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.models import AnonymousUser, Group, Permission
+from django.contrib.sessions.backends.db import SessionStore
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, OperationalError, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, AsyncRequestFactory, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from . import assignment, async_views, catalogue
+from .admin import EstimatedCountPaginator, sync_chairs
+from .admission import admit
+from .assignment import assign_reviewers, plan_assignments
+from .authentication import get_cached_user
+from .backends.sqlite3.base import DatabaseWrapper as SQLiteWrapper
+from .coauthors import conflict_report, is_conflicted, pair_changes, rebuild_graph
+from .decisions import apply_decision, decision_papers
+from .events import broker, new_events
+from .benchmark import compare, route_names, run_benchmark
+from .importer import RecordError
+from .lookups import lookup_users
+from .manuscripts import run_stages
+from .notifications import claim_batch
+from .pipeline import claim_jobs
+from .replicas import PIN_COOKIE, ReplicaMiddleware, current_replica, health
+from .roles import Roles, get_user_roles
+from .scores import rebuild_scores
+from .search import search_paper_ids
+from .synthetic import generate
+from .middleware import QueryBudgetMiddleware, QueryBudgetExceeded, query_budget, query_shape
+from .models import (
+    User, Conference, Track, Chair, Author, Reviewer, Review, Paper, Upload, PaperScore, TrackScore, ImportRun, Coauthorship,
+    Notification, PaperEvent, PaperJob, PaperText,
+)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='conferencesystem-tests-'))
+class ConferenceTestCase(TestCase):
+    """Shared fixtures: one conference with a track, a chair and an author."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.conference = Conference.objects.create(
+            title='ICML', organizing_institute='KJSIT', institute_details='Mumbai',
+            description='Machine learning', start_date=datetime.date.today(),
+            end_date=datetime.date.today() + datetime.timedelta(days=30),
+        )
+        cls.track = Track.objects.create(conference=cls.conference, title='Vision', description='CV')
+        cls.chair_user = cls.make_user('chair@example.com')
+        chair = Chair.objects.create(user=cls.chair_user)
+        chair.conferences.add(cls.conference)
+        cls.author_user = cls.make_user('author@example.com')
+
+    def setUp(self):
+        # Cached roles must not leak between tests whose rows were rolled back
+        cache.clear()
+
+    @classmethod
+    def make_user(cls, email):
+        n = User.objects.count()
+        return User.objects.create_user(email=email, phone='+9198200{0:05d}'.format(n), password='pw')
+
+    def make_paper(self, users, title='Paper', track=None):
+        paper = Paper.objects.create(
+            title=title, abstract='Abstract', conference=self.conference,
+            track=track or self.track, file=ContentFile(b'%PDF-1.4', name='paper.pdf'),
+        )
+        for user in users:
+            author, created = Author.objects.get_or_create(user=user)
+            paper.authors.add(author)
+        return paper
+
+
+class QueryBudgetMiddlewareTests(ConferenceTestCase):
+    def run_view(self, view, budget=None):
+        if budget is not None:
+            view = query_budget(budget)(view)
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = QueryBudgetMiddleware(get_response)
+        request = RequestFactory().get('/')
+        return middleware(request), request
+
+    def test_query_shape_ignores_literals(self):
+        self.assertEqual(
+            query_shape('SELECT * FROM t WHERE id = 1 AND name = \'a\''),
+            query_shape('SELECT * FROM t WHERE id = 22 AND name = \'bb\''),
+        )
+
+    def test_counts_queries(self):
+        def view(request):
+            list(Conference.objects.all())
+            list(Track.objects.all())
+            return HttpResponse()
+
+        response, request = self.run_view(view)
+        self.assertEqual(request.query_log.count, 2)
+
+    def test_flags_repeated_shapes(self):
+        def view(request):
+            for track in Track.objects.all():
+                Conference.objects.get(id=track.conference_id)
+                Conference.objects.get(id=track.conference_id)
+                Conference.objects.get(id=track.conference_id)
+            return HttpResponse()
+
+        with self.assertLogs('conferencesystem.middleware', 'WARNING') as logs:
+            self.run_view(view)
+        self.assertIn('Possible N+1', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_over_budget_raises(self):
+        def view(request):
+            list(Conference.objects.all())
+            list(Track.objects.all())
+            return HttpResponse()
+
+        self.run_view(view, budget=2)
+        with self.assertRaises(QueryBudgetExceeded):
+            self.run_view(view, budget=1)
+
+    def test_paper_detail_cost_does_not_grow_with_authors(self):
+        users = [self.make_user('coauthor{0}@example.com'.format(i)) for i in range(10)]
+        small = self.make_paper([self.author_user])
+        large = self.make_paper([self.author_user] + users)
+        self.client.force_login(self.author_user)
+
+        counts = []
+        for paper in (small, large):
+            cache.clear()
+            response = self.client.get(reverse('conferencesystem:paper_detail', args=[paper.id]))
+            self.assertEqual(response.status_code, 200)
+            counts.append(response.wsgi_request.query_log.count)
+        self.assertEqual(counts[0], counts[1])
+
+
+class ConferencePapersBoardTests(ConferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_track = Track.objects.create(conference=self.conference, title='NLP', description='NLP')
+        self.vision = [self.make_paper([self.author_user], 'Vision {0}'.format(i)) for i in range(3)]
+        self.nlp = [self.make_paper([self.author_user], 'NLP {0}'.format(i), self.other_track) for i in range(2)]
+        self.url = reverse('conferencesystem:view_conf_papers', args=[self.conference.id])
+        self.client.force_login(self.chair_user)
+
+    def board(self, response):
+        return {track.id: page for track, page in response.context['papers_by_track'].items()}
+
+    def test_groups_papers_by_track(self):
+        board = self.board(self.client.get(self.url))
+        self.assertEqual(board[self.track.id]['papers'], self.vision)
+        self.assertEqual(board[self.other_track.id]['papers'], self.nlp)
+
+    @mock.patch('conferencesystem.views.PAPERS_PER_TRACK', 2)
+    def test_keyset_pagination_per_track(self):
+        board = self.board(self.client.get(self.url))
+        self.assertEqual(board[self.track.id]['papers'], self.vision[:2])
+        self.assertIsNone(board[self.other_track.id]['next_query'])
+
+        response = self.client.get(self.url + '?' + board[self.track.id]['next_query'])
+        board = self.board(response)
+        self.assertEqual(board[self.track.id]['papers'], self.vision[2:])
+        self.assertEqual(board[self.other_track.id]['papers'], self.nlp)
+
+    def test_filters(self):
+        Paper.objects.filter(id=self.vision[0].id).update(status='accepted')
+        board = self.board(self.client.get(self.url, {'status': 'accepted'}))
+        self.assertEqual([paper.id for paper in board[self.track.id]['papers']], [self.vision[0].id])
+        self.assertEqual(board[self.other_track.id]['papers'], [])
+
+        board = self.board(self.client.get(self.url, {'track': self.other_track.id}))
+        self.assertEqual(list(board), [self.other_track.id])
+
+
+class DownloadPaperTests(ConferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.paper = self.make_paper([self.author_user])
+        self.url = reverse('conferencesystem:download_paper', args=[self.paper.id])
+        self.client.force_login(self.author_user)
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+
+    def test_range_request(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 1-3/8')
+        self.assertEqual(b''.join(response.streaming_content), b'PDF')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'1.4')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=50-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(PAPER_DOWNLOAD_BACKEND='x-accel-redirect')
+    def test_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + self.paper.file.name)
+        self.assertEqual(response.content, b'')
+
+    def test_forbidden_for_other_users(self):
+        self.client.force_login(self.make_user('stranger@example.com'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class ChunkedUploadTests(ConferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.author_user)
+
+    def create_upload(self, data):
+        url = reverse('conferencesystem:create_upload', args=[self.conference.id])
+        response = self.client.post(url, {'filename': 'manuscript.pdf', 'size': len(data)})
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def send(self, upload, chunk, offset):
+        return self.client.patch(
+            upload['url'], chunk, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_resumable_upload_and_submission(self):
+        data = b'%PDF-1.4 ' + b'x' * 100
+        upload = self.create_upload(data)
+
+        self.assertEqual(self.send(upload, data[:40], 0).json()['offset'], 40)
+        # A retried chunk at a stale offset is rejected with the offset to resume from.
+        response = self.send(upload, data[:40], 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 40)
+
+        status = self.send(upload, data[40:], 40).json()
+        self.assertTrue(status['complete'])
+        self.assertEqual(status['checksum'], '{0:08x}'.format(zlib.crc32(data)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('conferencesystem:submit_paper', args=[self.conference.id]), {
+                'title': 'Chunked', 'abstract': 'Abstract', 'track': self.track.id, 'upload_token': upload['token'],
+            })
+        paper = Paper.objects.get(title='Chunked')
+        self.assertRedirects(response, reverse('conferencesystem:paper_detail', args=[paper.id]))
+        self.assertTrue(paper.file.name.startswith('papers/manuscript'))
+        with paper.file.open('rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertFalse(Upload.objects.exists())
+
+    def test_rolled_back_submission_keeps_the_upload(self):
+        data = b'%PDF-1.4 upload'
+        upload = self.create_upload(data)
+        self.send(upload, data, 0)
+
+        with mock.patch('conferencesystem.submission.record_new_papers', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.post(reverse('conferencesystem:submit_paper', args=[self.conference.id]), {
+                    'title': 'Chunked', 'abstract': 'Abstract', 'track': self.track.id, 'upload_token': upload['token'],
+                })
+        self.assertFalse(Paper.objects.filter(title='Chunked').exists())
+        upload = Upload.objects.get(token=upload['token'])
+        with open(upload.path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_conflicting_chunk_leaves_the_file_alone(self):
+        upload = self.create_upload(b'0123456789')
+        self.send(upload, b'01234', 0)
+        # A duplicate that lost the race is turned away before writing anything.
+        self.assertEqual(self.send(upload, b'abcde', 0).status_code, 409)
+        self.assertEqual(self.send(upload, b'56789', 5).json()['offset'], 10)
+        with open(Upload.objects.get().path, 'rb') as f:
+            self.assertEqual(f.read(), b'0123456789')
+
+    def test_purge_expired_uploads(self):
+        upload = self.create_upload(b'0123456789')
+        self.send(upload, b'01234', 0)
+        path = Upload.objects.get().path
+        fresh = self.create_upload(b'0123456789')
+
+        Upload.objects.filter(token=upload['token']).update(created_at=timezone.now() - datetime.timedelta(days=2))
+        call_command('purge_uploads', stdout=io.StringIO())
+        self.assertEqual(list(Upload.objects.values_list('token', flat=True)), [uuid.UUID(fresh['token'])])
+        self.assertFalse(os.path.exists(path))
+
+    def test_incomplete_upload_is_rejected(self):
+        upload = self.create_upload(b'0123456789')
+        self.send(upload, b'01234', 0)
+
+        response = self.client.post(reverse('conferencesystem:submit_paper', args=[self.conference.id]), {
+            'title': 'Chunked', 'abstract': 'Abstract', 'track': self.track.id, 'upload_token': upload['token'],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('upload_token', response.context['form'].errors)
+
+
+class PaperSubmissionTests(ConferenceTestCase):
+    def submit(self, title, coauthors):
+        return self.client.post(reverse('conferencesystem:submit_paper', args=[self.conference.id]), {
+            'title': title, 'abstract': 'Abstract', 'track': self.track.id,
+            'file': SimpleUploadedFile('paper.pdf', b'%PDF-1.4'),
+            'authors': [user.id for user in coauthors],
+        })
+
+    def test_query_count_does_not_grow_with_authors(self):
+        self.client.force_login(self.author_user)
+        few = [self.make_user('few{0}@example.com'.format(i)) for i in range(1)]
+        many = [self.make_user('many{0}@example.com'.format(i)) for i in range(15)]
+        self.client.get(reverse('conferencesystem:profile'))    # warm the user cache
+
+        with CaptureQueriesContext(connection) as one_author:
+            self.submit('One', few)
+        with CaptureQueriesContext(connection) as fifteen_authors:
+            self.submit('Fifteen', many)
+        self.assertEqual(len(one_author), len(fifteen_authors))
+
+        paper = Paper.objects.get(title='Fifteen')
+        self.assertEqual(
+            set(paper.authors.values_list('user__email', flat=True)),
+            {user.email for user in many} | {'author@example.com'},
+        )
+        self.assertEqual(Author.objects.filter(conferences=self.conference).count(), 17)
+        self.assertEqual(Author.objects.filter(user=self.author_user).count(), 1)   # reused for the second paper
+        self.assertTrue(get_user_roles(many[0]).is_author(paper))
+
+    def test_failure_leaves_no_partial_rows(self):
+        self.client.force_login(self.author_user)
+        coauthor = self.make_user('coauthor@example.com')
+
+        with mock.patch.object(Paper.authors.through.objects, 'bulk_create', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            self.submit('Broken', [coauthor])
+        self.assertFalse(Paper.objects.exists())
+        self.assertFalse(Author.objects.exists())
+
+
+@override_settings(SUBMISSION_CONFERENCE_CONCURRENCY=1, SUBMISSION_QUEUE_LENGTH=2, SUBMISSION_FRONT_WAIT=0)
+class SubmissionAdmissionTests(ConferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.author_user)
+
+    def submit(self, title, **data):
+        return self.client.post(reverse('conferencesystem:submit_paper', args=[self.conference.id]), {
+            'title': title, 'abstract': 'Abstract', 'track': self.track.id, **data,
+        })
+
+    def upload(self, user):
+        upload = Upload.objects.create(user=user, conference=self.conference, filename='paper.pdf', size=8, received=8)
+        os.makedirs(os.path.dirname(upload.path), exist_ok=True)
+        with open(upload.path, 'wb') as f:
+            f.write(b'%PDF-1.4')
+        return upload
+
+    def test_submissions_wait_in_line_while_the_slots_are_taken(self):
+        busy = admit(self.conference.id, self.chair_user.id, ready=True)
+        self.assertTrue(busy.admitted)
+
+        response = self.submit('Queued', file=SimpleUploadedFile('paper.pdf', b'%PDF-1.4'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')     # first in line
+        self.assertEqual(response.context['admission'].position, 1)
+        self.assertContains(response, 'number 1 in line', status_code=503)
+        self.assertFalse(Paper.objects.exists())
+
+        # The manuscript is kept, so the retry only posts the ticket and the upload token.
+        form = response.context['form']
+        upload = Upload.objects.get(token=form['upload_token'].value())
+        self.assertTrue(upload.is_complete())
+
+        busy.release()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.submit('Queued', admission_ticket=form['admission_ticket'].value(), upload_token=upload.token)
+        paper = Paper.objects.get(title='Queued')
+        self.assertRedirects(response, reverse('conferencesystem:paper_detail', args=[paper.id]))
+        self.assertEqual(paper.file.read(), b'%PDF-1.4')
+
+        # Its slot was given back.
+        self.assertTrue(admit(self.conference.id, self.chair_user.id, ready=True).admitted)
+
+    def test_finished_uploads_go_first(self):
+        busy = admit(self.conference.id, self.chair_user.id, ready=True)
+        waiting = admit(self.conference.id, self.author_user.id, ready=False)
+        ready = self.submit('Ready', upload_token=self.upload(self.author_user).token)
+        self.assertEqual(ready.context['admission'].position, 1)
+        busy.release()
+
+        self.assertFalse(admit(self.conference.id, self.author_user.id, ready=False, token=waiting.ticket).admitted)
+        response = self.submit('Ready', **{
+            'admission_ticket': ready.context['form']['admission_ticket'].value(),
+            'upload_token': ready.context['form']['upload_token'].value(),
+        })
+        self.assertEqual(response.status_code, 302)
+        again = admit(self.conference.id, self.author_user.id, ready=False, token=waiting.ticket)
+        self.assertTrue(again.admitted)
+
+    def test_the_wait_follows_the_time_saves_take(self):
+        now = time.monotonic()
+        for seconds in (0.3, 0.3):
+            with mock.patch('time.monotonic', return_value=now):
+                busy = admit(self.conference.id, self.chair_user.id, ready=True)
+            with mock.patch('time.monotonic', return_value=now + seconds):
+                busy.release()
+        admit(self.conference.id, self.chair_user.id, ready=True)
+
+        first = admit(self.conference.id, self.author_user.id, ready=False)
+        second = admit(self.conference.id, self.author_user.id, ready=False)
+        self.assertEqual((first.retry_ms, first.retry_after), (300, 1))     # one save away
+        self.assertEqual((second.retry_ms, second.retry_after), (600, 1))   # two
+
+    @override_settings(SUBMISSION_FRONT_WAIT=5)
+    def test_the_front_of_the_line_takes_a_slot_as_it_is_given_back(self):
+        busy = admit(self.conference.id, self.chair_user.id, ready=True)
+        first = admit(self.conference.id, self.author_user.id, ready=False)
+        self.assertIsNotNone(first.ticket)      # newcomers do not wait in the request
+        second = admit(self.conference.id, self.author_user.id, ready=False)
+
+        with mock.patch('time.sleep', side_effect=lambda seconds: busy.release()) as sleep:
+            self.assertFalse(admit(self.conference.id, self.author_user.id, ready=False, token=second.ticket).admitted)
+            self.assertFalse(sleep.called)      # not at the front
+            self.assertTrue(admit(self.conference.id, self.author_user.id, ready=False, token=first.ticket).admitted)
+        self.assertEqual(sleep.call_count, 1)
+
+    def test_a_full_queue_turns_submitters_away(self):
+        admit(self.conference.id, self.chair_user.id, ready=True)
+        for _ in range(2):
+            self.assertIsNotNone(admit(self.conference.id, self.author_user.id, ready=False).ticket)
+
+        response = self.submit('Turned away', file=SimpleUploadedFile('paper.pdf', b'%PDF-1.4'))
+        self.assertEqual(response.status_code, 503)
+        self.assertIsNone(response.context['admission'].ticket)
+        self.assertContains(response, 'Please submit again in 5 seconds', status_code=503)
+        self.assertFalse(Upload.objects.exists())
+
+    @override_settings(SUBMISSION_QUEUE_LENGTH=10)
+    def test_tickets_belong_to_their_user_and_lapse(self):
+        admit(self.conference.id, self.chair_user.id, ready=True)
+        first = admit(self.conference.id, self.author_user.id, ready=False)
+        second = admit(self.conference.id, self.author_user.id, ready=False)
+        self.assertEqual((first.position, second.position), (1, 2))
+
+        # Someone else's token is not a place in line.
+        self.assertEqual(admit(self.conference.id, self.chair_user.id, ready=False, token=second.ticket).position, 3)
+
+        # A ticket retried within SUBMISSION_TICKET_TIMEOUT keeps its place; one that was not lapses.
+        now = time.time()
+        with mock.patch('time.time', return_value=now + 40):
+            self.assertEqual(admit(self.conference.id, self.author_user.id, ready=False, token=second.ticket).position, 2)
+        with mock.patch('time.time', return_value=now + 61):
+            self.assertEqual(admit(self.conference.id, self.author_user.id, ready=False, token=second.ticket).position, 1)
+            self.assertEqual(admit(self.conference.id, self.author_user.id, ready=False, token=first.ticket).position, 2)
+
+
+class ReviewerAssignmentTests(ConferenceTestCase):
+    def test_plan_balances_load_and_skips_conflicts(self):
+        result = plan_assignments(range(10), {1: 10, 2: 10, 3: 10}, 2, conflicts={(1, 0)})
+        loads = Counter(reviewer_id for reviewer_id, paper_id in result.assignments)
+        self.assertEqual(sorted(loads.values()), [6, 7, 7])
+        self.assertNotIn((1, 0), result.assignments)
+        self.assertEqual(result.unfilled, {})
+
+    def test_plan_respects_capacity(self):
+        result = plan_assignments(range(5), {1: 2, 2: 2}, 1, existing={(1, 0)})
+        self.assertEqual(len(result.assignments), 3)
+        self.assertEqual(result.unfilled, {4: 1})
+
+    def test_plan_moves_assignments_to_fill_every_paper(self):
+        # Greedy hands paper 1 to A, leaving paper 2 with only the conflicted B.
+        result = plan_assignments([1, 2], {'A': 1, 'B': 1}, 1, conflicts={('B', 2)})
+        self.assertEqual(sorted(result.assignments), [('A', 2), ('B', 1)])
+        self.assertEqual(result.unfilled, {})
+
+    def test_plan_repair_keeps_existing_pairs(self):
+        # Only A could take paper 2, and A's paper 1 was assigned before, so it stays short.
+        result = plan_assignments([1, 2], {'A': 1, 'B': 1}, 1, existing={('A', 1)}, conflicts={('B', 2)})
+        self.assertEqual(result.assignments, [])
+        self.assertEqual(result.unfilled, {2: 1})
+
+    def test_plan_stops_repairing_when_capacity_runs_short(self):
+        conflicts = {(reviewer_id, reviewer_id) for reviewer_id in range(200)}
+        with mock.patch('conferencesystem.assignment._augment', wraps=assignment._augment) as augment:
+            result = plan_assignments(range(1000), dict.fromkeys(range(200), 10), 3, conflicts=conflicts)
+        self.assertEqual(len(result.assignments), 2000)
+        self.assertEqual(sum(result.unfilled.values()), 1000)
+        self.assertEqual(augment.call_count, 0)     # nobody has room, so no search is made
+
+        # Reviewer 0 has room but is conflicted with every short paper: one search rules them out.
+        capacities = dict.fromkeys(range(1, 200), 10) | {0: 20}
+        conflicts = {(0, paper_id) for paper_id in range(1000)}
+        with mock.patch('conferencesystem.assignment._augment', wraps=assignment._augment) as augment:
+            result = plan_assignments(range(1000), capacities, 3, conflicts=conflicts)
+        self.assertEqual(sum(result.unfilled.values()), 1010)
+        self.assertEqual(augment.call_count, len(result.unfilled))
+
+    def test_chair_assigns_in_bulk(self):
+        papers = [self.make_paper([self.author_user], 'Paper {0}'.format(i)) for i in range(4)]
+        reviewers = [self.make_user('reviewer{0}@example.com'.format(i)) for i in range(2)]
+        self.client.force_login(self.chair_user)
+
+        response = self.client.post(reverse('conferencesystem:assign_reviewers', args=[self.conference.id]), {
+            'reviewers': '\n'.join(user.email for user in reviewers + [self.author_user]),
+            'per_paper': 2,
+            'capacity': 4,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['result'].assignments), 8)
+        for paper in papers:
+            paper.refresh_from_db()
+            self.assertEqual(paper.status, 'under_review')
+            self.assertFalse(paper.is_reviewer(self.author_user))
+            self.assertEqual(paper.reviewer_set.count(), 2)
+        # The status change reaches the authors' open event streams.
+        self.assertEqual(PaperEvent.objects.filter(kind='status', status='under_review').count(), 4)
+
+
+class CoauthorshipTests(ConferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ada, self.bob, self.cy = (self.make_user(name + '@example.com') for name in ('ada', 'bob', 'cy'))
+
+    def edges(self):
+        return {(edge.user_id, edge.coauthor_id): edge.papers for edge in Coauthorship.objects.all()}
+
+    def test_graph_follows_author_changes(self):
+        first = self.make_paper([self.ada, self.bob])
+        second = self.make_paper([self.ada, self.bob, self.cy])
+        ada, bob, cy = self.ada.pk, self.bob.pk, self.cy.pk
+        self.assertEqual(self.edges(), {
+            (ada, bob): 2, (bob, ada): 2, (ada, cy): 1, (cy, ada): 1, (bob, cy): 1, (cy, bob): 1,
+        })
+
+        second.authors.remove(Author.objects.get(user=self.cy))
+        self.assertEqual(self.edges(), {(ada, bob): 2, (bob, ada): 2})
+
+        Author.objects.get(user=self.cy).papers.add(first)     # from the author's side
+        first.delete()
+        self.assertEqual(self.edges(), {(ada, bob): 1, (bob, ada): 1})
+
+        Author.objects.get(user=self.bob).delete()
+        self.assertEqual(self.edges(), {})
+
+    def test_incremental_graph_matches_rebuild(self):
+        self.make_paper([self.ada, self.bob, self.author_user])
+        paper = self.make_paper([self.bob, self.cy])
+        paper.authors.clear()
+        paper.authors.add(Author.objects.get(user=self.cy), Author.objects.get(user=self.ada))
+        incremental = self.edges()
+        rebuild_graph()
+        self.assertEqual(self.edges(), incremental)
+
+    def test_pair_changes_only_touch_the_users_who_joined_or_left(self):
+        consortium = set(range(1000))
+        delta = pair_changes({1: consortium}, {1: consortium - {0} | {1000}})
+        self.assertEqual(len(delta), 4 * 999)
+        self.assertEqual((delta[1000, 1], delta[1, 1000], delta[0, 1], delta[1, 0]), (1, 1, -1, -1))
+
+        def pairs(users):
+            return Counter((a, b) for a in users for b in users if a != b)
+
+        rng = random.Random(0)
+        for _ in range(200):
+            before = {paper_id: set(rng.sample(range(8), rng.randint(0, 5))) for paper_id in range(3)}
+            after = {paper_id: set(rng.sample(range(8), rng.randint(0, 5))) for paper_id in range(rng.randint(1, 3))}
+            expected = Counter()
+            for paper_id in range(3):
+                expected.update(pairs(after.get(paper_id, ())))
+                expected.subtract(pairs(before.get(paper_id, ())))
+            self.assertEqual(+pair_changes(before, after), +expected)
+            self.assertEqual(-pair_changes(before, after), -expected)
+
+    def test_conflicts_within_hops(self):
+        self.make_paper([self.ada, self.bob])
+        self.make_paper([self.bob, self.cy])
+        paper = self.make_paper([self.ada], 'Target')
+        self.assertTrue(is_conflicted(self.ada.pk, paper))
+        self.assertTrue(is_conflicted(self.bob.pk, paper))
+        self.assertFalse(is_conflicted(self.cy.pk, paper))
+        self.assertTrue(is_conflicted(self.cy.pk, paper, hops=2))
+        with self.assertNumQueries(2):
+            is_conflicted(self.cy.pk, paper, hops=1)
+
+    def test_add_reviewers_rejects_conflicted_users(self):
+        self.make_paper([self.ada, self.bob])
+        paper = self.make_paper([self.ada], 'Target')
+        url = reverse('conferencesystem:add_reviewers', args=[paper.id])
+        self.client.force_login(self.chair_user)
+
+        response = self.client.post(url, {'user': self.bob.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('conflict of interest', str(response.context['form'].errors))
+        self.assertFalse(paper.is_reviewer(self.bob))
+
+        self.assertEqual(self.client.post(url, {'user': self.cy.pk}).status_code, 302)
+        self.assertTrue(paper.is_reviewer(self.cy))
+
+    def test_bulk_assignment_and_report(self):
+        first = self.make_paper([self.ada, self.bob])
+        paper = self.make_paper([self.ada], 'Target')
+        result = assign_reviewers(self.conference, [self.bob, self.cy], per_paper=2, capacity=5)
+        self.assertEqual(result.unfilled, {first.id: 1, paper.id: 1})     # bob wrote one, co-authored with the other
+        self.assertEqual(paper.reviewer_set.get().user, self.cy)
+        self.assertEqual(conflict_report(self.conference), [])
+
+        reviewer = Reviewer.objects.get(user=self.bob)
+        reviewer.papers.add(paper)      # assigned before the conflict was known
+        self.client.force_login(self.chair_user)
+        response = self.client.get(reverse('conferencesystem:conference_conflicts', args=[self.conference.id]))
+        self.assertEqual(response.context['conflicts'], [(paper.id, 'Target', reviewer.id, 'bob@example.com')])
+
+class ReviewerInboxTests(ConferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reviewer_user = self.make_user('reviewer@example.com')
+        self.reviewer = Reviewer.objects.create(user=self.reviewer_user)
+        self.papers = [self.make_paper([self.author_user], 'Paper {0}'.format(i)) for i in range(5)]
+        self.reviewer.papers.add(*self.papers[:4])
+        Review.objects.create(paper=self.papers[1], reviewer=self.reviewer, score=4, comments='')
+        self.url = reverse('conferencesystem:reviewer_inbox')
+        self.client.force_login(self.reviewer_user)
+        self.client.get(self.url)      # warm the user cache
+
+    def titles(self, response):
+        return [paper.title for paper in response.context['papers']]
+
+    def test_lists_assigned_papers_with_review_state(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(self.titles(response), ['Paper 0', 'Paper 1', 'Paper 2', 'Paper 3'])
+        reviewed = {paper.title: (paper.reviewed, paper.my_score) for paper in response.context['papers']}
+        self.assertEqual(reviewed['Paper 1'], (True, 4))
+        self.assertEqual(reviewed['Paper 0'], (False, None))
+
+    def test_filters(self):
+        self.assertEqual(self.titles(self.client.get(self.url, {'state': 'reviewed'})), ['Paper 1'])
+        self.assertEqual(
+            self.titles(self.client.get(self.url, {'state': 'pending'})), ['Paper 0', 'Paper 2', 'Paper 3'],
+        )
+        self.assertEqual(self.titles(self.client.get(self.url, {'conference': self.conference.id + 1})), [])
+
+    @mock.patch('conferencesystem.views.INBOX_PAGE_SIZE', 3)
+    def test_keyset_pagination(self):
+        response = self.client.get(self.url, {'state': 'pending'})
+        self.assertEqual(self.titles(response), ['Paper 0', 'Paper 2', 'Paper 3'])
+        self.assertIsNone(response.context['next_query'])
+
+        response = self.client.get(self.url)
+        self.assertEqual(self.titles(response), ['Paper 0', 'Paper 1', 'Paper 2'])
+        response = self.client.get(self.url + '?' + response.context['next_query'])
+        self.assertEqual(self.titles(response), ['Paper 3'])
+
+    def test_query_count_does_not_grow_with_papers(self):
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.url)
+        more = [self.make_paper([self.author_user], 'More {0}'.format(i)) for i in range(10)]
+        self.reviewer.papers.add(*more)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(self.url)
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(len(response.context['papers']), 14)
+
+class RoleCacheTests(ConferenceTestCase):
+    def test_roles_are_cached(self):
+        paper = self.make_paper([self.author_user])
+        with self.assertNumQueries(3):
+            roles = get_user_roles(self.author_user)
+        self.assertTrue(roles.is_author(paper))
+        self.assertFalse(roles.is_chair(self.conference))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_roles(self.author_user), roles)
+        self.assertTrue(get_user_roles(self.chair_user).is_chair(self.conference))
+
+    def test_m2m_changes_invalidate_roles(self):
+        paper = self.make_paper([self.author_user])
+        user = self.make_user('reviewer@example.com')
+        self.assertFalse(get_user_roles(user).is_reviewer(paper))
+
+        reviewer = Reviewer.objects.create(user=user)
+        reviewer.papers.add(paper)
+        self.assertTrue(get_user_roles(user).is_reviewer(paper))
+
+        paper.reviewer_set.remove(reviewer)
+        self.assertFalse(get_user_roles(user).is_reviewer(paper))
+
+        self.assertTrue(get_user_roles(self.chair_user).is_chair(self.conference))
+        self.conference.chair_set.clear()
+        self.assertFalse(get_user_roles(self.chair_user).is_chair(self.conference))
+
+    def test_commit_drops_roles_cached_during_the_transaction(self):
+        paper = self.make_paper([self.author_user])
+        reviewer = Reviewer.objects.create(user=self.make_user('reviewer@example.com'))
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                reviewer.papers.add(paper)
+                # A concurrent request still reading the old rows caches them under the new version.
+                with mock.patch('conferencesystem.roles.load_roles', return_value=Roles()):
+                    self.assertFalse(get_user_roles(reviewer.user).is_reviewer(paper))
+        self.assertTrue(get_user_roles(reviewer.user).is_reviewer(paper))
+
+    @override_settings(CACHE_SHARED=False)
+    def test_roles_are_loaded_per_request_without_a_shared_cache(self):
+        paper = self.make_paper([self.author_user])
+        for attempt in range(2):
+            with self.assertNumQueries(3):
+                self.assertTrue(get_user_roles(self.author_user).is_author(paper))
+
+
+class UserCacheTests(ConferenceTestCase):
+    def test_warm_request_user_needs_no_queries(self):
+        self.client.force_login(self.author_user)
+        url = reverse('conferencesystem:profile')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.context['user'], self.author_user)
+
+    def test_password_change_signs_sessions_out(self):
+        self.client.force_login(self.author_user)
+        url = reverse('conferencesystem:profile')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        user = User.objects.get(pk=self.author_user.pk)
+        user.set_password('new password')
+        user.save()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_deactivated_users_are_not_served_from_cache(self):
+        self.client.force_login(self.author_user)
+        url = reverse('conferencesystem:profile')
+        self.client.get(url)
+        self.author_user.is_active = False
+        self.author_user.save()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_permission_and_group_changes_invalidate(self):
+        user_id = self.author_user.pk
+        permission = Permission.objects.get(codename='change_paper')
+        self.assertFalse(get_cached_user(user_id).has_perm('conferencesystem.change_paper'))
+
+        self.author_user.user_permissions.add(permission)
+        self.assertTrue(get_cached_user(user_id).has_perm('conferencesystem.change_paper'))
+
+        self.author_user.user_permissions.clear()
+        group = Group.objects.create(name='Editors')
+        group.permissions.add(permission)
+        group.user_set.add(self.author_user)
+        self.assertEqual(list(get_cached_user(user_id).groups.all()), [group])
+        self.assertTrue(get_cached_user(user_id).has_perm('conferencesystem.change_paper'))
+
+        group.user_set.clear()
+        with self.assertNumQueries(1):
+            user = get_cached_user(user_id)
+        self.assertFalse(user.has_perm('conferencesystem.change_paper'))
+
+    def test_commit_drops_users_cached_during_the_transaction(self):
+        user_id = self.author_user.pk
+        stale = get_cached_user(user_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.author_user.is_active = False
+                self.author_user.save()
+                # A concurrent request still reading the old row caches it under the new version.
+                with mock.patch.object(User._default_manager, 'filter', return_value=mock.Mock(first=lambda: stale)):
+                    self.assertTrue(get_cached_user(user_id).is_active)
+        self.assertFalse(get_cached_user(user_id).is_active)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_every_request_reads_the_user_without_a_shared_cache(self):
+        self.client.force_login(self.author_user)
+        url = reverse('conferencesystem:profile')
+        self.client.get(url)
+        # Deactivated by another process, whose signals never reach this one
+        User.objects.filter(pk=self.author_user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_shared_cache_backend(self):
+        # The file cache stands in for memcached or Redis: entries are pickled and outlive the process.
+        location = tempfile.mkdtemp()
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }}):
+            self.client.force_login(self.chair_user)
+            url = reverse('conferencesystem:profile')
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).context['user'], self.chair_user)
+            self.assertEqual(get_cached_user(self.chair_user.pk).phone, self.chair_user.phone)
+
+class CatalogueCacheTests(ConferenceTestCase):
+    def test_unknown_conference_is_404(self):
+        response = self.client.get(reverse('conferencesystem:conference_details', args=[9999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_anonymous_pages_are_cached(self):
+        url = reverse('conferencesystem:conference_details', args=[self.conference.id])
+        first = self.client.get(url)
+        self.assertContains(first, 'Vision')
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.content, first.content)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_saves_invalidate(self):
+        url = reverse('conferencesystem:conferences')
+        etag = self.client.get(url)['ETag']
+
+        self.conference.title = 'NeurIPS'
+        self.conference.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'NeurIPS')
+
+        url = reverse('conferencesystem:conference_details', args=[self.conference.id])
+        etag = self.client.get(url)['ETag']
+        Track.objects.create(conference=self.conference, title='Robotics', description='Robots')
+        self.assertContains(self.client.get(url, HTTP_IF_NONE_MATCH=etag), 'Robotics')
+
+    def test_chair_sees_own_copy(self):
+        url = reverse('conferencesystem:conference_details', args=[self.conference.id])
+        anonymous_etag = self.client.get(url)['ETag']
+
+        self.client.force_login(self.chair_user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertContains(response, 'You are a program chair')
+
+    def test_closed_submissions_change_the_etag(self):
+        url = reverse('conferencesystem:conference_details', args=[self.conference.id])
+        self.client.force_login(self.author_user)
+        response = self.client.get(url)
+        self.assertContains(response, 'Submit Paper')
+
+        after_deadline = timezone.now() + datetime.timedelta(days=31)
+        with mock.patch('django.utils.timezone.now', return_value=after_deadline):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Submit Paper')
+
+    @override_settings(CACHE_SHARED=False)
+    def test_nothing_is_cached_without_a_shared_cache(self):
+        url = reverse('conferencesystem:conference_details', args=[self.conference.id])
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('ETag'))
+
+        # A change made by another process, which bumps no version here
+        Conference.objects.filter(pk=self.conference.pk).update(title='NeurIPS')
+        Track.objects.filter(pk=self.track.pk).update(title='Robotics')
+        self.assertContains(self.client.get(url), 'NeurIPS')
+        self.assertContains(self.client.get(url), 'Robotics')
+        self.assertContains(self.client.get(reverse('conferencesystem:conferences')), 'NeurIPS')
+
+
+class AsyncViewTests(ConferenceTestCase):
+    def request(self, user, path='/', **extra):
+        request = AsyncRequestFactory().get(path, **extra)
+        request.user = user
+        return request
+
+    async def test_paper_detail(self):
+        paper = await sync_to_async(self.make_paper)([self.author_user])
+        stranger = await sync_to_async(self.make_user)('stranger@example.com')
+
+        response = await async_views.paper_detail(self.request(self.author_user), paper_id=paper.id)
+        self.assertContains(response, paper.title)
+        response = await async_views.paper_detail(self.request(stranger), paper_id=paper.id)
+        self.assertEqual(response.status_code, 403)
+
+    async def test_conference_papers_board(self):
+        paper = await sync_to_async(self.make_paper)([self.author_user])
+        response = await async_views.view_conference_papers(
+            self.request(self.chair_user), conference_id=self.conference.id,
+        )
+        self.assertContains(response, paper.title)
+
+    async def test_conference_details_conditional_get(self):
+        response = await async_views.conference_details(self.request(AnonymousUser()), conference_id=self.conference.id)
+        self.assertContains(response, 'Vision')
+
+        response = await async_views.conference_details(
+            self.request(AnonymousUser(), headers={'If-None-Match': response['ETag']}), conference_id=self.conference.id,
+        )
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(CACHE_SHARED=False)
+    async def test_catalogue_pages_load_a_signed_in_user_off_the_event_loop(self):
+        await sync_to_async(self.client.force_login)(self.chair_user)
+        request = AsyncRequestFactory().get('/')
+        request.session = SessionStore(self.client.cookies[settings.SESSION_COOKIE_NAME].value)
+        request.user = SimpleLazyObject(lambda: get_user(request))     # as AuthenticationMiddleware sets it
+
+        response = await async_views.conference_details(request, conference_id=self.conference.id)
+        self.assertContains(response, 'You are a program chair')
+        response = await async_views.conferences(request)
+        self.assertContains(response, self.conference.title)
+
+
+class ScoreAggregateTests(ConferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.papers = [self.make_paper([self.author_user], 'Paper {0}'.format(i)) for i in range(2)]
+        self.reviewers = []
+        for i in range(3):
+            reviewer = Reviewer.objects.create(user=self.make_user('reviewer{0}@example.com'.format(i)))
+            reviewer.papers.add(*self.papers)
+            self.reviewers.append(reviewer)
+
+    def review(self, paper, reviewer, score):
+        return Review.objects.create(paper=paper, reviewer=reviewer, score=score, comments='')
+
+    def assertScores(self, obj, count, total, low, high):
+        obj.refresh_from_db()
+        self.assertEqual(
+            (obj.review_count, obj.score_sum, obj.score_min, obj.score_max), (count, total, low, high),
+        )
+
+    def test_reviews_update_all_levels(self):
+        paper, other = self.papers
+        review = self.review(paper, self.reviewers[0], 2)
+        self.review(paper, self.reviewers[1], 4)
+        self.review(other, self.reviewers[0], 5)
+
+        self.assertScores(paper.score, 2, 6, 2, 4)
+        self.assertEqual(paper.score.score_mean, 3)
+        self.assertScores(self.track.score, 3, 11, 2, 5)
+        self.assertScores(self.conference.score, 3, 11, 2, 5)
+
+        review = Review.objects.get(pk=review.pk)
+        review.score = 3
+        review.save()
+        self.assertScores(paper.score, 2, 7, 3, 4)
+        self.assertScores(self.track.score, 3, 12, 3, 5)
+
+        # Removing a reviewer deletes their review as well.
+        self.client.force_login(self.chair_user)
+        self.client.post(reverse('conferencesystem:remove_reviewer', args=[paper.id, self.reviewers[1].id]))
+        self.assertScores(paper.score, 1, 3, 3, 3)
+        self.assertScores(self.conference.score, 2, 8, 3, 5)
+
+    def test_moved_paper_takes_its_scores_along(self):
+        paper, other = self.papers
+        self.review(paper, self.reviewers[0], 2)
+        self.review(paper, self.reviewers[1], 4)
+        self.review(other, self.reviewers[0], 5)
+
+        track = Track.objects.create(conference=self.conference, title='NLP', description='Language')
+        other = Paper.objects.get(pk=other.pk)
+        other.track = track
+        other.save()
+        self.assertScores(self.track.score, 2, 6, 2, 4)
+        self.assertScores(track.score, 1, 5, 5, 5)
+        self.assertScores(self.conference.score, 3, 11, 2, 5)
+
+        conference = Conference.objects.create(
+            title='CVPR', organizing_institute='KJSIT', institute_details='Mumbai', description='Vision',
+            start_date=datetime.date.today(), end_date=datetime.date.today(),
+        )
+        paper.conference, paper.track = conference, Track.objects.create(conference=conference, title='3D')
+        paper.save()
+        self.assertScores(self.conference.score, 1, 5, 5, 5)
+        self.assertScores(conference.score, 2, 6, 2, 4)
+        self.assertScores(paper.track.score, 2, 6, 2, 4)
+        self.assertScores(self.track.score, 0, 0, None, None)
+        self.assertEqual(self.track.score.score_mean, None)
+
+    def test_deleted_scopes_skip_review_deltas(self):
+        for paper in self.papers:
+            self.review(paper, self.reviewers[0], 3)
+        track = Track.objects.create(conference=self.conference, title='NLP', description='Language')
+        paper = self.make_paper([self.author_user], 'Moved', track=track)
+        self.review(paper, self.reviewers[0], 5)
+
+        with mock.patch('conferencesystem.scores.apply_review_delta') as apply:
+            track.delete()
+            self.assertScores(self.conference.score, 2, 6, 3, 3)
+            self.conference.delete()
+        apply.assert_not_called()
+        self.assertFalse(PaperScore.objects.exists() or TrackScore.objects.exists())
+
+    def test_rebuild_matches_incremental(self):
+        for paper, reviewer, score in [(0, 0, 1), (0, 1, 5), (1, 2, 3)]:
+            self.review(self.papers[paper], self.reviewers[reviewer], score)
+        incremental = list(PaperScore.objects.order_by('paper_id').values()) + list(TrackScore.objects.values())
+
+        rebuild_scores()
+        self.assertEqual(incremental, list(PaperScore.objects.order_by('paper_id').values()) + list(TrackScore.objects.values()))
+
+    def test_ranking(self):
+        self.review(self.papers[0], self.reviewers[0], 2)
+        self.review(self.papers[1], self.reviewers[0], 5)
+        self.client.force_login(self.chair_user)
+
+        url = reverse('conferencesystem:conference_ranking', args=[self.conference.id])
+        ranked = [score.paper for score in self.client.get(url).context['page']]
+        self.assertEqual(ranked, [self.papers[1], self.papers[0]])
+        ranked = [score.paper for score in self.client.get(url, {'sort': 'mean'}).context['page']]
+        self.assertEqual(ranked, [self.papers[0], self.papers[1]])
+
+
+class PaperSearchTests(ConferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.graph = self.make_paper([self.author_user], 'Graph neural networks')
+        self.vision = self.make_paper([self.author_user], 'Vision transformers')
+        self.url = reverse('conferencesystem:search_papers')
+
+    def search(self, q, **params):
+        return self.client.get(self.url, {'q': q, **params}).context['papers']
+
+    def test_ranked_search_scoped_to_chair(self):
+        other = Conference.objects.create(
+            title='CVPR', organizing_institute='KJSIT', institute_details='Mumbai', description='Vision',
+            start_date=datetime.date.today(), end_date=datetime.date.today(),
+        )
+        Paper.objects.create(
+            title='Graph theory', abstract='Abstract', conference=other,
+            track=Track.objects.create(conference=other, title='Theory', description=''),
+            file=ContentFile(b'%PDF-1.4', name='paper.pdf'),
+        )
+
+        self.client.force_login(self.chair_user)
+        self.assertEqual(self.search('graph'), [self.graph])
+        self.assertEqual(self.search('transform'), [self.vision])   # prefix match on the last word
+        self.assertEqual(self.search('"neural" -graph*'), [self.graph])     # FTS syntax is ignored
+
+        self.client.force_login(self.author_user)
+        self.assertEqual(self.search('graph'), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.client.force_login(self.chair_user)
+        self.graph.title = 'Hypergraph learning'
+        self.graph.save()
+        self.assertEqual(self.search('graph'), [])
+        self.assertEqual(self.search('hypergraph'), [self.graph])
+
+        self.graph.delete()
+        self.assertEqual(self.search('hypergraph'), [])
+
+
+class UserLookupTests(ConferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ada = self.make_user('ada@example.com')
+        User.objects.filter(pk=self.ada.pk).update(first_name='Ada', last_name='Lovelace')
+        self.alan = self.make_user('turing@example.com')
+        User.objects.filter(pk=self.alan.pk).update(first_name='Alan', last_name='Turing')
+        self.url = reverse('conferencesystem:user_lookup')
+        self.client.force_login(self.chair_user)
+
+    def lookup(self, q, **params):
+        return [user['email'] for user in self.client.get(self.url, {'q': q, **params}).json()['results']]
+
+    def test_prefix_matches_email_and_names(self):
+        self.assertEqual(self.lookup('ADA'), ['ada@example.com'])
+        self.assertEqual(self.lookup('tur'), ['turing@example.com'])
+        self.assertEqual(self.lookup('lovel'), ['ada@example.com'])
+        self.assertEqual(self.lookup('a'), [])     # too short
+        self.assertEqual(self.lookup('alan tu'), ['turing@example.com'])
+        self.assertEqual(self.lookup('ada tu'), [])
+        self.assertEqual(self.lookup('velace'), [])    # prefixes only
+
+    def test_paginates_with_cursor(self):
+        tuck = self.make_user('tuck@example.com')
+        with mock.patch('conferencesystem.views.LOOKUP_PAGE_SIZE', 1):
+            page = self.client.get(self.url, {'q': 'tu'}).json()
+            self.assertEqual([user['id'] for user in page['results']], [self.alan.pk])
+            self.assertEqual(page['results'][0]['name'], 'Alan Turing')
+
+            page = self.client.get(page['next']).json()
+            self.assertEqual([user['id'] for user in page['results']], [tuck.pk])
+            self.assertEqual(self.client.get(page['next']).json(), {'results': [], 'next': None})
+
+    def test_uses_expression_indexes(self):
+        with CaptureQueriesContext(connection) as queries:
+            lookup_users('ada')
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql'])
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        for index in ('user_email_lower_idx', 'user_first_name_lower_idx', 'user_last_name_lower_idx'):
+            self.assertIn(index, plan)
+
+    def test_add_reviewer_validates_submitted_id(self):
+        paper = self.make_paper([self.author_user])
+        url = reverse('conferencesystem:add_reviewers', args=[paper.id])
+
+        response = self.client.get(url)
+        self.assertNotContains(response, 'ada@example.com')    # users are not listed up front
+
+        response = self.client.post(url, {'user': 999999})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Reviewer.objects.exists())
+
+        response = self.client.post(url, {'user': self.ada.pk})
+        self.assertRedirects(response, url)
+        self.assertEqual(list(Reviewer.objects.get(user=self.ada).papers.all()), [paper])
+        self.assertContains(self.client.get(url), 'ada@example.com')
+
+
+class BulkImportTests(ConferenceTestCase):
+    records = [
+        {'type': 'conference', 'key': 'neurips', 'title': 'NeurIPS', 'organizing_institute': 'NIPS Foundation',
+         'start_date': '2030-12-01', 'end_date': '2030-12-07'},
+        {'type': 'track', 'key': 'ml', 'conference': 'neurips', 'title': 'ML'},
+        {'type': 'user', 'email': 'grace@example.com', 'phone': '+919820099001', 'first_name': 'Grace'},
+        {'type': 'paper', 'conference': 'neurips', 'track': 'ml', 'title': 'Sparse attention', 'abstract': 'A',
+         'file': 'one.pdf', 'authors': ['grace@example.com', 'author@example.com']},
+        {'type': 'paper', 'conference': 'neurips', 'track': 'ml', 'title': 'Dense retrieval', 'abstract': 'B',
+         'file': 'two.pdf', 'authors': ['grace@example.com'], 'status': 'accepted'},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, 'records.jsonl')
+        with open(self.path, 'w') as f:
+            f.writelines(json.dumps(record) + '\n' for record in self.records)
+        self.zip_path = os.path.join(directory, 'papers.zip')
+        with zipfile.ZipFile(self.zip_path, 'w') as files:
+            files.writestr('one.pdf', b'%PDF-1.4 one')
+            files.writestr('two.pdf', b'%PDF-1.4 two')
+
+    def test_import(self):
+        call_command('import_conferences', self.path, files=self.zip_path, batch_size=2, stdout=io.StringIO())
+
+        conference = Conference.objects.get(title='NeurIPS')
+        papers = {paper.title: paper for paper in conference.paper_set.all()}
+        self.assertEqual(set(papers), {'Sparse attention', 'Dense retrieval'})
+        self.assertEqual(papers['Dense retrieval'].status, 'accepted')
+        with papers['Sparse attention'].file.open('rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.4 one')
+
+        self.assertEqual(
+            set(papers['Sparse attention'].authors.values_list('user__email', flat=True)),
+            {'grace@example.com', 'author@example.com'},
+        )
+        self.assertEqual(Author.objects.filter(conferences=conference).count(), 2)
+        self.assertFalse(User.objects.get(email='grace@example.com').has_usable_password())
+        self.assertEqual(PaperScore.objects.filter(conference=conference).count(), 2)
+        self.assertTrue(get_user_roles(self.author_user).is_author(papers['Sparse attention']))
+
+        self.client.force_login(self.author_user)
+        response = self.client.get(reverse('conferencesystem:view_user_papers'))
+        self.assertContains(response, 'Sparse attention')
+
+    def test_resumes_after_last_committed_batch(self):
+        original = Paper.objects.bulk_create
+
+        def flaky_bulk_create(papers, *args, **kwargs):
+            if any(paper.title == 'Dense retrieval' for paper in papers):
+                raise RecordError(5, 'interrupted')
+            return original(papers, *args, **kwargs)
+
+        with mock.patch.object(Paper.objects, 'bulk_create', side_effect=flaky_bulk_create), \
+                self.assertRaises(CommandError):
+            call_command('import_conferences', self.path, files=self.zip_path, batch_size=2, stdout=io.StringIO())
+        self.assertEqual(ImportRun.objects.get().position, 4)
+        self.assertEqual(Paper.objects.filter(conference__title='NeurIPS').count(), 1)
+
+        out = io.StringIO()
+        call_command('import_conferences', self.path, files=self.zip_path, batch_size=2, stdout=out)
+        self.assertIn('Resuming after record 4.', out.getvalue())
+        self.assertEqual(Conference.objects.filter(title='NeurIPS').count(), 1)
+        self.assertEqual(Paper.objects.filter(conference__title='NeurIPS').count(), 2)
+        self.assertTrue(ImportRun.objects.get().finished)
+
+    def test_csv_and_unknown_references(self):
+        path = os.path.join(os.path.dirname(self.path), 'records.csv')
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, ['type', 'key', 'conference', 'track', 'title', 'abstract', 'file', 'authors'])
+            writer.writeheader()
+            writer.writerow({'type': 'track', 'key': 'ml', 'conference': 'missing', 'title': 'ML'})
+
+        with self.assertRaisesMessage(CommandError, "Record 1: unknown conference 'missing'."):
+            call_command('import_conferences', path, stdout=io.StringIO())
+        self.assertFalse(Track.objects.filter(title='ML').exists())
+
+    def write_records(self, records):
+        with open(self.path, 'w') as f:
+            f.writelines(json.dumps(record) + '\n' for record in records)
+
+    def test_track_must_belong_to_the_conference(self):
+        self.write_records(self.records[:3] + [
+            {'type': 'conference', 'key': 'icml', 'title': 'ICML', 'organizing_institute': 'IMLS',
+             'start_date': '2030-07-01', 'end_date': '2030-07-07'},
+            {'type': 'paper', 'conference': 'icml', 'track': 'ml', 'title': 'Misfiled', 'file': 'one.pdf',
+             'authors': ['grace@example.com']},
+        ])
+        with self.assertRaisesMessage(CommandError, "Record 5: track 'ml' is not a track of conference 'icml'."):
+            call_command('import_conferences', self.path, files=self.zip_path, stdout=io.StringIO())
+        self.assertFalse(Paper.objects.filter(title='Misfiled').exists())
+
+    def test_author_emails_are_normalized_like_users(self):
+        self.write_records(self.records[:3] + [
+            {'type': 'paper', 'conference': 'neurips', 'track': 'ml', 'title': 'Sparse attention', 'file': 'one.pdf',
+             'authors': [' grace@EXAMPLE.com', 'author@Example.COM ']},
+        ])
+        call_command('import_conferences', self.path, files=self.zip_path, stdout=io.StringIO())
+        paper = Paper.objects.get(title='Sparse attention')
+        self.assertEqual(
+            set(paper.authors.values_list('user__email', flat=True)), {'grace@example.com', 'author@example.com'},
+        )
+
+
+class PaperExportTests(ConferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_track = Track.objects.create(conference=self.conference, title='Language', description='NLP')
+        self.vision = self.make_paper([self.author_user], 'Vision transformers')
+        self.language = self.make_paper([self.author_user], 'Language models', track=self.other_track)
+        self.url = reverse('conferencesystem:export_papers', args=[self.conference.id])
+
+    def chunks(self, response):
+        self.assertTrue(response.streaming)
+        if response.is_async:   # settings.ASYNC_VIEWS
+            async def consume():
+                return [chunk async for chunk in response.streaming_content]
+            return async_to_sync(consume)()
+        return list(response.streaming_content)
+
+    def download(self, **params):
+        return zipfile.ZipFile(io.BytesIO(b''.join(self.chunks(self.client.get(self.url, params)))))
+
+    def test_streams_papers_and_manifest(self):
+        self.client.force_login(self.chair_user)
+        archive = self.download()
+
+        manifest = list(csv.DictReader(io.StringIO(archive.read('manifest.csv').decode())))
+        self.assertEqual([row['title'] for row in manifest], ['Vision transformers', 'Language models'])
+        self.assertEqual(manifest[0]['authors'], 'author@example.com')
+        for row in manifest:
+            self.assertEqual(archive.read(row['file']), b'%PDF-1.4')
+        self.assertIsNone(archive.testzip())
+
+        archive = self.download(track=self.other_track.id)
+        self.assertEqual(len(archive.namelist()), 2)
+        self.assertTrue(archive.namelist()[1].startswith('{0}-language/'.format(self.other_track.id)))
+
+    def test_missing_file_is_listed_without_content(self):
+        self.language.file.storage.delete(self.language.file.name)
+        self.client.force_login(self.chair_user)
+        archive = self.download()
+
+        manifest = list(csv.DictReader(io.StringIO(archive.read('manifest.csv').decode())))
+        self.assertEqual(manifest[1]['file'], '')
+        self.assertEqual(len(archive.namelist()), 2)
+
+    def test_chair_only(self):
+        self.client.force_login(self.author_user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_memory_does_not_grow_with_archive(self):
+        paper = self.make_paper([self.author_user], 'Large')
+        paper.file.save('large.pdf', ContentFile(os.urandom(64 * 1024) * 64), save=True)   # 4 MiB
+        self.client.force_login(self.chair_user)
+
+        largest = max(len(chunk) for chunk in self.chunks(self.client.get(self.url)))
+        self.assertLessEqual(largest, 2 * 64 * 1024)
+
+
+class BenchmarkTests(ConferenceTestCase):
+    def test_generate_is_seeded(self):
+        counts = generate(seed=1, conferences=2, papers=12, reviewers=4, reviews=30)
+        self.assertEqual(counts['reviews'], 30)
+        self.assertEqual(PaperScore.objects.filter(review_count__gt=0).count(), 12)
+        titles = list(Paper.objects.filter(conference__organizing_institute='Benchmark Institute').values_list('title', flat=True))
+
+        Conference.objects.filter(organizing_institute='Benchmark Institute').delete()
+        User.objects.filter(email__endswith='@bench.example').delete()
+        generate(seed=1, conferences=2, papers=12, reviewers=4, reviews=30)
+        self.assertEqual(
+            titles,
+            list(Paper.objects.filter(conference__organizing_institute='Benchmark Institute').values_list('title', flat=True)),
+        )
+
+    def test_every_route_runs_without_errors(self):
+        generate(conferences=2, papers=10, reviewers=3, reviews=20)
+        results = run_benchmark(requests=2, concurrency=1)
+
+        self.assertEqual(set(results), route_names())
+        self.assertEqual({name: result['errors'] for name, result in results.items() if result['errors']}, {})
+        self.assertGreater(results['paper_detail']['queries_max'], 0)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'paper_detail': {'p50_ms': 10.0, 'p95_ms': 20.0, 'throughput': 100.0, 'queries_max': 8, 'errors': 0}}
+        same = {'paper_detail': dict(baseline['paper_detail'], p50_ms=11.0)}
+        self.assertEqual(compare(baseline, same), [])
+
+        slower = {'paper_detail': dict(baseline['paper_detail'], p95_ms=40.0, queries_max=9)}
+        self.assertEqual(compare(baseline, slower), [
+            'paper_detail: p95_ms 20.0 -> 40.0', 'paper_detail: queries_max 8 -> 9',
+        ])
+
+
+class DecisionTests(ConferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.coauthor = self.make_user('coauthor@example.com')
+        self.reviewer = Reviewer.objects.create(user=self.make_user('reviewer@example.com'))
+        self.papers = {}
+        for score in (1, 2, 4, 5):
+            paper = self.make_paper([self.author_user, self.coauthor], 'Scored {0}'.format(score))
+            Review.objects.create(paper=paper, reviewer=self.reviewer, score=score, comments='')
+            self.papers[score] = paper
+        self.unreviewed = self.make_paper([self.author_user], 'Unreviewed')
+        self.url = reverse('conferencesystem:decide_papers', args=[self.conference.id])
+        self.client.force_login(self.chair_user)
+
+    def statuses(self):
+        return {paper.title: paper.status for paper in Paper.objects.all()}
+
+    def test_preview_changes_nothing(self):
+        response = self.client.post(self.url, {'min_reviews': 1, 'accept_min': 4, 'reject_max': 2, 'preview': ''})
+        self.assertEqual(response.context['preview'], {'accepted': 2, 'rejected': 2})
+        self.assertEqual(set(self.statuses().values()), {'submitted'})
+        self.assertFalse(Notification.objects.exists())
+
+    def test_apply_updates_by_rule_and_queues_notifications(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, {'min_reviews': 1, 'accept_min': 4, 'reject_max': 2, 'apply': ''})
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE "conferencesystem_paper"')]), 2)
+        self.assertEqual(self.statuses(), {
+            'Scored 1': 'rejected', 'Scored 2': 'rejected', 'Scored 4': 'accepted', 'Scored 5': 'accepted',
+            'Unreviewed': 'submitted',
+        })
+        self.assertEqual(Notification.objects.count(), 8)   # two authors on each of four papers
+        notification = Notification.objects.get(paper=self.papers[5], recipient='coauthor@example.com')
+        self.assertIn('has been accepted', notification.subject)
+        self.assertIn('Scored 5', notification.body)
+
+        # Papers that already have the status are not touched or notified again.
+        self.client.post(self.url, {'min_reviews': 1, 'accept_min': 2, 'apply': ''})
+        self.assertEqual(self.statuses()['Scored 2'], 'accepted')
+        self.assertEqual(Notification.objects.count(), 10)
+
+    def test_emails_are_not_html_escaped(self):
+        Conference.objects.filter(pk=self.conference.pk).update(title='R&D Summit', organizing_institute="O'Brien Institute")
+        Paper.objects.filter(pk=self.papers[5].pk).update(title='Don\'t "stop" & go')
+        conference = Conference.objects.get(pk=self.conference.pk)
+
+        apply_decision(conference, 'accepted', decision_papers(conference, 'accepted', score_min=5))
+        notification = Notification.objects.get(recipient='coauthor@example.com')
+        self.assertEqual(notification.subject, 'R&D Summit: your paper has been accepted')
+        self.assertIn('    Don\'t "stop" & go\n', notification.body)
+        self.assertIn("\nO'Brien Institute\n", notification.body)
+        self.assertNotIn('&amp;', notification.body)
+
+    def test_papers_moved_since_the_pick_are_left_alone(self):
+        locking = Paper.objects.select_for_update
+
+        def decided_meanwhile():
+            # Another decision, between the pick and the update
+            Paper.objects.filter(pk=self.papers[5].pk).update(status='rejected')
+            return locking()
+
+        PaperEvent.objects.all().delete()
+        with mock.patch.object(Paper.objects, 'select_for_update', side_effect=decided_meanwhile):
+            updated = apply_decision(self.conference, 'accepted', decision_papers(self.conference, 'accepted', score_min=4))
+        self.assertEqual(updated, 1)
+        self.assertEqual(self.statuses()['Scored 5'], 'rejected')
+        self.assertEqual(self.statuses()['Scored 4'], 'accepted')
+        self.assertEqual(set(Notification.objects.values_list('paper', flat=True)), {self.papers[4].id})
+        self.assertEqual(list(PaperEvent.objects.values_list('paper', flat=True)), [self.papers[4].id])
+
+    def test_chair_only(self):
+        self.client.force_login(self.author_user)
+        self.assertEqual(self.client.post(self.url, {'min_reviews': 0, 'accept_min': 1, 'apply': ''}).status_code, 403)
+        self.assertEqual(set(self.statuses().values()), {'submitted'})
+
+    def test_worker_drains_outbox_in_batches_over_one_connection(self):
+        self.client.post(self.url, {'min_reviews': 1, 'accept_min': 4, 'reject_max': 2, 'apply': ''})
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open') as open_connection:
+            call_command('send_notifications', once=True, batch_size=3, stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 8)
+        self.assertEqual(open_connection.call_count, 3)     # once per batch on the same backend instance
+        self.assertEqual(Notification.objects.filter(sent_at__isnull=True).count(), 0)
+
+        call_command('send_notifications', once=True, stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 8)
+
+    @override_settings(NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_failed_sends_are_retried_then_given_up(self):
+        Notification.objects.create(recipient='a@example.com', subject='Hi', body='')
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('refused')):
+            call_command('send_notifications', once=True, stdout=io.StringIO())
+        notification = Notification.objects.get()
+        self.assertEqual(notification.attempts, 2)
+        self.assertEqual(notification.last_error, 'OSError: refused')
+        self.assertIsNone(notification.sent_at)
+        self.assertEqual(claim_batch(), [])
+
+
+def make_pdf(*pages):
+    """A minimal PDF with one Flate-compressed content stream per page of text."""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', b'']
+    kids = []
+    for text in pages:
+        content = zlib.compress('BT /F1 12 Tf 72 720 Td ({0}) Tj ET'.format(text).encode('latin-1'))
+        objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content) + content + b'\nendstream')
+        objects.append(b'<< /Type /Page /Parent 2 0 R /Contents %d 0 R >>' % len(objects))
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [' + b' '.join(kids) + b'] /Count %d >>' % len(pages)
+    return b'%PDF-1.4\n' + b''.join(
+        b'%d 0 obj\n' % number + body + b'\nendobj\n' for number, body in enumerate(objects, 1)
+    ) + b'%%EOF\n'
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='conferencesystem-tests-'))
+class PaperPipelineTests(ConferenceTestCase):
+    def make_manuscript(self, *pages, title='Paper'):
+        paper = self.make_paper([self.author_user], title)
+        paper.file.save('manuscript.pdf', ContentFile(make_pdf(*pages)))
+        return Paper.objects.get(pk=paper.pk)
+
+    def test_stages_on_a_compressed_pdf(self):
+        path = os.path.join(tempfile.mkdtemp(), 'paper.pdf')
+        with open(path, 'wb') as f:
+            f.write(make_pdf('Convolutional networks', 'for \\(tiny\\) images'))
+        results, timings = run_stages(path)
+        self.assertEqual(results['page_count'], 2)
+        self.assertEqual(results['text'], 'Convolutional networks for (tiny) images')
+        self.assertEqual(len(results['sha256']), 64)
+        self.assertEqual(set(timings), {'read', 'checksum', 'pages', 'text'})
+
+    def test_saving_a_paper_queues_one_job(self):
+        paper = self.make_paper([self.author_user])
+        self.assertEqual(paper.jobs.filter(status='queued').count(), 1)
+
+        paper = Paper.objects.get(pk=paper.pk)
+        paper.title = 'Renamed'
+        paper.save()
+        self.assertEqual(paper.jobs.count(), 1)
+
+        claim_jobs(10)
+        paper.file.save('other.pdf', ContentFile(b'%PDF-1.4'))     # a new manuscript is processed again
+        self.assertEqual(paper.jobs.filter(status='queued').count(), 1)
+
+    def test_worker_stores_results_and_indexes_text(self):
+        paper = self.make_manuscript('Spectral clustering of protein graphs', 'Second page')
+        call_command('process_papers', once=True, workers=0, stdout=io.StringIO())
+
+        paper.refresh_from_db()
+        self.assertEqual(paper.page_count, 2)
+        self.assertEqual(len(paper.file_sha256), 64)
+        self.assertIsNotNone(paper.processed_at)
+        self.assertIn('protein graphs', PaperText.objects.get(paper=paper).text)
+        job = paper.jobs.get()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(set(job.timings), {'read', 'checksum', 'pages', 'text'})
+        self.assertEqual(search_paper_ids('protein', [self.conference.id], 10), [paper.id])
+
+        # Editing the title keeps the extracted text in the index.
+        paper.title = 'Renamed'
+        paper.save()
+        self.assertEqual(search_paper_ids('protein', [self.conference.id], 10), [paper.id])
+
+    @override_settings(PAPER_JOB_MAX_ATTEMPTS=2)
+    def test_failed_jobs_are_retried_then_given_up(self):
+        paper = self.make_paper([self.author_user])
+        os.remove(paper.file.path)
+        call_command('process_papers', once=True, workers=0, stdout=io.StringIO())
+        job = paper.jobs.get()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIn('FileNotFoundError', job.error)
+
+    def test_paper_deleted_while_processing_is_dropped(self):
+        paper = self.make_manuscript('Withdrawn')
+
+        def withdraw(path):
+            results = run_stages(path)
+            Paper.objects.filter(pk=paper.pk).delete()
+            return results
+
+        out = io.StringIO()
+        with mock.patch('conferencesystem.management.commands.process_papers.run_stages', side_effect=withdraw):
+            call_command('process_papers', once=True, workers=0, stdout=out)
+        self.assertIn('Processed 0 papers, 0 failed, 1 deleted meanwhile.', out.getvalue())
+        self.assertFalse(PaperText.objects.exists() or PaperJob.objects.exists())
+        self.assertEqual(search_paper_ids('Withdrawn', [self.conference.id], 10), [])
+
+    def test_worker_runs_stages_in_a_process_pool(self):
+        papers = [self.make_manuscript('Page of paper {0}'.format(n), title='P{0}'.format(n)) for n in range(3)]
+        call_command('process_papers', once=True, workers=2, stdout=io.StringIO())
+        self.assertEqual(
+            dict(Paper.objects.values_list('title', 'page_count')), {paper.title: 1 for paper in papers},
+        )
+        self.assertFalse(PaperJob.objects.exclude(status='done').exists())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_ROUTERS=['conferencesystem.replicas.ReplicaRouter'])
+class ReplicaRoutingTests(ConferenceTestCase):
+    # The test replica mirrors the default database over its own connection, which cannot see the
+    # data of the test's transaction. These tests check where queries would go without running them there.
+
+    def setUp(self):
+        super().setUp()
+        health.reset()
+        self.addCleanup(health.reset)
+        lag = mock.patch('conferencesystem.replicas.replica_lag', return_value=0.0)
+        self.replica_lag = lag.start()
+        self.addCleanup(lag.stop)
+
+    def serve(self, view, method='get', cookies=None):
+        factory = RequestFactory()
+        for key, value in (cookies or {}).items():
+            factory.cookies[key] = value
+        request = getattr(factory, method)('/')
+        middleware = ReplicaMiddleware(lambda request: middleware.process_view(request, view, (), {}) or view(request))
+        return middleware(request)
+
+    def read_alias(self, request):
+        return HttpResponse(Conference.objects.all().db)
+
+    def test_reads_in_get_requests_go_to_the_replica(self):
+        self.assertEqual(self.serve(self.read_alias).content, b'replica')
+        self.assertEqual(self.serve(self.read_alias, 'post').content, b'default')
+        self.assertEqual(Conference.objects.all().db, 'default')     # outside requests
+
+    def test_writes_pin_the_browser_to_the_primary(self):
+        def write_then_read(request):
+            Conference.objects.filter(pk=self.conference.pk).update(title='ICML 2024')
+            return self.read_alias(request)
+
+        response = self.serve(write_then_read)
+        self.assertEqual(response.content, b'default')
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(self.serve(self.read_alias, cookies={PIN_COOKIE: cookie.value}).content, b'default')
+        self.assertEqual(self.serve(self.read_alias, cookies={PIN_COOKIE: '0'}).content, b'replica')
+
+    def test_lagging_or_unreachable_replicas_are_skipped(self):
+        self.replica_lag.return_value = 60.0
+        self.assertEqual(self.serve(self.read_alias).content, b'default')
+        self.serve(self.read_alias)
+        self.assertEqual(self.replica_lag.call_count, 1)     # checked once per REPLICA_CHECK_INTERVAL
+
+        health.reset()
+        self.replica_lag.side_effect = OperationalError('unable to open database file')
+        self.assertEqual(self.serve(self.read_alias).content, b'default')
+
+    def test_cache_fills_read_the_primary(self):
+        # The replica cannot see the test's rows yet: it lags behind the roles, the user and the
+        # conference. What is cached under the current versions must come from the primary.
+        def fill(request):
+            self.assertEqual(current_replica(), 'replica')
+            roles = get_user_roles(self.chair_user)
+            user = get_cached_user(self.chair_user.pk)
+            conference = catalogue.cache_anonymous_page(lambda: self.conference.pk)(
+                lambda request: HttpResponse(Conference.objects.get(pk=self.conference.pk).title)
+            )(request)
+            return HttpResponse('{0} {1} {2}'.format(roles.is_chair(self.conference), user.email, conference.content.decode()))
+
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        middleware = ReplicaMiddleware(fill)
+        self.assertEqual(middleware(request).content.decode(), 'True chair@example.com ICML')
+        self.assertTrue(get_user_roles(self.chair_user).is_chair(self.conference))      # as cached
+
+    def fail_on(self, alias, error):
+        def view(request):
+            read = Conference.objects.all().db
+            if read == 'replica' or alias == 'default':
+                with connections[alias].wrap_database_errors:     # as a failed query on that connection
+                    raise error
+            return HttpResponse(read)
+        return view
+
+    def serve_retrying(self, view):
+        middleware = ReplicaMiddleware(lambda request: self.run_view(middleware, request, view))
+        return middleware(RequestFactory().get('/'))
+
+    def test_failed_replica_reads_are_retried_on_the_primary(self):
+        self.assertEqual(self.serve_retrying(self.fail_on('replica', sqlite3.OperationalError('gone'))).content, b'default')
+        self.assertEqual(self.serve(self.read_alias).content, b'default')      # skipped until its next check
+
+    def test_other_errors_are_not_retried(self):
+        for alias, error in [
+            ('replica', sqlite3.IntegrityError('UNIQUE constraint failed')),
+            ('default', sqlite3.OperationalError('database is locked')),
+        ]:
+            with self.subTest(alias=alias), self.assertRaises(DatabaseError):
+                self.serve_retrying(self.fail_on(alias, error))
+        self.assertEqual(self.serve(self.read_alias).content, b'replica')
+
+    def run_view(self, middleware, request, view):
+        middleware.process_view(request, view, (), {})
+        try:
+            return view(request)
+        except Exception as e:
+            response = middleware.process_exception(request, e)
+            if response is None:
+                raise
+            return response
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_ROUTERS=['conferencesystem.replicas.ReplicaRouter'])
+class SyncReplicaTests(TransactionTestCase):
+    # Not TestCase: SQLite cannot back up a database while the test's transaction writes to it.
+
+    def test_sync_replica_copies_the_primary(self):
+        Conference.objects.create(
+            title='ICML', organizing_institute='KJSIT', institute_details='Mumbai', description='Machine learning',
+            start_date=datetime.date.today(), end_date=datetime.date.today(),
+        )
+        path = os.path.join(tempfile.mkdtemp(), 'replica.sqlite3')
+        with mock.patch.dict(connections['replica'].settings_dict, {'NAME': path}):
+            call_command('sync_replica', stdout=io.StringIO())
+        with closing(sqlite3.connect(path)) as replica:
+            self.assertEqual(replica.execute("SELECT COUNT(*) FROM conferencesystem_conference").fetchone(), (1,))
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    def wrapper(self, **options):
+        path = os.path.join(tempfile.mkdtemp(), 'db.sqlite3')
+        wrapper = SQLiteWrapper({**connection.settings_dict, 'NAME': path, 'OPTIONS': options}, alias='surge')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_init_command_runs_on_connect(self):
+        db = self.wrapper(init_command='PRAGMA journal_mode = WAL; PRAGMA synchronous = NORMAL')
+        with db.cursor() as cursor:
+            self.assertEqual(cursor.execute("PRAGMA journal_mode").fetchone(), ('wal',))
+            self.assertEqual(cursor.execute("PRAGMA synchronous").fetchone(), (1,))
+
+    def test_transactions_begin_in_the_configured_mode(self):
+        db = self.wrapper(transaction_mode='immediate')
+        db.ensure_connection()
+        with CaptureQueriesContext(db) as queries:
+            db._start_transaction_under_autocommit()
+        self.assertEqual(queries[-1]['sql'], 'BEGIN IMMEDIATE')
+        # The write lock is taken at BEGIN: another writer cannot start.
+        with closing(sqlite3.connect(db.settings_dict['NAME'], timeout=0)) as other:
+            with self.assertRaises(sqlite3.OperationalError):
+                other.execute("BEGIN IMMEDIATE")
+        db.connection.rollback()
+
+    def test_unknown_transaction_mode(self):
+        with self.assertRaises(ValueError):
+            self.wrapper(transaction_mode='LAZY').ensure_connection()
+
+
+class AdminTests(ConferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin_user = User.objects.create_superuser(email='admin@example.com', phone='+919999999999', password='pw')
+        self.client.force_login(self.admin_user)
+
+    def chairs(self):
+        return set(Chair.conferences.through.objects.filter(conference=self.conference).values_list('chair__user__email', flat=True))
+
+    def test_sync_chairs_changes_only_the_difference(self):
+        users = [self.make_user('chair{0}@example.com'.format(i)) for i in range(3)]
+        self.assertEqual(get_user_roles(users[0]).is_chair(self.conference), False)
+
+        sync_chairs(self.conference, [self.chair_user.id, users[0].id, users[1].id])
+        self.assertEqual(self.chairs(), {'chair@example.com', 'chair0@example.com', 'chair1@example.com'})
+        self.assertTrue(get_user_roles(users[0]).is_chair(self.conference))
+
+        # Keeping everyone is a single read; swapping chairs is a fixed number of queries however many change.
+        with self.assertNumQueries(1):
+            sync_chairs(self.conference, [self.chair_user.id, users[0].id, users[1].id])
+        with CaptureQueriesContext(connection) as swap:
+            sync_chairs(self.conference, [users[1].id, users[2].id])
+        self.assertEqual(self.chairs(), {'chair1@example.com', 'chair2@example.com'})
+        self.assertFalse(get_user_roles(self.chair_user).is_chair(self.conference))
+        self.assertEqual(Chair.objects.filter(user=self.chair_user).count(), 1)     # the Chair row is reused later
+
+        many = [self.make_user('many{0}@example.com'.format(i)) for i in range(6)]
+        with CaptureQueriesContext(connection) as bigger_swap:
+            sync_chairs(self.conference, [user.id for user in many])
+        self.assertEqual(len(swap), len(bigger_swap))
+
+    def test_conference_form_syncs_chairs(self):
+        new_chair = self.make_user('new@example.com')
+        url = reverse('admin:conferencesystem_conference_change', args=[self.conference.id])
+        response = self.client.get(url)
+        self.assertContains(response, 'chair@example.com')
+        self.assertNotContains(response, 'author@example.com')     # the widget lists only the chairs
+
+        response = self.client.post(url, {
+            'title': 'ICML', 'organizing_institute': 'KJSIT', 'institute_details': 'Mumbai',
+            'description': 'Machine learning', 'start_date': self.conference.start_date,
+            'end_date': self.conference.end_date, 'chairs': [new_chair.id],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.chairs(), {'new@example.com'})
+
+    def test_changelists_do_not_query_per_row(self):
+        reviewer = Reviewer.objects.create(user=self.make_user('reviewer@example.com'))
+
+        def counts():
+            counts = {}
+            for model in ('paper', 'review', 'reviewer', 'author', 'chair', 'track'):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.client.get(reverse('admin:conferencesystem_{0}_changelist'.format(model))).status_code, 200)
+                counts[model] = len(queries)
+            return counts
+
+        paper = self.make_paper([self.author_user], 'First')
+        Review.objects.create(paper=paper, reviewer=reviewer, score=3, comments='')
+        self.client.get(reverse('admin:index'))     # warm the user cache
+        few = counts()
+        for i in range(3):
+            paper = self.make_paper([self.make_user('author{0}@example.com'.format(i))], 'Paper {0}'.format(i))
+            Review.objects.create(paper=paper, reviewer=Reviewer.objects.create(user=self.make_user('r{0}@example.com'.format(i))), score=4, comments='')
+        self.assertEqual(counts(), few)
+
+    def test_user_search_and_autocomplete_use_prefixes(self):
+        self.make_user('ada@example.com')
+        response = self.client.get(reverse('admin:conferencesystem_user_changelist'), {'q': 'ADA'})
+        self.assertContains(response, 'ada@example.com')
+        self.assertNotContains(response, 'author@example.com')
+
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'ada', 'app_label': 'conferencesystem', 'model_name': 'chair', 'field_name': 'user',
+        })
+        self.assertEqual([result['text'] for result in response.json()['results']], ['ada@example.com'])
+
+    def test_paper_search_and_autocomplete_use_the_search_index(self):
+        self.make_paper([self.author_user], 'Sparse attention kernels')
+        self.make_paper([self.author_user], 'Graph partitioning')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:conferencesystem_paper_changelist'), {'q': 'ATTENTION kern'})
+        self.assertContains(response, 'Sparse attention kernels')
+        self.assertNotContains(response, 'Graph partitioning')
+        self.assertFalse([query for query in queries if 'LIKE' in query['sql']])
+        self.assertTrue([query for query in queries if 'MATCH' in query['sql']])
+
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'graph', 'app_label': 'conferencesystem', 'model_name': 'review', 'field_name': 'paper',
+        })
+        self.assertEqual([result['text'] for result in response.json()['results']], ['Graph partitioning'])
+
+    def test_user_add_form(self):
+        response = self.client.post(reverse('admin:conferencesystem_user_add'), {
+            'email': 'new@example.com', 'phone': '+919812345678', 'password1': 'a-long-passphrase', 'password2': 'a-long-passphrase',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(User.objects.get(email='new@example.com').check_password('a-long-passphrase'))
+
+    def test_big_unfiltered_tables_are_counted_from_statistics(self):
+        self.make_paper([self.author_user])
+        papers = Paper.objects.order_by('id')
+        self.assertEqual(EstimatedCountPaginator(papers, 10).count, 1)     # no statistics yet
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            cursor.execute("UPDATE sqlite_stat1 SET stat = '1000000 1' WHERE tbl = 'conferencesystem_paper'")
+        with self.assertNumQueries(2):
+            self.assertEqual(EstimatedCountPaginator(papers, 10).count, 1000000)
+        self.assertEqual(EstimatedCountPaginator(papers.filter(status='accepted'), 10).count, 0)
+
+
+class PaperEventTests(ConferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.paper = self.make_paper([self.author_user])
+
+    def events(self):
+        return list(PaperEvent.objects.order_by('id').values_list('paper_id', 'kind', 'status'))
+
+    def test_status_changes_and_new_reviews_are_recorded(self):
+        self.paper.title = 'Renamed'
+        self.paper.save()
+        self.paper.status = 'under_review'
+        self.paper.save()
+        reviewer = Reviewer.objects.create(user=self.make_user('reviewer@example.com'))
+        review = Review.objects.create(paper=self.paper, reviewer=reviewer, score=4, comments='Good')
+        review.score = 5
+        review.save()
+        self.assertEqual(self.events(), [(self.paper.id, 'status', 'under_review'), (self.paper.id, 'review', '')])
+
+    def test_bulk_decisions_are_recorded(self):
+        other = self.make_paper([self.author_user], 'Other')
+        Paper.objects.filter(pk=other.pk).update(status='accepted')
+        apply_decision(self.conference, 'accepted', decision_papers(self.conference, 'accepted'))
+        self.assertEqual(self.events(), [(self.paper.id, 'status', 'accepted')])
+
+    def test_events_go_to_authors_and_chairs(self):
+        self.paper.status = 'accepted'
+        self.paper.save()
+        [(message, recipients)] = new_events(0)
+        self.assertEqual(message[1:], ('status', {
+            'paper': self.paper.id, 'title': 'Paper', 'status': 'accepted', 'label': 'Accepted',
+        }))
+        self.assertEqual(recipients, {self.author_user.id, self.chair_user.id})
+
+    def test_without_asgi_the_stream_replays_what_was_missed(self):
+        outsider = self.make_user('outsider@example.com')
+        theirs = self.make_paper([outsider], 'Theirs')
+        self.client.force_login(self.author_user)
+        url = reverse('conferencesystem:paper_events')
+
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response.content, b'retry: 30000\nid: 0\n\n')
+
+        theirs.status = 'rejected'
+        theirs.save()
+        self.paper.status = 'accepted'
+        self.paper.save()
+        response = self.client.get(url, HTTP_LAST_EVENT_ID='0')
+        event_id = PaperEvent.objects.get(paper=self.paper).id
+        self.assertEqual(response.content.decode(), (
+            'retry: 30000\nid: {0}\n\n'
+            'id: {0}\nevent: status\ndata: {{"paper": {1}, "title": "Paper", "status": "accepted", "label": "Accepted"}}\n\n'
+        ).format(event_id, self.paper.id))
+
+    def status_changes(self, count):
+        for status in ['under_review', 'accepted', 'rejected', 'submitted', 'under_review'][:count]:
+            self.paper.status = status
+            self.paper.save()
+        return list(PaperEvent.objects.order_by('id').values_list('id', flat=True))
+
+    @override_settings(EVENT_BATCH_SIZE=2)
+    def test_without_asgi_a_long_replay_comes_back_at_once(self):
+        event_ids = self.status_changes(5)
+        self.client.force_login(self.author_user)
+        url = reverse('conferencesystem:paper_events')
+        seen, last_seen = [], '0'
+        while True:
+            content = self.client.get(url, HTTP_LAST_EVENT_ID=last_seen).content.decode()
+            page = [int(line[4:]) for line in content.split('\n') if line.startswith('id: ')][1:]
+            seen += page
+            if not content.startswith('retry: 0\n'):
+                break
+            last_seen = str(page[-1])
+        self.assertEqual(seen, event_ids)
+
+    @override_settings(EVENT_BATCH_SIZE=2, EVENT_POLL_INTERVAL=0.01, EVENT_STREAM_LIFETIME=0.5)
+    def test_asgi_stream_replays_every_missed_page(self):
+        event_ids = self.status_changes(5)
+        factory = AsyncRequestFactory()
+        url = reverse('conferencesystem:paper_events')
+        request = factory.get(url, headers={'Last-Event-ID': '0'})
+        request.user = self.author_user
+        watching = factory.get(url)
+        watching.user = self.chair_user
+
+        async def run():
+            # Another stream has the relay running, past what the reconnecting one missed.
+            other = (await async_views.paper_events(watching)).streaming_content
+            await other.__anext__()
+            response = await async_views.paper_events(request)
+            messages = [message async for message in response.streaming_content]
+            async for message in other:
+                pass
+            await asyncio.wait_for(broker.task, 5)
+            return [int(message[4:].split(b'\n')[0]) for message in messages if message.startswith(b'id: ')]
+
+        self.assertEqual(async_to_sync(run)(), event_ids)
+
+    @override_settings(EVENT_POLL_INTERVAL=0.01, EVENT_STREAM_LIFETIME=0.5)
+    def test_asgi_stream_pushes_new_events(self):
+        request = AsyncRequestFactory().get(reverse('conferencesystem:paper_events'))
+        request.user = self.author_user
+
+        def accept():
+            self.paper.status = 'accepted'
+            self.paper.save()
+
+        async def run():
+            response = await async_views.paper_events(request)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            content = response.streaming_content
+            self.assertEqual(await content.__anext__(), b'retry: 5000\nid: 0\n\n')
+            self.assertEqual(set(broker.streams), {self.author_user.id})
+
+            await sync_to_async(accept)()
+            message = await asyncio.wait_for(content.__anext__(), 5)
+            self.assertIn(b'event: status\n', message)
+            self.assertIn(b'"status": "accepted"', message)
+
+            # Streams end after EVENT_STREAM_LIFETIME, for the browser to reconnect.
+            with self.assertRaises(StopAsyncIteration):
+                await asyncio.wait_for(content.__anext__(), 5)
+            self.assertEqual(broker.streams, {})
+            await asyncio.wait_for(broker.task, 5)     # the relay stops with the last stream
+
+        async_to_sync(run)()
@@ -0,0 +1,170 @@
+"""
+Resumable chunked uploads for paper manuscripts.
+
+A client creates an Upload, then PATCHes the file in order, one chunk per
+request, with an Upload-Offset header giving the chunk's position. Each
+chunk is streamed from the request straight into a partial file in
+fixed-size reads, so memory use does not depend on the chunk or file size,
+and a running CRC-32 is kept alongside the offset. After a dropped
+connection the client asks for the current offset and carries on from
+there. When every byte has arrived the upload token is submitted with
+PaperSubmissionForm, and the partial file is moved into place as the
+paper's file without being copied, once the paper is committed.
+
+Uploads not submitted within PAPER_UPLOAD_EXPIRY seconds are deleted with
+their partial files by `manage.py purge_uploads`.
+"""
+import fcntl
+import os
+import time
+import uuid
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Upload
+
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def upload_status(upload):
+    return {
+        'token': str(upload.token),
+        'size': upload.size,
+        'offset': upload.received,
+        'checksum': '{0:08x}'.format(upload.checksum),
+        'complete': upload.is_complete(),
+    }
+
+
+def append_chunk(upload, stream, offset, length):
+    """Append ``length`` bytes read from ``stream`` at ``offset`` and return the updated upload."""
+    if offset != upload.received:
+        raise UploadError('Expected offset {0}.'.format(upload.received), status=409)
+    if length <= 0 or offset + length > upload.size:
+        raise UploadError('Chunk does not fit the declared file size.')
+
+    os.makedirs(os.path.dirname(upload.path), exist_ok=True)
+
+    with open(upload.path, 'ab') as f:
+        # One chunk is written at a time: a concurrent duplicate of this chunk waits here,
+        # then finds the offset moved on and leaves the file alone.
+        fcntl.flock(f, fcntl.LOCK_EX)
+        upload.refresh_from_db(fields=['received', 'checksum'])
+        if offset != upload.received:
+            raise UploadError('Expected offset {0}.'.format(upload.received), status=409)
+
+        checksum = upload.checksum
+        remaining = length
+        # Drop anything left behind by an earlier chunk that never completed.
+        f.truncate(offset)
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            f.write(data)
+            checksum = zlib.crc32(data, checksum)
+            remaining -= len(data)
+        if remaining:
+            f.truncate(offset)
+            raise UploadError('Chunk ended early, resend it from offset {0}.'.format(offset))
+        f.flush()
+        os.fsync(f.fileno())
+
+        # The offset condition still guards writers that do not share the lock, e.g. on another host.
+        updated = Upload.objects.filter(pk=upload.pk, received=offset).update(
+            received=offset + length, checksum=checksum,
+        )
+        if not updated:
+            f.truncate(offset)
+            upload.refresh_from_db()
+            raise UploadError('Expected offset {0}.'.format(upload.received), status=409)
+
+    upload.received = offset + length
+    upload.checksum = checksum
+    return upload
+
+
+def save_upload(user, conference, uploaded_file):
+    """Store a manuscript that arrived whole with the form as a completed Upload, to submit by its token later."""
+    upload = Upload.objects.create(
+        user=user, conference=conference, filename=os.path.basename(uploaded_file.name)[:255], size=uploaded_file.size,
+    )
+    os.makedirs(os.path.dirname(upload.path), exist_ok=True)
+    checksum = 0
+    with open(upload.path, 'wb') as f:
+        for data in uploaded_file.chunks(READ_SIZE):
+            f.write(data)
+            checksum = zlib.crc32(data, checksum)
+        f.flush()
+        os.fsync(f.fileno())
+
+    upload.received = upload.size
+    upload.checksum = checksum
+    upload.save(update_fields=['received', 'checksum'])
+    return upload
+
+
+def attach_upload(upload, paper):
+    """
+    Point paper.file at a completed upload, moving it into the paper's
+    upload_to directory when the transaction saving the paper commits. If
+    that transaction rolls back, the upload is left as it was, to submit
+    again.
+    """
+    name = paper.file.field.generate_filename(paper, upload.filename)
+    name = default_storage.get_available_name(name)
+    destination = default_storage.path(name)
+
+    def move():
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(upload.path, destination)
+        upload.delete()
+
+    paper.file = name
+    transaction.on_commit(move)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def purge_uploads():
+    """Delete the uploads older than PAPER_UPLOAD_EXPIRY and their partial files, and return how many."""
+    expired = Upload.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=settings.PAPER_UPLOAD_EXPIRY))
+    uploads = list(expired.only('token'))
+    for upload in uploads:
+        _remove(upload.path)
+    Upload.objects.filter(pk__in=[upload.pk for upload in uploads]).delete()
+
+    # Partial files whose Upload went with its user or conference
+    directory = default_storage.path('partial')
+    if os.path.isdir(directory):
+        cutoff = time.time() - settings.PAPER_UPLOAD_EXPIRY
+        stale = {}
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                token = uuid.UUID(name.removesuffix('.part'))
+                if os.path.getmtime(path) < cutoff:
+                    stale[token] = path
+            except (ValueError, FileNotFoundError):
+                continue
+        known = set(Upload.objects.filter(token__in=list(stale)).values_list('token', flat=True))
+        for token, path in stale.items():
+            if token not in known:
+                _remove(path)
+    return len(uploads)
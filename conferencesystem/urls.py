@@ -1,27 +1,41 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 
 from project import settings
 
 from django.conf.urls.static import static
 
+# Read-only pages have async versions for the ASGI deployment
+read_views = async_views if settings.ASYNC_VIEWS else views
+
 app_name = "conferencesystem"
 urlpatterns = [
     path('', views.index, name='index'),
-    path('conferences/', views.conferences, name='conferences'),
+    path('conferences/', read_views.conferences, name='conferences'),
     path('signup/', views.signup, name='signup'),
     path('login/', views.login_view, name='login'),
     path('profile/', views.profile, name='profile'),
     path('logout/', views.logout_view, name='logout'),
     
-    path('view_papers/', views.view_user_papers, name='view_user_papers'),
-    path('papers/<int:paper_id>', views.paper_detail, name='paper_detail'),
+    path('view_papers/', read_views.view_user_papers, name='view_user_papers'),
+    path('search/', views.search_papers, name='search_papers'),
+    path('users/lookup/', views.user_lookup, name='user_lookup'),
+    path('reviews/', views.reviewer_inbox, name='reviewer_inbox'),
+    path('papers/events/', async_views.paper_events, name='paper_events'),
+    path('papers/<int:paper_id>', read_views.paper_detail, name='paper_detail'),
     path('papers/<int:paper_id>/download_paper', views.download_paper, name='download_paper'),
     path('papers/<int:paper_id>/review_paper', views.review_paper, name='review_paper'),
     path('papers/<int:paper_id>/add_reviewers/', views.add_reviewers, name='add_reviewers'),
     path('papers/<int:paper_id>/remove_reviewer/<int:reviewer_id>', views.remove_reviewer, name='remove_reviewer'),
 
-    path('conference/<int:conference_id>/', views.conference_details, name='conference_details'),
+    path('conference/<int:conference_id>/', read_views.conference_details, name='conference_details'),
     path('conference/<int:conference_id>/submit_paper/', views.submit_paper, name='submit_paper'),
-    path('conference/<int:conference_id>/view_papers/', views.view_conference_papers, name='view_conf_papers'),
+    path('conference/<int:conference_id>/uploads/', views.create_upload, name='create_upload'),
+    path('uploads/<uuid:token>', views.upload_chunk, name='upload_chunk'),
+    path('conference/<int:conference_id>/view_papers/', read_views.view_conference_papers, name='view_conf_papers'),
+    path('conference/<int:conference_id>/export/', views.export_papers, name='export_papers'),
+    path('conference/<int:conference_id>/ranking/', views.conference_ranking, name='conference_ranking'),
+    path('conference/<int:conference_id>/decisions/', views.decide_papers, name='decide_papers'),
+    path('conference/<int:conference_id>/conflicts/', views.conference_conflicts, name='conference_conflicts'),
+    path('conference/<int:conference_id>/assign_reviewers/', views.assign_conference_reviewers, name='assign_reviewers'),
 ]
\ No newline at end of file
@@ -1,22 +1,60 @@
-from .models import Conference, Paper, Author, Reviewer, Review
-from .forms import RegistrationForm, PaperSubmissionForm, ReviewForm
+from .models import Conference, Paper, Author, Reviewer, Review, Upload, PaperScore, TrackScore, ConferenceScore
+from .admission import admit
+from .forms import RegistrationForm, PaperSubmissionForm, ReviewForm, AddReviewerForm, AssignReviewersForm, DecisionForm
+from .assignment import assign_reviewers
+from .coauthors import conflict_report
+from .decisions import apply_decision
+from .middleware import query_budget
+from . import catalogue
+from .downloads import serve_file
+from .exports import papers_zip_response
+from .inbox import INBOX_PAGE_SIZE, INBOX_STATES, reviewer_papers
+from .lookups import LOOKUP_PAGE_SIZE, lookup_users
+from .pagination import parse_cursor, next_page_query
+from .roles import get_roles
+from .search import search_paper_ids
+from .submission import save_submission
+from .uploads import UploadError, append_chunk, save_upload, upload_status
+
+import os
 
 from django.contrib.auth import login, logout
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
-from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
 
-from django.http import HttpResponse, HttpResponseForbidden, FileResponse
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.http import condition, require_http_methods, require_POST
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 
+PAPERS_PER_TRACK = 25
+RANKING_PAGE_SIZE = 50
+SEARCH_PAGE_SIZE = 20
+
 def index(request):
     return render(request, 'index.html')
 
+@condition(
+    etag_func=lambda request: catalogue.etag(request, catalogue.CATALOGUE),
+    last_modified_func=lambda request: catalogue.last_modified(request, catalogue.CATALOGUE),
+)
+@catalogue.cache_anonymous_page(lambda: catalogue.CATALOGUE)
+@query_budget(3)
 def conferences(request):
-    conferences = Conference.objects.all()
-    return render(request, 'view_conferences.html', {'conferences': conferences})
+    conferences = Conference.objects.all()     # only evaluated when the cached list fragment is stale
+
+    context = {
+        'conferences': conferences,
+        'catalogue_version': catalogue.get_version(catalogue.CATALOGUE),
+        'cache_timeout': catalogue.fragment_timeout(),
+    }
+
+    return render(request, 'view_conferences.html', context)
 
 def signup(request):
     if request.method == 'POST':
@@ -54,48 +92,116 @@ def logout_view(request):
 def submit_paper(request, conference_id):
     conference = get_object_or_404(Conference, id=conference_id)
     if request.method == 'POST':
-        form = PaperSubmissionForm(conference, request.POST, request.FILES)
+        form = PaperSubmissionForm(conference, request.POST, request.FILES, user=request.user)
         if form.is_valid():
-            paper = form.save(commit=False)
-            paper.conference = conference
-            paper.save()    # can't directly save form as that would also save m2m
-
-            # Add the paper authors to the conference authors
-            authors = []
-
-            selected_users = list(form.cleaned_data['authors'])
-            selected_users.append(request.user)
-            for user in selected_users:
-                author, created = Author.objects.get_or_create(user=user)
-                author.conferences.add(conference)  # if the author is already part of the conference, nothing will happen
-                authors.append(author)
-
-                # author_exists = Author.objects.filter(user=user, conference=conference).exists()
-                # if not author_exists:
-                    # author = Author.objects.create(user=user)
-                    # author.conferences.add(conference)
-                    # authors.append(author)
-                # else:
-                    # authors.append(Author.objects.filter(user=user, conference=conference).get())
-
-            paper.authors.set(authors)
-            paper.save()
-
-            return redirect('conferencesystem:paper_detail', paper_id=paper.id)  # Redirect to paper detail page
+            # Manuscripts sent ahead through the upload API only need moving into place, so they go first.
+            admission = admit(
+                conference.id, request.user.id, ready=form.upload is not None,
+                token=form.cleaned_data['admission_ticket'],
+            )
+            if admission.admitted:
+                try:
+                    paper = save_submission(form, conference, request.user)
+                finally:
+                    admission.release()
+                return redirect('conferencesystem:paper_detail', paper_id=paper.id)  # Redirect to paper detail page
+            return submission_queued(request, conference, form, admission)
     else:
-        form = PaperSubmissionForm(conference)
+        form = PaperSubmissionForm(conference, user=request.user)
 
-    return render(request, 'submit_paper.html', {'form': form})
+    context = {
+        'form': form,
+        'conference': conference,
+        'upload_chunk_size': settings.PAPER_UPLOAD_CHUNK_SIZE,
+    }
+
+    return render(request, 'submit_paper.html', context)
+
+def submission_queued(request, conference, form, admission):
+    """Send the submission form back with its place in line, for the browser to post again after Retry-After."""
+    data = form.data.copy()
+    if admission.ticket:
+        data['admission_ticket'] = admission.ticket
+        if form.upload is None:
+            # Keep the manuscript that came with the form, so the retry does not send it again.
+            data['upload_token'] = str(save_upload(request.user, conference, form.cleaned_data['file']).token)
+    form.data = data
+
+    context = {
+        'form': form,
+        'conference': conference,
+        'upload_chunk_size': settings.PAPER_UPLOAD_CHUNK_SIZE,
+        'admission': admission,
+    }
+    response = render(request, 'submit_paper.html', context, status=503)
+    response['Retry-After'] = str(admission.retry_after)
+    return response
 
 @login_required
+@require_POST
+def create_upload(request, conference_id):
+    conference = get_object_or_404(Conference, id=conference_id)
+
+    if not conference.submissions_open():
+        return JsonResponse({'error': 'Submissions are closed.'}, status=403)
+
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid size.'}, status=400)
+
+    filename = os.path.basename(request.POST.get('filename', ''))[:255]
+    if not filename or size <= 0:
+        return JsonResponse({'error': 'A file name and size are required.'}, status=400)
+    if size > settings.PAPER_UPLOAD_MAX_SIZE:
+        return JsonResponse({'error': 'File is too large.'}, status=413)
+
+    upload = Upload.objects.create(user=request.user, conference=conference, filename=filename, size=size)
+
+    status = upload_status(upload)
+    status['url'] = reverse('conferencesystem:upload_chunk', kwargs={'token': upload.token})
+    response = JsonResponse(status, status=201)
+    response['Location'] = status['url']
+    return response
+
+@login_required
+@require_http_methods(['GET', 'HEAD', 'PATCH'])
+def upload_chunk(request, token):
+    upload = get_object_or_404(Upload, token=token, user=request.user)
+
+    if request.method == 'PATCH':
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return JsonResponse({'error': 'Upload-Offset and Content-Length are required.'}, status=400)
+
+        if length > settings.PAPER_UPLOAD_CHUNK_SIZE:
+            return JsonResponse({'error': 'Chunk is too large.'}, status=413)
+
+        try:
+            # Read from the request stream itself; request.body would buffer the chunk.
+            append_chunk(upload, request, offset, length)
+        except UploadError as e:
+            status = upload_status(upload)
+            status['error'] = str(e)
+            return JsonResponse(status, status=e.status)
+
+    return JsonResponse(upload_status(upload))
+
+@login_required
+@query_budget(9)
 def paper_detail(request, paper_id):
-    paper = get_object_or_404(Paper, id=paper_id)
+    papers = Paper.objects.select_related('conference', 'track').prefetch_related('authors__user')
+    paper = get_object_or_404(papers, id=paper_id)
 
-    if not paper.is_author(request.user) and not paper.conference.is_chair(request.user):
+    roles = get_roles(request)
+    user_is_program_chair = roles.is_chair(paper.conference_id)
+
+    if not user_is_program_chair and not roles.is_author(paper):
         return HttpResponseForbidden('You are not authorized.')
 
-    user_is_program_chair = paper.conference.chair_set.filter(user=request.user).exists()
-    user_is_reviewer = paper.reviewer_set.filter(user=request.user).exists()
+    user_is_reviewer = roles.is_reviewer(paper)
 
     review_exists = user_is_reviewer and paper.review_set.filter(reviewer__user=request.user).exists()
 
@@ -110,92 +216,324 @@ def paper_detail(request, paper_id):
     return render(request, 'paper_detail.html', context)
 
 @login_required
+@query_budget(6)
 def download_paper(request, paper_id):
     paper = get_object_or_404(Paper, id=paper_id)
 
     # Perform permission check
     if not request.user.is_superuser and not request.user.is_staff:
-        if not paper.is_author(request.user) and not paper.conference.is_chair(request.user):
+        roles = get_roles(request)
+        if not roles.is_author(paper) and not roles.is_chair(paper.conference_id):
             return HttpResponseForbidden("You don't have permission to download this file.")
 
-    # Generate the file path
-    file_path = paper.file.path
-
-    # Send the file as a response
-    response = FileResponse(open(file_path, 'rb'))
-    response['Content-Disposition'] = 'attachment; filename="{0}"'.format(paper.file.name)
-
-    return response
+    # Hand the transfer to the proxy (or stream it), honouring Range and conditional GET
+    return serve_file(request, paper.file)
 
 @login_required
+@query_budget(3)
 def view_user_papers(request):
     user = request.user
-    papers = Paper.objects.filter(authors__user=user)
+    papers = Paper.objects.filter(authors__user=user).select_related('conference', 'track')
 
     return render(request, 'view_user_papers.html', {'papers': papers})
 
+@condition(
+    etag_func=lambda request, conference_id: catalogue.etag(request, conference_id),
+    last_modified_func=lambda request, conference_id: catalogue.last_modified(request, conference_id),
+)
+@catalogue.cache_anonymous_page(lambda conference_id: conference_id)
+@query_budget(7)
 def conference_details(request, conference_id):
-    conference = Conference.objects.get(id=conference_id)
+    conference = get_object_or_404(Conference, id=conference_id)
     submissions_open = conference.submissions_open()
 
     user_is_program_chair = False
 
     if request.user.is_authenticated:
-        user_is_program_chair = conference.chair_set.filter(user=request.user).exists()
+        user_is_program_chair = get_roles(request).is_chair(conference)
 
     context = {
         'conference': conference,
         'submissions_open': submissions_open,
         'user_is_program_chair': user_is_program_chair,
+        'conference_version': catalogue.get_version(conference.id),
+        'cache_timeout': catalogue.fragment_timeout(),
     }
 
     return render(request, 'conference_details.html', context)
 
+class PaperBoard:
+    """
+    The chair's paper board: every track's papers from a single query, with
+    filters and a keyset cursor per track taken from the query string.
+    """
+
+    def __init__(self, request):
+        self.track = parse_cursor(request.GET.get('track'))
+        self.status = request.GET.get('status', '')
+        if self.status not in dict(Paper.STATUS_CHOICES):
+            self.status = ''
+
+        self.cursors = {}
+        for key, value in request.GET.items():
+            if key.startswith('after_'):
+                track_id, cursor = parse_cursor(key[len('after_'):]), parse_cursor(value)
+                if track_id and cursor:
+                    self.cursors[track_id] = cursor
+
+    def papers(self, conference):
+        # Each track resumes after its own cursor and the window function cuts
+        # it off one row past the page size, which tells us whether there is
+        # a next page. The query does not depend on the track list, so the two
+        # can be fetched independently.
+        after_cursor = ~Q(track_id__in=list(self.cursors))
+        for track_id, cursor in self.cursors.items():
+            after_cursor |= Q(track_id=track_id, id__gt=cursor)
+
+        papers = conference.paper_set.filter(after_cursor)
+        if self.track:
+            papers = papers.filter(track_id=self.track)
+        if self.status:
+            papers = papers.filter(status=self.status)
+        return papers.annotate(
+            row=Window(RowNumber(), partition_by=F('track_id'), order_by=F('id').asc()),
+        ).filter(row__lte=PAPERS_PER_TRACK + 1).order_by('track_id', 'id')
+
+    def group(self, request, tracks, papers):
+        shown_tracks = [track for track in tracks if not self.track or track.id == self.track]
+        grouped = {track.id: [] for track in shown_tracks}
+        for paper in papers:
+            grouped[paper.track_id].append(paper)
+
+        papers_by_track = {}
+        for track in shown_tracks:
+            track_papers = grouped[track.id]
+            next_query = None
+            if len(track_papers) > PAPERS_PER_TRACK:
+                track_papers = track_papers[:PAPERS_PER_TRACK]
+                next_query = next_page_query(request, 'after_{0}'.format(track.id), track_papers[-1].id)
+            papers_by_track[track] = {'papers': track_papers, 'next_query': next_query}
+        return papers_by_track
+
 @login_required
+@query_budget(8)
 def view_conference_papers(request, conference_id):
     conference = get_object_or_404(Conference, id=conference_id)
 
-    if not conference.is_chair(request.user):
+    if not get_roles(request).is_chair(conference):
         return HttpResponseForbidden("You are not authorized.")
 
-    tracks = conference.track_set.all()
-
-    papers_by_track = {}
-    for track in tracks:
-        papers_by_track[track] = conference.paper_set.filter(track=track)
+    board = PaperBoard(request)
+    tracks = list(conference.track_set.order_by('id'))
+    papers_by_track = board.group(request, tracks, board.papers(conference))
 
     context = {
         'conference': conference,
         'papers_by_track': papers_by_track,
+        'tracks': tracks,
+        'statuses': Paper.STATUS_CHOICES,
+        'selected_track': board.track,
+        'selected_status': board.status,
     }
 
     return render(request, 'view_conf_papers.html', context)
 
+RANKING_SORTS = {
+    'mean': 'score_mean',
+    'count': 'review_count',
+    'min': 'score_min',
+    'max': 'score_max',
+}
+
+@login_required
+@query_budget(10)
+def conference_ranking(request, conference_id):
+    conference = get_object_or_404(Conference, id=conference_id)
+
+    if not get_roles(request).is_chair(conference):
+        return HttpResponseForbidden("You are not authorized.")
+
+    # Reads only the aggregate tables kept up to date by conferencesystem.scores
+    sort = request.GET.get('sort', '-mean')
+    field = RANKING_SORTS.get(sort.lstrip('-'), 'score_mean')
+    order = F(field).desc(nulls_last=True) if sort.startswith('-') else F(field).asc(nulls_last=True)
+
+    scores = PaperScore.objects.filter(conference=conference).select_related('paper', 'track').order_by(order, 'paper_id')
+    page = Paginator(scores, RANKING_PAGE_SIZE).get_page(request.GET.get('page'))
+
+    context = {
+        'conference': conference,
+        'conference_score': ConferenceScore.objects.filter(conference=conference).first(),
+        'track_scores': TrackScore.objects.filter(conference=conference).select_related('track').order_by('track_id'),
+        'page': page,
+        'sort': sort,
+    }
+
+    return render(request, 'conference_ranking.html', context)
+
+@login_required
+@query_budget(7)
+def export_papers(request, conference_id):
+    conference = get_object_or_404(Conference, id=conference_id)
+
+    if not get_roles(request).is_chair(conference):
+        return HttpResponseForbidden("You are not authorized.")
+
+    papers = conference.paper_set.all()
+    filename = 'conference-{0}-papers.zip'.format(conference.id)
+    track_id = parse_cursor(request.GET.get('track'))
+    if track_id is not None:
+        track = get_object_or_404(conference.track_set, id=track_id)
+        papers = papers.filter(track=track)
+        filename = 'conference-{0}-track-{1}-papers.zip'.format(conference.id, track.id)
+
+    # The archive is built while it is sent, see conferencesystem.exports
+    return papers_zip_response(papers, filename)
+
+@login_required
+@query_budget(8)
+def search_papers(request):
+    roles = get_roles(request)
+    query = request.GET.get('q', '').strip()
+
+    # Only the conferences this user chairs are searched
+    conference_ids = roles.chair_conferences
+    selected_conference = parse_cursor(request.GET.get('conference'))
+    if selected_conference:
+        conference_ids = conference_ids & {selected_conference}
+
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    ids = search_paper_ids(query, conference_ids, SEARCH_PAGE_SIZE + 1, (page - 1) * SEARCH_PAGE_SIZE)
+    papers = Paper.objects.select_related('conference', 'track').in_bulk(ids[:SEARCH_PAGE_SIZE])
+
+    context = {
+        'query': query,
+        'papers': [papers[paper_id] for paper_id in ids[:SEARCH_PAGE_SIZE] if paper_id in papers],
+        'conferences': Conference.objects.filter(id__in=roles.chair_conferences).order_by('title'),
+        'selected_conference': selected_conference,
+        'page': page,
+        'previous_query': next_page_query(request, 'page', page - 1) if page > 1 else None,
+        'next_query': next_page_query(request, 'page', page + 1) if len(ids) > SEARCH_PAGE_SIZE else None,
+    }
+
+    return render(request, 'search_papers.html', context)
+
+@login_required
+def assign_conference_reviewers(request, conference_id):
+    conference = get_object_or_404(Conference, id=conference_id)
+
+    if not get_roles(request).is_chair(conference):
+        return HttpResponseForbidden("You are not authorized to assign reviewers for this conference.")
+
+    result = None
+    if request.method == 'POST':
+        form = AssignReviewersForm(request.POST)
+        if form.is_valid():
+            result = assign_reviewers(
+                conference,
+                form.cleaned_data['reviewers'],
+                form.cleaned_data['per_paper'],
+                form.cleaned_data['capacity'],
+                form.capacities,
+            )
+    else:
+        form = AssignReviewersForm()
+
+    context = {
+        'conference': conference,
+        'form': form,
+        'result': result,
+    }
+
+    return render(request, 'assign_reviewers.html', context)
+
+@login_required
+@query_budget(3)
+def user_lookup(request):
+    """JSON typeahead for the user pickers: ?q=<prefix>&after=<cursor>."""
+    users = lookup_users(request.GET.get('q', ''), after=parse_cursor(request.GET.get('after')), limit=LOOKUP_PAGE_SIZE)
+
+    results = [
+        {'id': user['id'], 'email': user['email'], 'name': ' '.join(filter(None, [user['first_name'], user['last_name']]))}
+        for user in users
+    ]
+    next_url = None
+    if len(results) == LOOKUP_PAGE_SIZE:
+        next_url = '{0}?{1}'.format(request.path, next_page_query(request, 'after', results[-1]['id']))
+
+    return JsonResponse({'results': results, 'next': next_url})
+
+@login_required
+def conference_conflicts(request, conference_id):
+    conference = get_object_or_404(Conference, id=conference_id)
+
+    if not get_roles(request).is_chair(conference):
+        return HttpResponseForbidden("You are not authorized to view the conflicts of this conference.")
+
+    context = {
+        'conference': conference,
+        'conflicts': conflict_report(conference),
+        'hops': settings.COI_HOPS,
+    }
+
+    return render(request, 'conference_conflicts.html', context)
+
+@login_required
+def decide_papers(request, conference_id):
+    conference = get_object_or_404(Conference, id=conference_id)
+
+    if not get_roles(request).is_chair(conference):
+        return HttpResponseForbidden("You are not authorized to decide on papers of this conference.")
+
+    preview = applied = None
+    form = DecisionForm(conference, request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        if 'apply' in request.POST:
+            applied = {status: apply_decision(conference, status, papers) for status, papers in form.decisions()}
+        else:
+            preview = {status: papers.count() for status, papers in form.decisions()}
+
+    context = {
+        'conference': conference,
+        'form': form,
+        'preview': preview,
+        'applied': applied,
+        'status_counts': conference.paper_set.values('status').annotate(count=Count('id')).order_by('status'),
+    }
+
+    return render(request, 'decide_papers.html', context)
+
 @login_required
 def add_reviewers(request, paper_id):
     paper = get_object_or_404(Paper, id=paper_id)
 
-    if not paper.conference.is_chair(request.user):
+    if not get_roles(request).is_chair(paper.conference_id):
         return HttpResponseForbidden("You are not authorized to add reviewers to this conference.")
 
     if request.method == 'POST':
-        user_id = request.POST.get('user_id')
-        reviewer, created = Reviewer.objects.get_or_create(user_id=user_id)
+        form = AddReviewerForm(paper, request.POST)
+        if form.is_valid():
+            reviewer, created = Reviewer.objects.get_or_create(user=form.cleaned_data['user'])
+            reviewer.papers.add(paper)  # no-op if already assigned
+
+            if paper.status == 'submitted':
+                paper.status = 'under_review'
+                paper.save()
 
-        if paper not in reviewer.papers.all():
-            reviewer.papers.add(paper)
-        
-        if paper.status == 'submitted':
-            paper.status = 'under_review'
-            paper.save()
+            return redirect('conferencesystem:add_reviewers', paper_id=paper.id)
+    else:
+        form = AddReviewerForm(paper)
 
-    reviewers = paper.reviewer_set.all()
-    users = User.objects.all()
+    reviewers = paper.reviewer_set.select_related('user')
 
     context = {
         'paper': paper,
         'reviewers': reviewers,
-        'users': users,
+        'form': form,
     }
 
     return render(request, 'add_reviewers.html', context)
@@ -205,7 +543,7 @@ def remove_reviewer(request, paper_id, reviewer_id):
     paper = get_object_or_404(Paper, id=paper_id)
     reviewer = get_object_or_404(Reviewer, id=reviewer_id)
 
-    if not paper.conference.is_chair(request.user):
+    if not get_roles(request).is_chair(paper.conference_id):
         return HttpResponseForbidden("You are not authorized to remove reviewers from this conference.")
 
     if request.method == 'POST':
@@ -221,11 +559,38 @@ def remove_reviewer(request, paper_id, reviewer_id):
 
     return redirect('conferencesystem:add_reviewers', paper_id=paper.id)
 
+@login_required
+@query_budget(4)
+def reviewer_inbox(request):
+    state = request.GET.get('state', '')
+    if state not in dict(INBOX_STATES):
+        state = ''
+    conference = parse_cursor(request.GET.get('conference'))
+
+    papers = list(reviewer_papers(
+        request.user, state, conference, after=parse_cursor(request.GET.get('after')), limit=INBOX_PAGE_SIZE + 1,
+    ))
+    next_query = None
+    if len(papers) > INBOX_PAGE_SIZE:
+        papers = papers[:INBOX_PAGE_SIZE]
+        next_query = next_page_query(request, 'after', papers[-1].id)
+
+    context = {
+        'papers': papers,
+        'next_query': next_query,
+        'conferences': Conference.objects.filter(paper__reviewer__user=request.user).distinct().order_by('title'),
+        'states': INBOX_STATES,
+        'selected_state': state,
+        'selected_conference': conference,
+    }
+
+    return render(request, 'reviewer_inbox.html', context)
+
 @login_required
 def review_paper(request, paper_id):
     paper = get_object_or_404(Paper, id=paper_id)
 
-    if not paper.is_reviewer(request.user):
+    if not get_roles(request).is_reviewer(paper):
         return HttpResponseForbidden("You are not authorized to review this paper.")
 
     reviewer = get_object_or_404(Reviewer, user=request.user)
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,6 +27,8 @@ SECRET_KEY = 'django-insecure-v-zes40knfo^q5zh890!pl-u)8$dcopk(qky+qb#tt!o+u#vqt
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 ALLOWED_HOSTS = []
 
 
@@ -45,12 +49,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'conferencesystem.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'conferencesystem.middleware.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'project.urls'
@@ -73,17 +79,97 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'project.wsgi.application'
 
+# Route the read-only pages to conferencesystem.async_views. project/asgi.py
+# turns this on, so the same settings serve both deployments.
+ASYNC_VIEWS = os.environ.get('CONFERENCE_ASYNC_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connections are kept for DATABASE_CONN_MAX_AGE seconds and checked before
+# reuse. SQLite runs in WAL mode, where readers never block the writer, and
+# every transaction takes the write lock up front and waits up to `timeout`
+# seconds for it; see conferencesystem.backends.sqlite3.
+CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 600))
+
+SQLITE_OPTIONS = {
+    'timeout': 20,
+    'init_command': 'PRAGMA journal_mode = WAL; PRAGMA synchronous = NORMAL',
+    'transaction_mode': 'IMMEDIATE',
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'conferencesystem.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+# Read replicas, see conferencesystem.replicas. Locally, set DATABASE_REPLICA
+# to a file that `manage.py sync_replica` keeps a copy of the primary in; in
+# production, point this at a real replica. The test runner defines the alias
+# as a mirror of the test database, for the routing tests.
+DATABASE_REPLICA = os.environ.get('DATABASE_REPLICA')
+if DATABASE_REPLICA or TESTING:
+    DATABASES['replica'] = {
+        'ENGINE': 'conferencesystem.backends.sqlite3',
+        'NAME': DATABASE_REPLICA or BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['conferencesystem.replicas.ReplicaRouter'] if DATABASE_REPLICA else []
+DATABASE_REPLICAS = ['replica'] if DATABASE_REPLICA else []
+REPLICA_PIN_SECONDS = 5         # how long a browser reads the primary after writing
+REPLICA_MAX_LAG = 10            # seconds behind the primary before a replica is skipped
+REPLICA_CHECK_INTERVAL = 5      # seconds between checks of a replica's health and lag
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Per-process memory by default. Set CACHE_BACKEND and CACHE_LOCATION to share
+# the cache between processes, e.g.
+# django.core.cache.backends.memcached.PyMemcacheCache and 127.0.0.1:11211, or
+# django.core.cache.backends.redis.RedisCache and redis://127.0.0.1:6379.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+# Whether every process serving requests sees the same cache. The role, user
+# and catalogue version stamps are only trusted when it does: with a
+# per-process cache a change made in one process never reaches the others.
+# The test runner and runserver have the one process; set CACHE_SHARED=1 for
+# any other single-process deployment on the local-memory cache.
+CACHE_SHARED = (
+    CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+    or os.environ.get('CACHE_SHARED') == '1'
+    or TESTING
+    or (len(sys.argv) > 1 and sys.argv[1] == 'runserver')
+)
+
+# Sessions are read from the cache and written through to the database, when
+# the cache is shared: otherwise a logout would only reach one process's copy.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db' if CACHE_SHARED else 'django.contrib.sessions.backends.db'
+
+# How long a user's resolved chair/author/reviewer roles stay cached, in seconds
+ROLE_CACHE_TIMEOUT = 300
+
+# How long a signed-in user's row stays cached, in seconds; see conferencesystem.authentication
+USER_CACHE_TIMEOUT = 300
+
+# How long rendered catalogue pages and fragments are kept, in seconds; see conferencesystem.catalogue
+CATALOGUE_CACHE_TIMEOUT = 600
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -124,6 +210,62 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'uploads/'
 
+# How paper downloads are served once permissions are checked: 'stream'
+# (Django, for runserver), 'x-accel-redirect' (nginx) or 'x-sendfile'.
+# For nginx, PAPER_DOWNLOAD_ACCEL_PREFIX must map to an internal location
+# aliased to MEDIA_ROOT.
+PAPER_DOWNLOAD_BACKEND = 'stream'
+PAPER_DOWNLOAD_ACCEL_PREFIX = '/protected/'
+
+# Resumable chunked uploads, see conferencesystem.uploads
+PAPER_UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+PAPER_UPLOAD_MAX_SIZE = 100 * 1024 * 1024
+PAPER_UPLOAD_EXPIRY = 24 * 3600     # seconds before an upload never submitted is purged
+
+# Email. In development point it at a local debugging SMTP server on port
+# 1025, or set EMAIL_BACKEND=django.core.mail.backends.filebased.EmailBackend
+# to write messages to EMAIL_FILE_PATH instead.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 1025))
+EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
+DEFAULT_FROM_EMAIL = 'noreply@conferencesystem.local'
+
+# Decision notification outbox, see conferencesystem.notifications
+NOTIFICATION_BATCH_SIZE = 100
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_LEASE = 300    # seconds before a batch claimed by a stalled worker is retried
+
+# Submission admission control, see conferencesystem.admission
+SUBMISSION_CONCURRENCY = 32             # submissions saved at once, over all conferences
+SUBMISSION_CONFERENCE_CONCURRENCY = 8   # ... and for any one conference
+SUBMISSION_QUEUE_LENGTH = 500           # submitters waiting in line per conference before new ones are turned away
+SUBMISSION_RETRY_AFTER = 5              # most seconds a waiting submitter is asked to wait before retrying
+SUBMISSION_RETRY_MIN = 0.2              # ... and fewest, which bounds how often the front of the line retries
+SUBMISSION_FRONT_WAIT = 1               # seconds the front of the line waits in the request for a slot
+SUBMISSION_TICKET_TIMEOUT = 60          # seconds a place in line is kept without a retry
+SUBMISSION_SLOT_TIMEOUT = 120           # seconds before the slot of a worker that died is freed
+
+# Manuscript processing, see conferencesystem.pipeline
+PAPER_PIPELINE_WORKERS = None   # worker processes, None for one per CPU
+PAPER_JOB_BATCH_SIZE = 20
+PAPER_JOB_MAX_ATTEMPTS = 3
+PAPER_JOB_LEASE = 600       # seconds before a job claimed by a stalled worker is retried
+
+# Live paper updates over server-sent events, see conferencesystem.events
+EVENT_POLL_INTERVAL = 1     # seconds between each worker's looks for new events
+EVENT_BATCH_SIZE = 500      # events read per look
+EVENT_QUEUE_SIZE = 100      # events held for a slow stream before it is dropped to reconnect
+EVENT_KEEPALIVE = 15        # seconds between comments that keep an idle stream open through proxies
+EVENT_RETENTION = 3600      # seconds events are kept for browsers that reconnect
+EVENT_STREAM_LIFETIME = 300 # seconds before a stream ends and the browser reconnects
+EVENT_RETRY = 5             # seconds a browser waits before reconnecting a dropped stream
+EVENT_WSGI_RETRY = 30       # ... and between polls when served without ASGI
+
+# Reviewers within this many co-authorship hops of a paper's authors are
+# conflicted with it (1: its authors' co-authors), see conferencesystem.coauthors
+COI_HOPS = 1
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -132,5 +274,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Remove usernames
 AUTH_USER_MODEL = 'conferencesystem.User'
 
+AUTHENTICATION_BACKENDS = ['conferencesystem.authentication.CachedModelBackend']
+
 # Phone number region
-PHONENUMBER_DEFAULT_REGION = 'IN'
\ No newline at end of file
+PHONENUMBER_DEFAULT_REGION = 'IN'
+
+# Per-view SQL query budgets, see conferencesystem.middleware
+QUERY_BUDGET_STRICT = TESTING
+QUERY_BUDGET_N_PLUS_ONE_THRESHOLD = 3